@@ -0,0 +1,378 @@
+import argparse
+import contextlib
+import importlib.util
+import inspect
+import io
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+#Benchmarks for Main File.py, run with: python Benchmarks.py <command>
+
+MAIN_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "Main File.py")
+
+#Modules that must only be imported when the feature that needs them is used
+LAZY_MODULES = ['deap', 'jinja2']
+
+IMPORT_PROBE = """
+import importlib.util, json, sys, time
+start = time.perf_counter()
+spec = importlib.util.spec_from_file_location('main_file', sys.argv[1])
+module = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(module)
+elapsed = time.perf_counter() - start
+print(json.dumps({
+    'seconds': elapsed,
+    'lazy_modules_loaded': [name for name in sys.argv[2:] if name in sys.modules],
+    'data_loaded': module.DATASET.loaded
+}))
+"""
+
+
+def measure_import_time(repeats=5):
+    #Each repeat is a fresh interpreter so every import is cold
+    samples = []
+    for _ in range(repeats):
+        output = subprocess.run(
+            [sys.executable, '-c', IMPORT_PROBE, MAIN_FILE, *LAZY_MODULES],
+            capture_output=True, text=True, check=True
+        ).stdout
+        samples.append(json.loads(output.strip().splitlines()[-1]))
+    return samples
+
+
+def benchmark_import_time(budget=1.5, repeats=5):
+    """Fails (returns False) if the median cold import of Main File.py exceeds budget seconds,
+    or if importing it loads the dataset or any of the lazily imported dependencies."""
+    samples = measure_import_time(repeats)
+    median = statistics.median(s['seconds'] for s in samples)
+    lazy_loaded = sorted({name for s in samples for name in s['lazy_modules_loaded']})
+    data_loaded = any(s['data_loaded'] for s in samples)
+
+    print(f"Cold import: median {median:.3f}s over {repeats} runs (budget {budget:.3f}s)")
+    passed = median <= budget
+    if not passed:
+        print("FAIL: import time over budget")
+    if lazy_loaded:
+        print(f"FAIL: imported eagerly: {', '.join(lazy_loaded)}")
+        passed = False
+    if data_loaded:
+        print("FAIL: dataset was loaded at import time")
+        passed = False
+    return passed
+
+
+#Data sizes every benchmark runs on: the bundled USDJPY file and synthetic series of n bars
+SIZES = {'usdjpy': None, '10k': 10_000, '100k': 100_000, '1M': 1_000_000, '10M': 10_000_000}
+EXTRA_BENCHMARKS = ['analysepatterns', 'load_data', 'trade', 'save_visualisation']
+TRADE_CALLS = 1000  #trade() is timed over this many entry dates spread across the series
+#Benchmarks that make a fixed number of calls rather than one pass over the bars, reported in calls per second
+CALL_BENCHMARKS = {'trade': TRADE_CALLS}
+#Traced peak bytes per bar a benchmark may use from MEMORY_CHECK_BARS bars up. Fixed costs such as
+#a full candidate chunk still dominate at 100k bars, so smaller sizes are not checked
+MEMORY_BUDGET_PER_BAR = 320
+MEMORY_CHECK_BARS = 1_000_000
+#save_visualisation builds a Python dict per trade for the chart's trade table, not one array pass
+MEMORY_BUDGETS = {'save_visualisation': 400}
+
+
+def load_main():
+    """Main File.py as a module (registered in sys.modules so process pools can pickle its functions)."""
+    if 'main_file' not in sys.modules:
+        spec = importlib.util.spec_from_file_location('main_file', MAIN_FILE)
+        module = importlib.util.module_from_spec(spec)
+        sys.modules['main_file'] = module
+        spec.loader.exec_module(module)
+    return sys.modules['main_file']
+
+
+def synthetic_frame(main, n, seed=0):
+    #Regime switching random walk on one minute bars from Main File.py's generator, with its
+    #pattern templates planted every 2500 bars so the detectors have real work on every size
+    return main.synthetic_ohlc(n, seed, main.spaced_plants(n))[0]
+
+
+class BenchmarkCase:
+    """One data size. The frame, its csv and the trades save_visualisation needs are built once
+    and shared by every benchmark on the case."""
+
+    def __init__(self, main, size, seed=0):
+        self.main, self.size, self.seed = main, size, seed
+        self._frame = None
+        self._csv_path = None
+        self._trades = None
+        handle, self.html_path = tempfile.mkstemp(suffix='.html', prefix=f'benchmark_{size}_')
+        os.close(handle)
+
+    @property
+    def data_path(self):
+        #DATA_PATH is relative to the repository, not to wherever the benchmarks are run from
+        return os.path.join(os.path.dirname(MAIN_FILE), self.main.DATA_PATH)
+
+    @property
+    def frame(self):
+        if self._frame is None:
+            n = SIZES[self.size]
+            self._frame = self.main.load_data(self.data_path) if n is None else synthetic_frame(self.main, n, self.seed)
+        return self._frame
+
+    def fresh_frame(self):
+        #A copy has no Dataset attached, so every timed run starts with cold caches
+        return self.frame.copy()
+
+    @property
+    def csv_path(self):
+        if self._csv_path is None:
+            if SIZES[self.size] is None:
+                self._csv_path = self.data_path
+            else:
+                handle, self._csv_path = tempfile.mkstemp(suffix='.csv', prefix=f'benchmark_{self.size}_')
+                os.close(handle)
+                self.frame.to_csv(self._csv_path, index=False)
+        return self._csv_path
+
+    @property
+    def trades(self):
+        if self._trades is None:
+            with contextlib.redirect_stdout(io.StringIO()):
+                self._trades = self.main.analysepatterns(self.fresh_frame(), len(self.frame), output_path=None)[2]
+        return self._trades
+
+    def close(self):
+        os.remove(self.html_path)
+        if self._csv_path and self._csv_path != self.data_path:
+            os.remove(self._csv_path)
+
+
+def benchmark_setup(name, case):
+    """Returns a no-argument callable running benchmark `name` on the case. Inputs are prepared
+    here so only the work itself is timed."""
+    main = case.main
+    if name in main.PATTERN_REGISTRY:
+        func = getattr(main, name)
+        df = case.fresh_frame()
+        params = {'verbose': False}
+        if 'lookback_days' in inspect.signature(func).parameters:
+            params['lookback_days'] = len(df)  #Scan every bar, not just the default lookback
+        return lambda: func(df, **params)
+    if name == 'analysepatterns':
+        df = case.fresh_frame()
+        return lambda: main.analysepatterns(df, len(df), output_path=None)
+    if name == 'load_data':
+        path = case.csv_path
+        return lambda: main.load_data(path, use_cache=False)
+    if name == 'trade':
+        df = case.fresh_frame()
+        dates = df['Date'].iloc[np.linspace(0, len(df) - 20, TRADE_CALLS, dtype=int)].tolist()
+        return lambda: [main.trade(date, 0.99, 1.01, 10, dataset=df) for date in dates]
+    if name == 'save_visualisation':
+        df, trades, output_path = case.fresh_frame(), case.trades, case.html_path
+        return lambda: main.save_visualisation(df, trades, output_path)
+    raise ValueError(f"Unknown benchmark {name}")
+
+
+def run_benchmark(name, case, repeats=5, min_time=0.5, max_repeats=100):
+    """Times at least `repeats` runs, each on fresh inputs, and keeps going until min_time seconds
+    have been measured (up to max_repeats) so short benchmarks get a stable best time. Peak memory
+    comes from one more traced run, since tracing slows everything it watches."""
+    times = []
+    with contextlib.redirect_stdout(io.StringIO()):
+        while len(times) < repeats or (sum(times) < min_time and len(times) < max_repeats):
+            run = benchmark_setup(name, case)
+            start = time.perf_counter()
+            run()
+            times.append(time.perf_counter() - start)
+
+        run = benchmark_setup(name, case)
+        tracemalloc.start()
+        try:
+            run()
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+    bars = len(case.frame)
+    best = min(times)
+    result = {
+        'benchmark': name, 'size': case.size, 'bars': bars,
+        'wall_seconds': best, 'median_seconds': statistics.median(times), 'runs': len(times),
+        'peak_memory_bytes': peak
+    }
+    if name in CALL_BENCHMARKS:
+        result['calls'] = CALL_BENCHMARKS[name]
+        result['calls_per_second'] = result['calls'] / best if best > 0 else None
+    else:
+        result['bars_per_second'] = bars / best if best > 0 else None
+    return result
+
+
+def available_memory():
+    """Bytes of memory available to new allocations (Linux MemAvailable), None where it cannot be read."""
+    try:
+        with open('/proc/meminfo') as f:
+            for line in f:
+                if line.startswith('MemAvailable:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return None
+
+
+def run_suite(benchmarks=None, sizes=None, repeats=5, output='benchmark_results.json', seed=0, min_time=0.5):
+    """Runs every benchmark on every size and writes the results as JSON to output. Sizes run
+    smallest first, and a benchmark whose peak memory per bar on a smaller size predicts more
+    than the memory available is recorded as skipped instead of run."""
+    main = load_main()
+    benchmarks = benchmarks or [*main.PATTERN_REGISTRY, *EXTRA_BENCHMARKS]
+    sizes = sorted(sizes or list(SIZES), key=lambda size: SIZES[size] or 0)
+    results = []
+    bytes_per_bar = {}
+    for size in sizes:
+        case = BenchmarkCase(main, size, seed)
+        try:
+            for name in benchmarks:
+                needed = bytes_per_bar.get(name, 0) * len(case.frame)
+                available = available_memory()
+                if available is not None and needed > available:
+                    result = {'benchmark': name, 'size': size,
+                              'skipped': f"needs about {needed / 2**20:,.0f} MiB, {available / 2**20:,.0f} MiB available"}
+                    print(f"{size:>7} {name:<28} skipped: {result['skipped']}")
+                    results.append(result)
+                    continue
+                try:
+                    result = run_benchmark(name, case, repeats, min_time)
+                    bytes_per_bar[name] = result['peak_memory_bytes'] / result['bars']
+                    unit = 'calls' if 'calls_per_second' in result else 'bars'
+                    print(f"{size:>7} {name:<28} {result['wall_seconds']:10.4f}s "
+                          f"{result[f'{unit}_per_second']:14,.0f} {unit}/s {result['peak_memory_bytes'] / 2**20:10.1f} MiB")
+                except Exception as e:
+                    result = {'benchmark': name, 'size': size, 'error': f"{type(e).__name__}: {e}"}
+                    print(f"{size:>7} {name:<28} error: {result['error']}")
+                results.append(result)
+        finally:
+            case.close()
+
+    report = {
+        'meta': {
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(), 'numpy': np.__version__, 'pandas': pd.__version__,
+            'platform': platform.platform(), 'cpu_count': os.cpu_count(), 'repeats': repeats, 'min_time': min_time, 'seed': seed
+        },
+        'results': results
+    }
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"\nWrote {len(results)} results to {output}")
+    return report
+
+
+def check_memory(results, budget=MEMORY_BUDGET_PER_BAR, min_bars=MEMORY_CHECK_BARS):
+    """Fails (returns False) if any benchmark on min_bars bars or more had a traced peak above
+    budget bytes per bar (or its MEMORY_BUDGETS entry), the growth that makes the largest sizes
+    run out of memory."""
+    over = [r for r in results if 'peak_memory_bytes' in r and r['bars'] >= min_bars
+            and r['peak_memory_bytes'] / r['bars'] > MEMORY_BUDGETS.get(r['benchmark'], budget)]
+    for result in over:
+        print(f"FAIL: {result['benchmark']} ({result['size']}) peaked at "
+              f"{result['peak_memory_bytes'] / result['bars']:.0f} bytes per bar, "
+              f"budget {MEMORY_BUDGETS.get(result['benchmark'], budget)}")
+    return not over
+
+
+def compare_results(baseline_path, current_path, threshold=0.20, memory_threshold=0.20, min_seconds=0.001,
+                    min_memory=2**20):
+    """Flags benchmarks whose best wall time grew by more than threshold or whose peak memory grew
+    by more than memory_threshold against the baseline. Growth under min_seconds or min_memory bytes
+    is ignored as noise on tiny runs. Returns True when nothing regressed."""
+    with open(baseline_path) as f:
+        baseline = {(r['benchmark'], r['size']): r for r in json.load(f)['results']}
+    with open(current_path) as f:
+        current = {(r['benchmark'], r['size']): r for r in json.load(f)['results']}
+
+    regressions = []
+    print(f"{'size':>7} {'benchmark':<28} {'baseline':>10} {'current':>10} {'time':>8} {'memory':>8}")
+    for key, now in current.items():
+        before = baseline.get(key)
+        if before is None or 'wall_seconds' not in before or 'wall_seconds' not in now:
+            if 'wall_seconds' not in now:
+                status = now.get('error') or f"skipped: {now['skipped']}"
+            else:
+                status = 'not run in baseline' if before else 'not in baseline'
+            print(f"{key[1]:>7} {key[0]:<28} {status}")
+            if before is not None and 'wall_seconds' not in now and 'wall_seconds' in before:
+                regressions.append(key)
+            continue
+
+        time_ratio = now['wall_seconds'] / before['wall_seconds'] if before['wall_seconds'] else 1.0
+        memory_ratio = now['peak_memory_bytes'] / before['peak_memory_bytes'] if before['peak_memory_bytes'] else 1.0
+        flags = []
+        if time_ratio > 1 + threshold and now['wall_seconds'] - before['wall_seconds'] > min_seconds:
+            flags.append('SLOWER')
+        if memory_ratio > 1 + memory_threshold and now['peak_memory_bytes'] - before['peak_memory_bytes'] > min_memory:
+            flags.append('MORE MEMORY')
+        if flags:
+            regressions.append(key)
+        print(f"{key[1]:>7} {key[0]:<28} {before['wall_seconds']:9.4f}s {now['wall_seconds']:9.4f}s "
+              f"{time_ratio:7.2f}x {memory_ratio:7.2f}x {' '.join(flags)}")
+
+    missing = sorted(set(baseline) - set(current))
+    if missing:
+        print(f"\nNot run this time: {', '.join(f'{name} ({size})' for name, size in missing)}")
+    if regressions:
+        print(f"\nFAIL: {len(regressions)} regression(s) against {baseline_path}")
+    else:
+        print(f"\nNo regressions against {baseline_path}")
+    return not regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks for the trading pattern analysis")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    import_parser = commands.add_parser('import-time', help="Check the cold import time of Main File.py")
+    import_parser.add_argument('--budget', type=float, default=1.5, help="Maximum median import time in seconds")
+    import_parser.add_argument('--repeats', type=int, default=5)
+
+    run_parser = commands.add_parser('run', help="Run the benchmark suite and write the results as JSON")
+    run_parser.add_argument('--benchmarks', nargs='+', default=None,
+                            help="Detector function names and/or " + ", ".join(EXTRA_BENCHMARKS) + " (all by default)")
+    run_parser.add_argument('--sizes', nargs='+', choices=list(SIZES), default=None, help="Data sizes (all by default)")
+    run_parser.add_argument('--repeats', type=int, default=5, help="Minimum timed runs per benchmark")
+    run_parser.add_argument('--min-time', type=float, default=0.5, help="Keep repeating short benchmarks until this many seconds are timed")
+    run_parser.add_argument('--seed', type=int, default=0, help="Seed of the synthetic series")
+    run_parser.add_argument('--output', default='benchmark_results.json')
+    run_parser.add_argument('--memory-budget', type=float, default=MEMORY_BUDGET_PER_BAR,
+                            help=f"Fail if a benchmark on {MEMORY_CHECK_BARS:,}+ bars peaks above this many bytes per bar")
+
+    compare_parser = commands.add_parser('compare', help="Flag regressions against a stored baseline")
+    compare_parser.add_argument('baseline', nargs='?', default='benchmark_baseline.json')
+    compare_parser.add_argument('current', nargs='?', default='benchmark_results.json')
+    compare_parser.add_argument('--threshold', type=float, default=0.20, help="Allowed relative wall time increase")
+    compare_parser.add_argument('--memory-threshold', type=float, default=0.20, help="Allowed relative peak memory increase")
+    compare_parser.add_argument('--min-seconds', type=float, default=0.001, help="Ignore slowdowns smaller than this")
+    compare_parser.add_argument('--min-memory', type=int, default=2**20, help="Ignore peak memory growth below this many bytes")
+
+    args = parser.parse_args(argv)
+
+    if args.command == 'import-time':
+        return 0 if benchmark_import_time(args.budget, args.repeats) else 1
+    if args.command == 'run':
+        report = run_suite(args.benchmarks, args.sizes, args.repeats, args.output, args.seed, args.min_time)
+        return 0 if check_memory(report['results'], args.memory_budget) else 1
+    if args.command == 'compare':
+        return 0 if compare_results(args.baseline, args.current, args.threshold,
+                                    args.memory_threshold, args.min_seconds, args.min_memory) else 1
+    return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,14 +1,26 @@
 import pandas as pd 
 import numpy as np
 import random
-from deap import base, creator, tools, algorithms
 from itertools import product
 import json
-from jinja2 import Template
-
-#Global variables
-totalprofit = 0
-totaltrades = 0
+import os
+import sys
+import glob
+import time
+import hashlib
+import threading
+import weakref
+import inspect
+import functools
+import io
+import contextlib
+import asyncio
+from multiprocessing import shared_memory, get_context, get_all_start_methods
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from numpy.lib.stride_tricks import sliding_window_view
+
+#deap (GA) and jinja2 (visualisation) are imported inside the functions that use them
+#so importing this module stays cheap for worker processes and tools
 
 PATTERN_REGISTRY = {
     'find_bullishhammer': "Bullish Hammer",
@@ -40,28 +52,942 @@ DIRECTION_REGISTRY = {
     'find_tweezerbottoms': 'long'
 }
 
-def load_data():
-    #Required to make data standard for the data/files I put in as the dataframe
-    df = pd.read_csv("USDJPY 10 Year.csv") 
+#Detectors whose exits differ from simulate_exits' defaults: offset is the bars between the entry
+#and the first bar checked for an exit, stop_first checks the stop before the target
+EXIT_RULES = {
+    'find_broadening_formations': {'offset': 1, 'stop_first': True}
+}
+
+DATA_PATH = "USDJPY 10 Year.csv"
+CACHE_VERSION = 1
+#Stored in the cache's meta.json, bump it whenever load_data cleans the csv differently
+#so caches written by the old parser are not reused
+PARSER_VERSION = 3
+
+#Column names used by different data vendors, mapped to the layout the detectors expect
+COLUMN_ALIASES = {
+    'date': 'Date', 'timestamp': 'Date', 'datetime': 'Date',
+    'open': 'Open',
+    'high': 'High',
+    'low': 'Low',
+    'close/last': 'Close/Last', 'close': 'Close/Last', 'last': 'Close/Last', 'price': 'Close/Last',
+    'adj close': 'Close/Last',
+    'volume': 'Volume', 'vol': 'Volume'
+}
+#A separate time of day column, joined onto Date (or used as Date when there is none)
+TIME_ALIASES = {'time', 'time of day'}
+NUMERIC_COLUMNS = ['Open', 'High', 'Low', 'Close/Last']
+OPTIONAL_COLUMNS = ['Volume']  #Kept and cleaned when present, rows are not dropped for gaps in them
+
+
+def _file_digest(path, chunk_size=1 << 20):
+    #Content hash of the source file, used to key the binary cache
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
 
-    numeric_columns = ['Open', 'High', 'Low', 'Close/Last']
+def _cache_dir(path):
+    return path + '.cache'
+
+
+def _read_cache(path, stat):
+    """Returns the cached frame for path, or None if the cache is missing or stale.
+    A size/mtime match is trusted; a size match with a new mtime falls back to the content hash."""
+    cache_dir = _cache_dir(path)
+    meta_path = os.path.join(cache_dir, 'meta.json')
+    try:
+        with open(meta_path, 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        return None
+
+    if (meta.get('version') != CACHE_VERSION or meta.get('parser') != PARSER_VERSION
+            or meta.get('size') != stat.st_size):
+        return None
+
+    if meta.get('mtime_ns') != stat.st_mtime_ns:
+        #File was touched, only rebuild if the contents actually changed
+        if _file_digest(path) != meta.get('sha256'):
+            return None
+        meta['mtime_ns'] = stat.st_mtime_ns
+        try:
+            _write_json_atomic(meta_path, meta)
+        except OSError:
+            pass
+
+    try:
+        columns = {
+            name: np.load(os.path.join(cache_dir, filename), mmap_mode='r')
+            for name, filename in zip(meta['columns'], meta['files'])
+        }
+    except (OSError, ValueError, KeyError):
+        return None
 
-    for col in numeric_columns:
-        df[col] = df[col].astype(str)
-        df[col] = df[col].str.replace(',', '')
-        df[col] = pd.to_numeric(df[col], errors='coerce')
+    if any(len(values) != meta['rows'] for values in columns.values()):
+        return None
 
-    df.dropna(subset=numeric_columns, inplace=True)
+    return pd.DataFrame(columns, copy=False)
 
-    df['Date'] = pd.to_datetime(df['Date'], format='%m/%d/%Y')
-    df = df.sort_values(by='Date').reset_index(drop=True)
+
+def _write_json_atomic(meta_path, meta):
+    tmp_path = f"{meta_path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(meta, f)
+    os.replace(tmp_path, meta_path)
+
+
+def _write_cache(path, df, stat, digest):
+    #Writes one .npy file per column next to the CSV, meta.json is written last so readers never see a partial cache
+    if any(df[col].dtype == object for col in df.columns):
+        return
+
+    cache_dir = _cache_dir(path)
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        files = []
+        for i, col in enumerate(df.columns):
+            filename = f"{digest[:16]}_{i}.npy"
+            np.save(os.path.join(cache_dir, filename), df[col].to_numpy())
+            files.append(filename)
+
+        meta = {
+            'version': CACHE_VERSION,
+            'parser': PARSER_VERSION,
+            'size': stat.st_size,
+            'mtime_ns': stat.st_mtime_ns,
+            'sha256': digest,
+            'rows': len(df),
+            'columns': list(df.columns),
+            'files': files
+        }
+        _write_json_atomic(os.path.join(cache_dir, 'meta.json'), meta)
+
+        #Remove column files left over from older versions of the CSV
+        for filename in os.listdir(cache_dir):
+            if filename.endswith('.npy') and filename not in files:
+                os.remove(os.path.join(cache_dir, filename))
+    except OSError:
+        #Cache is only an optimisation, a read-only data directory is fine
+        pass
+
+
+def load_data(path=DATA_PATH, use_cache=True):
+    """Loads and cleans the OHLC csv. Parsed columns are cached as memory-mapped .npy files
+    in '<csv>.cache' and reused until the csv's size, mtime or content hash changes."""
+    stat = os.stat(path)
+    if use_cache:
+        df = _read_cache(path, stat)
+        if df is not None:
+            return df
+
+    #Required to make data standard for the data/files I put in as the dataframe
+    df = _normalise_columns(pd.read_csv(path), path)
+
+    for col in NUMERIC_COLUMNS + [col for col in OPTIONAL_COLUMNS if col in df.columns]:
+        #Columns read_csv already parsed as numbers have no '$' or ',' to strip
+        if not pd.api.types.is_numeric_dtype(df[col]):
+            df[col] = df[col].astype(str)
+            df[col] = df[col].str.replace(',', '').str.replace('$', '').str.strip()
+            df[col] = pd.to_numeric(df[col], errors='coerce')
+
+    df.dropna(subset=NUMERIC_COLUMNS, inplace=True)
+
+    try:
+        df['Date'] = pd.to_datetime(df['Date'], format='%m/%d/%Y')
+    except ValueError:
+        try:
+            df['Date'] = pd.to_datetime(df['Date'], format='ISO8601')
+        except ValueError:
+            #Not the Nasdaq export layout or ISO timestamps, let pandas work out each date's format (much slower)
+            df['Date'] = pd.to_datetime(df['Date'], format='mixed')
+    #Stable, so bars sharing a timestamp keep their file order
+    df = df.sort_values(by='Date', kind='stable').reset_index(drop=True)
+
+    if use_cache:
+        _write_cache(path, df, stat, _file_digest(path))
     
     return df
 
+def _normalise_columns(df, path=None):
+    #Renames vendor column names to Date/Open/High/Low/Close/Last (and Volume) and drops every other
+    #column. Separate date and time of day columns are joined into one Date
+    renamed, time_col = {}, None
+    for col in df.columns:
+        key = str(col).strip().lower()
+        name = COLUMN_ALIASES.get(key)
+        if name is not None and name not in renamed.values():
+            renamed[col] = name
+        elif key in TIME_ALIASES and time_col is None:
+            time_col = col
+
+    if time_col is not None:
+        date_col = next((col for col, name in renamed.items() if name == 'Date'), None)
+        if date_col is None:
+            renamed[time_col] = 'Date'
+        else:
+            df = df.assign(**{date_col: df[date_col].astype(str).str.strip() + ' ' + df[time_col].astype(str).str.strip()})
+
+    missing = [col for col in ['Date', *NUMERIC_COLUMNS] if col not in renamed.values()]
+    if missing:
+        raise ValueError(f"{path or 'data'}: missing columns {', '.join(missing)}")
+    return df[list(renamed)].rename(columns=renamed)
+
+def _numeric_values(series):
+    #Same cleaning the detectors used to apply in place, without modifying the caller's frame
+    if not pd.api.types.is_numeric_dtype(series):
+        series = pd.to_numeric(series.astype(str).str.replace(',', '').str.replace('$', ''), errors='coerce')
+    values = np.ascontiguousarray(series.to_numpy(dtype=np.float64))
+    values.setflags(write=False)
+    return values
+
+
+def _rolling_mean(values, window):
+    #Matches pandas rolling(window).mean(): NaN until the window is full or if it contains a NaN.
+    #Each window sum is put together from sums over spans of 1, 2, 4, ... bars, every one built
+    #from the last by adding shifted slices, so a window costs about 2*log2(window) contiguous passes
+    n = len(values)
+    result = np.empty(n)
+    result[:window - 1] = np.nan
+    if n >= window:
+        #The window sums are written straight into the result, then divided in place
+        total = result[window - 1:]
+        span_sums, span, covered = np.asarray(values, dtype=np.float64), 1, 0
+        while True:
+            if window & span:
+                part = span_sums[covered:covered + len(total)]
+                if covered:
+                    total += part
+                else:
+                    total[:] = part
+                covered += span
+            if span * 2 > window:
+                break
+            span_sums = span_sums[:-span] + span_sums[span:]
+            span *= 2
+        total /= window
+    return result
+
+
+def _indicator_sma(dataset, window, column):
+    return _rolling_mean(dataset.column(column), window)
+
+
+def _indicator_range_atr(dataset, window, column):
+    #Average High-Low range, the ATR used by the hammer and top detectors
+    return _rolling_mean(dataset.high - dataset.low, window)
+
+
+def _indicator_true_range_atr(dataset, window, column):
+    #Average true range including gaps from the previous close
+    prev_close = np.concatenate(([np.nan], dataset.close[:-1]))
+    true_range = np.fmax(dataset.high - dataset.low,
+                         np.fmax(np.abs(dataset.high - prev_close), np.abs(dataset.low - prev_close)))
+    return _rolling_mean(true_range, window)
+
+
+def _indicator_rsi(dataset, window, column):
+    #Simple moving average RSI (as in the tweezer bottoms detector)
+    delta = np.diff(dataset.column(column), prepend=np.nan)
+    gain = _rolling_mean(np.where(delta > 0, delta, 0.0), window)
+    loss = _rolling_mean(np.where(delta < 0, -delta, 0.0), window)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return 100 - (100 / (1 + gain / loss))
+
+
+INDICATORS = {
+    'sma': _indicator_sma,
+    'atr': _indicator_range_atr,
+    'true_range_atr': _indicator_true_range_atr,
+    'rsi': _indicator_rsi
+}
+
+#Indicators, swing points and range tables read by the registered detectors,
+#built together up front by Dataset.prepare_features
+SHARED_INDICATORS = [('sma', 3), ('sma', 5), ('sma', 10), ('sma', 20), ('sma', 50),
+                     ('atr', 14), ('true_range_atr', 14), ('rsi', 12)]
+SHARED_SWING_POINTS = [('High', 'max'), ('Low', 'min')]
+SHARED_RANGE_TABLES = [('High', 'max'), ('Low', 'min'), ('Low', 'max')]
+SHARED_RANGE_LENGTH = 100  #Longest range the default detectors query
+INDICATOR_WARMUP = max(window for _, window in SHARED_INDICATORS) + 1  #Bars before the indicators are defined
+
+
+class IndicatorStore:
+    """Computes each indicator once per dataset, keyed by (name, column, window), and hands out
+    read-only arrays so every detector and parameter sweep on the dataset shares them."""
+
+    def __init__(self, dataset, counts=None):
+        self._dataset = weakref.ref(dataset)  #The dataset owns the store
+        self._values = {}
+        #Views of a dataset count into its store's totals, so one report covers every slice a run used
+        self.counts = counts if counts is not None else {'hits': 0, 'misses': 0}
+
+    @property
+    def hits(self):
+        return self.counts['hits']
+
+    @property
+    def misses(self):
+        return self.counts['misses']
+
+    def get(self, name, window, column='Close/Last'):
+        key = (name, column, window)
+        values = self._values.get(key)
+        if values is not None:
+            self.counts['hits'] += 1
+            return values
+
+        self.counts['misses'] += 1
+        values = INDICATORS[name](self._dataset(), window, column)
+        values.setflags(write=False)
+        self._values[key] = values
+        return values
+
+    def sma(self, window, column='Close/Last'):
+        return self.get('sma', window, column)
+
+    def atr(self, window=14):
+        return self.get('atr', window)
+
+    def true_range_atr(self, window=14):
+        return self.get('true_range_atr', window)
+
+    def rsi(self, window=14, column='Close/Last'):
+        return self.get('rsi', window, column)
+
+    def seed(self, name, window, values, column='Close/Last'):
+        """Stores values computed elsewhere (e.g. by IncrementalIndicators) so get() does not recompute them."""
+        values = np.asarray(values, dtype=np.float64)
+        values.setflags(write=False)
+        self._values[(name, column, window)] = values
+
+    def report(self):
+        return {'hits': self.hits, 'misses': self.misses, 'cached': len(self._values)}
+
+
+class RollingMean:
+    """Mean of the last `window` values, updated in O(1) per value from a running sum. Matches
+    _rolling_mean: NaN until the window is full or while it holds a NaN. The sum is redone in the
+    batch order every time the window wraps, so rounding error never builds up."""
+
+    def __init__(self, window):
+        self.window = window
+        self._window_values = np.zeros(window)
+        self._total = 0.0  #Sum of the non-NaN values in the window
+        self._nans = 0
+        self.count = 0
+
+    def update(self, value):
+        value = float(value)
+        slot = self.count % self.window
+        if self.count >= self.window:
+            old = self._window_values[slot]
+            if old != old:
+                self._nans -= 1
+            else:
+                self._total -= old
+        self._window_values[slot] = value
+        if value != value:
+            self._nans += 1
+        else:
+            self._total += value
+        self.count += 1
+
+        if slot == self.window - 1:
+            total = 0.0
+            for window_value in self._window_values.tolist():
+                if window_value == window_value:
+                    total += window_value
+            self._total = total
+        return self.value
+
+    @property
+    def value(self):
+        if self.count < self.window or self._nans:
+            return np.nan
+        return self._total / self.window
+
+    def ordered(self):
+        """The values in the window, oldest first."""
+        order = np.arange(self.count - min(self.count, self.window), self.count) % self.window
+        return self._window_values[order]
+
+
+class IncrementalSMA:
+    """Bar by bar IndicatorStore.sma(): update(bar) takes a mapping with the OHLC columns."""
+
+    def __init__(self, window, column='Close/Last'):
+        self.column = column
+        self._mean = RollingMean(window)
+
+    def update(self, bar):
+        return self._mean.update(bar[self.column])
+
+    @property
+    def value(self):
+        return self._mean.value
+
+    def lookahead(self, n):
+        """Values the batch version gives the next n bars when their prices are unknown (NaN)."""
+        return np.full(n, np.nan)
+
+
+class IncrementalATR(IncrementalSMA):
+    """Bar by bar IndicatorStore.atr(), the average High-Low range."""
+
+    def __init__(self, window=14, column='Close/Last'):
+        super().__init__(window, column)
+
+    def update(self, bar):
+        return self._mean.update(float(bar['High']) - float(bar['Low']))
+
+
+class IncrementalTrueRangeATR(IncrementalSMA):
+    """Bar by bar IndicatorStore.true_range_atr(), the average true range including gaps."""
+
+    def __init__(self, window=14, column='Close/Last'):
+        super().__init__(window, column)
+        self._prev_close = np.nan
+
+    def update(self, bar):
+        high, low = float(bar['High']), float(bar['Low'])
+        true_range = np.fmax(high - low, np.fmax(abs(high - self._prev_close), abs(low - self._prev_close)))
+        self._prev_close = float(bar['Close/Last'])
+        return self._mean.update(true_range)
+
+
+class IncrementalRSI:
+    """Bar by bar IndicatorStore.rsi(), the simple moving average RSI."""
+
+    def __init__(self, window=14, column='Close/Last'):
+        self.window, self.column = window, column
+        self._gain, self._loss = RollingMean(window), RollingMean(window)
+        self._prev = np.nan
+
+    def update(self, bar):
+        price = float(bar[self.column])
+        delta = price - self._prev
+        self._prev = price
+        self._gain.update(delta if delta > 0 else 0.0)
+        self._loss.update(-delta if delta < 0 else 0.0)
+        return self.value
+
+    @staticmethod
+    def _rsi(gain, loss):
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return 100 - (100 / (1 + np.float64(gain) / np.float64(loss)))
+
+    @property
+    def value(self):
+        return float(self._rsi(self._gain.value, self._loss.value))
+
+    def lookahead(self, n):
+        #Unknown prices count as no gain and no loss, so the next bars average the newest real
+        #gains and losses with zeros until the window holds only zeros (0/0, NaN)
+        steps = np.arange(1, n + 1)
+        values = []
+        for mean in (self._gain, self._loss):
+            ordered = mean.ordered()
+            suffix = np.concatenate((np.cumsum(ordered[::-1])[::-1], [0.0]))
+            kept = np.clip(self.window - steps, 0, len(ordered))  #Real values still in the window
+            totals = suffix[len(ordered) - kept]
+            values.append(np.where(mean.count + steps >= self.window, totals / self.window, np.nan))
+        return self._rsi(*values)
+
+
+INCREMENTAL_INDICATORS = {
+    'sma': IncrementalSMA,
+    'atr': IncrementalATR,
+    'true_range_atr': IncrementalTrueRangeATR,
+    'rsi': IncrementalRSI
+}
+
+
+class IncrementalIndicators:
+    """The indicators in `specs` ((name, window) pairs, SHARED_INDICATORS by default) updated
+    together in O(1) per bar. Values are keyed (name, column, window) like IndicatorStore."""
+
+    def __init__(self, specs=SHARED_INDICATORS, column='Close/Last'):
+        self.indicators = {(name, column, window): INCREMENTAL_INDICATORS[name](window, column)
+                           for name, window in specs}
+
+    @classmethod
+    def from_history(cls, df, specs=SHARED_INDICATORS, column='Close/Last'):
+        """Indicators ready to continue after the last bar of df. Only the final longest window
+        (plus one bar for the previous close) is replayed, not the whole history."""
+        indicators = cls(specs, column)
+        for bar in df.tail(max(window for _, window in specs) + 1).to_dict('records'):
+            indicators.update(bar)
+        return indicators
+
+    def update(self, bar):
+        """Feeds one bar and returns {key: value} for it."""
+        return {key: indicator.update(bar) for key, indicator in self.indicators.items()}
+
+    @property
+    def value(self):
+        return {key: indicator.value for key, indicator in self.indicators.items()}
+
+
+class SparseTable:
+    """Range argmin/argmax over one column. Level k holds the position of the extreme of every
+    block of 2**k bars, so any range is covered by two overlapping blocks and answered in O(1).
+    Ties go to the leftmost bar and NaNs are skipped, like pandas idxmin/idxmax.
+    Levels are built on first use, so short range queries only pay for the levels they need."""
+
+    def __init__(self, values, kind='min'):
+        if kind not in ('min', 'max'):
+            raise ValueError("kind must be 'min' or 'max'")
+        values = np.asarray(values, dtype=np.float64)
+        #A max query is a min query on the negated values, NaNs can never be the extreme
+        keys = values if kind == 'min' else -values
+        if np.isnan(keys).any():
+            keys = np.where(np.isnan(keys), np.inf, keys)
+        self.kind = kind
+        self._keys = keys
+        self._n = len(keys)
+        dtype = np.int32 if self._n < 2**31 else np.int64
+        self._levels = [np.arange(self._n, dtype=dtype)]
+        #Detectors can share a table across threads, levels are appended in order under the lock
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return self._n
+
+    def slice(self, lo, hi):
+        """Table over values[lo:hi] reusing the levels built so far, positions relative to lo."""
+        levels = [level[lo:hi - (1 << k) + 1] - lo for k, level in enumerate(self._levels) if (1 << k) <= hi - lo]
+        for level in levels:
+            level.setflags(write=False)
+        return SparseTable.from_levels(self.kind, self._keys[lo:hi], levels or [np.arange(0, dtype=np.int32)])
+
+    @classmethod
+    def from_levels(cls, kind, keys, levels):
+        #Rebuilds a table around already computed keys and levels (e.g. views of shared memory)
+        table = cls.__new__(cls)
+        table.kind = kind
+        table._keys = keys
+        table._n = len(keys)
+        table._levels = list(levels)
+        table._lock = threading.Lock()
+        return table
+
+    def _level(self, k):
+        if k < len(self._levels):
+            return self._levels[k]
+        with self._lock:
+            while len(self._levels) <= k:
+                prev = self._levels[-1]
+                half = 1 << (len(self._levels) - 1)
+                left, right = prev[:len(prev) - half], prev[half:]
+                level = np.where(self._keys[right] < self._keys[left], right, left)
+                level.setflags(write=False)
+                self._levels.append(level)
+        return self._levels[k]
+
+    def prebuild(self, max_length):
+        """Builds every level needed for ranges of up to max_length bars."""
+        self._level(max(0, min(int(max_length), self._n)).bit_length() - 1)
+
+    def query(self, start, stop):
+        """Position of the extreme of values[start:stop]."""
+        if not 0 <= start < stop <= self._n:
+            raise IndexError(f"Empty or out of range query [{start}, {stop})")
+        k = int(stop - start).bit_length() - 1
+        level = self._levels[k] if k < len(self._levels) else self._level(k)
+        left, right = level[start], level[stop - (1 << k)]
+        return int(right) if self._keys[right] < self._keys[left] else int(left)
+
+    def query_many(self, starts, stops):
+        """Vectorised query() for arrays of [start, stop) ranges."""
+        starts = np.asarray(starts, dtype=np.int64)
+        stops = np.asarray(stops, dtype=np.int64)
+        lengths = stops - starts
+        if len(starts) and (lengths.min() < 1 or starts.min() < 0 or stops.max() > self._n):
+            raise IndexError("Empty or out of range query")
+
+        result = np.empty(len(starts), dtype=np.int64)
+        ks = np.zeros(len(starts), dtype=np.int64)
+        if len(starts):
+            ks = np.floor(np.log2(lengths)).astype(np.int64)
+        for k in np.unique(ks):
+            rows = np.flatnonzero(ks == k)
+            level = self._level(int(k))
+            left = level[starts[rows]]
+            right = level[stops[rows] - (1 << int(k))]
+            result[rows] = np.where(self._keys[right] < self._keys[left], right, left)
+        return result
+
+
+class Dataset:
+    """Lazily loaded handle on an OHLC csv. The file is only read (or its cache mapped)
+    the first time the frame is needed, so importing this module never touches the data.
+    Numeric column arrays and indicators are computed once and cached on the handle.
+    A Dataset attached to a caller's frame only holds it weakly: the frame holds the Dataset,
+    so dropping the frame frees both at once instead of leaving a cycle for the collector."""
+
+    def __init__(self, path=DATA_PATH, frame=None):
+        self.path = path
+        self._frame = frame
+        self._columns = {}
+        self._swing_points = {}
+        self._range_tables = {}
+        self._candidate_tables = {}
+        self._fingerprint = None  #Set by _attach_dataset
+        self._parent = None  #(dataset, lo, hi) for a view made by slice_frame()
+        self.indicators = IndicatorStore(self)
+
+    def _current_frame(self):
+        return self._frame() if isinstance(self._frame, weakref.ref) else self._frame
+
+    @property
+    def loaded(self):
+        return self._current_frame() is not None
+
+    @property
+    def frame(self):
+        frame = self._current_frame()
+        if frame is None:
+            if self.path is None:
+                raise ReferenceError("The frame this Dataset was built for no longer exists")
+            frame = self._frame = load_data(self.path)
+            _attach_dataset(frame, self, owned=True)
+        return frame
+
+    def __len__(self):
+        return len(self.frame)
+
+    def column(self, name):
+        #Float array for one column, shared read-only between detectors
+        if name not in self._columns:
+            self._columns[name] = _numeric_values(self.frame[name])
+        return self._columns[name]
+
+    @property
+    def open(self):
+        return self.column('Open')
+
+    @property
+    def high(self):
+        return self.column('High')
+
+    @property
+    def low(self):
+        return self.column('Low')
+
+    @property
+    def close(self):
+        return self.column('Close/Last')
+
+    def candles(self):
+        """Body, range and shadow arrays shared by the candlestick detectors, computed once."""
+        if '_candles' not in self.__dict__:
+            open_, close = self.open, self.close
+            self._candles = {
+                'body': np.abs(close - open_),
+                'total_range': self.high - self.low,
+                'upper_shadow': self.high - np.maximum(open_, close),
+                'lower_shadow': np.minimum(open_, close) - self.low
+            }
+            for values in self._candles.values():
+                values.setflags(write=False)
+        return self._candles
+
+    def swing_points(self, column, kind='max'):
+        """Sorted indices of the strict local maxima ('max') or minima ('min') of a column,
+        bars above (or below) both neighbours. Built once and shared by the chart pattern detectors."""
+        key = (column, kind)
+        if key not in self._swing_points:
+            values = self.column(column)
+            middle, before, after = values[1:-1], values[:-2], values[2:]
+            if kind == 'max':
+                is_swing = (middle > before) & (middle > after)
+            else:
+                is_swing = (middle < before) & (middle < after)
+            points = np.flatnonzero(is_swing) + 1
+            points.setflags(write=False)
+            self._swing_points[key] = points
+        return self._swing_points[key]
+
+    def window_swing_points(self, column, kind, window_start, window_end):
+        #Swing points inside rows [window_start, window_end), the window's first and last bars have
+        #no neighbour on one side so they never count, same as rescanning the window
+        points = self.swing_points(column, kind)
+        lo, hi = np.searchsorted(points, (window_start + 1, window_end - 1))
+        return points[lo:hi]
+
+    def range_table(self, column, kind='min'):
+        """SparseTable for range argmin ('min') or argmax ('max') queries on a column, built once."""
+        key = (column, kind)
+        if key not in self._range_tables:
+            parent, lo, hi = self._parent or (None, 0, 0)
+            if parent is not None and key in parent._range_tables:
+                self._range_tables[key] = parent._range_tables[key].slice(lo, hi)
+            else:
+                self._range_tables[key] = SparseTable(self.column(column), kind)
+        return self._range_tables[key]
+
+    def argmin(self, column, start, stop):
+        #Position of the lowest value in rows [start, stop), same as df[column].iloc[start:stop].idxmin()
+        return self.range_table(column, 'min').query(start, stop)
+
+    def argmax(self, column, start, stop):
+        return self.range_table(column, 'max').query(start, stop)
+
+    def candidate_table(self, build, **geometry):
+        """Columnar table of a detector's geometric candidates and their raw metrics, built once by
+        build(self, **geometry) and shared by every threshold setting with the same geometry.
+        The CANDIDATE_TABLES_KEPT most recently used tables are kept."""
+        key = (build.__name__, *sorted(geometry.items()))
+        table = self._candidate_tables.pop(key, None)
+        if table is None:
+            table = build(self, **geometry)
+            for values in table.values():
+                values.setflags(write=False)
+        self._candidate_tables[key] = table
+        for stale in list(self._candidate_tables)[:-CANDIDATE_TABLES_KEPT]:
+            self._candidate_tables.pop(stale, None)
+        return table
+
+    def clear_candidate_tables(self):
+        """Drops every cached candidate table, e.g. once a sweep over pattern geometries is done."""
+        self._candidate_tables.clear()
+
+    def prepare_features(self):
+        """Loads the OHLC columns as contiguous arrays and computes every feature the registered
+        detectors share (candles, indicators, swing points, range tables) in one go."""
+        for name in ('Open', 'High', 'Low', 'Close/Last'):
+            self.column(name)
+        self.candles()
+        for name, window in SHARED_INDICATORS:
+            self.indicators.get(name, window)
+        if 'Volume' in self.frame.columns:
+            self.indicators.sma(5, 'Volume')
+        for column, kind in SHARED_SWING_POINTS:
+            self.swing_points(column, kind)
+        for column, kind in SHARED_RANGE_TABLES:
+            self.range_table(column, kind).prebuild(SHARED_RANGE_LENGTH)
+        return self
+
+    def slice_frame(self, lo, hi):
+        """Rows [lo, hi) of the frame as a new frame, without copying, whose Dataset is a view of
+        this one: columns, candles, indicators, swing points and range tables already built here
+        are shared as views of this dataset's arrays instead of being recomputed for the slice."""
+        frame = self.frame.iloc[lo:hi].reset_index(drop=True)
+        dataset = Dataset(path=None, frame=frame)
+        dataset._parent = (self, lo, hi)
+        dataset._columns = {name: values[lo:hi] for name, values in self._columns.items()}
+        if '_candles' in self.__dict__:
+            dataset._candles = {name: values[lo:hi] for name, values in self._candles.items()}
+        dataset.indicators = IndicatorStore(dataset, self.indicators.counts)
+        dataset.indicators._values = {key: values[lo:hi] for key, values in self.indicators._values.items()}
+        for key, points in self._swing_points.items():
+            #The slice's first and last bars have no neighbour inside it, so they are never swing points
+            first, last = np.searchsorted(points, (lo + 1, hi - 1))
+            points = points[first:last] - lo
+            points.setflags(write=False)
+            dataset._swing_points[key] = points
+        _attach_dataset(frame, dataset)
+        return frame
+
+    def export_features(self):
+        """Every array the detectors read from this dataset (columns, dates, candles, indicators,
+        swing points, range tables) keyed by where it belongs, for SharedArrays.
+        Columns are exported in frame order, non-numeric columns other than Date are left out."""
+        frame = self.frame
+        arrays = {('date',): frame['Date'].to_numpy()}
+        for name in frame.columns:
+            if name != 'Date' and (name in self._columns or pd.api.types.is_numeric_dtype(frame[name])):
+                arrays[('column', name)] = self.column(name)
+        for name, values in self.candles().items():
+            arrays[('candle', name)] = values
+        for key, values in self.indicators._values.items():
+            arrays[('indicator',) + key] = values
+        for key, points in self._swing_points.items():
+            arrays[('swing',) + key] = points
+        for key, table in self._range_tables.items():
+            arrays[('range',) + key + ('keys',)] = table._keys
+            for k, level in enumerate(table._levels):
+                arrays[('range',) + key + (k,)] = level
+        return arrays
+
+    @classmethod
+    def from_features(cls, arrays):
+        """Dataset over arrays produced by export_features(), wrapping them without copying."""
+        columns = {key[1]: values for key, values in arrays.items() if key[0] == 'column'}
+        frame = pd.DataFrame({'Date': arrays[('date',)], **columns}, copy=False)
+        dataset = cls(path=None, frame=frame)
+        dataset._columns.update(columns)
+        dataset._candles = {key[1]: values for key, values in arrays.items() if key[0] == 'candle'}
+        dataset.indicators._values.update({key[1:]: values for key, values in arrays.items() if key[0] == 'indicator'})
+        dataset._swing_points.update({key[1:]: values for key, values in arrays.items() if key[0] == 'swing'})
+        for key, values in arrays.items():
+            if key[0] == 'range' and key[-1] == 'keys':
+                column, kind = key[1:3]
+                levels = []
+                while ('range', column, kind, len(levels)) in arrays:
+                    levels.append(arrays[('range', column, kind, len(levels))])
+                dataset._range_tables[(column, kind)] = SparseTable.from_levels(kind, values, levels)
+        _attach_dataset(frame, dataset, owned=True)
+        return dataset
+
+    def _date_keys(self):
+        #Dates as sorted int64 nanoseconds plus the row each one came from, built once per dataset
+        if '_sorted_dates' not in self.__dict__:
+            keys = pd.DatetimeIndex(self.frame['Date']).as_unit('ns').asi8
+            order = np.argsort(keys, kind='stable')
+            self._sorted_dates = (keys[order], order)
+        return self._sorted_dates
+
+    def positions(self, dates):
+        """Row positions of each date (the first row if a date repeats) using a binary search
+        over the sorted dates. Raises ValueError if any date is not in the dataset."""
+        sorted_keys, order = self._date_keys()
+        keys = pd.DatetimeIndex(pd.to_datetime(np.atleast_1d(dates))).as_unit('ns').asi8
+        if len(sorted_keys) == 0:
+            raise ValueError("Date not found in the dataset.")
+        found = np.minimum(np.searchsorted(sorted_keys, keys), len(sorted_keys) - 1)
+        if not (sorted_keys[found] == keys).all():
+            raise ValueError("Date not found in the dataset.")
+        return order[found]
+
+
+#Columns the detectors read, fingerprinted so a cached Dataset is dropped once any of them changes
+FINGERPRINT_COLUMNS = ['Date', 'Open', 'High', 'Low', 'Close/Last', 'Volume']
+
+
+def _frame_fingerprint(df):
+    #Length plus the address of each column's data, O(1) in the number of rows. The attached Dataset
+    #pins a shallow copy of the frame, so under copy-on-write any edit (df.loc included) moves the
+    #edited column to new memory instead of writing into the arrays the cache holds views of
+    parts = [len(df)]
+    for name in FINGERPRINT_COLUMNS:
+        if name in df.columns:
+            values = df[name].to_numpy()
+            parts.append((name, values.__array_interface__['data'][0], values.dtype.str, values.strides))
+    return tuple(parts)
+
+
+def _attach_dataset(df, dataset, owned=False):
+    #Stored in the frame's __dict__ rather than df.attrs, which pandas deep-copies on every operation.
+    #The pinned copy also keeps the old column memory alive, so its addresses cannot be reused.
+    #Only a Dataset that made its frame itself (owned) keeps it alive
+    dataset._pinned = df.copy(deep=False)
+    dataset._fingerprint = _frame_fingerprint(df)
+    if not owned:
+        dataset._frame = weakref.ref(df)
+    object.__setattr__(df, '_pattern_dataset', dataset)
+
+
+def get_dataset(df):
+    """Returns the Dataset attached to df, creating it on first use so every detector
+    called on the same frame shares one set of column arrays and indicators.
+    The cached Dataset is rebuilt if the frame's prices or dates were edited since,
+    and only lives as long as the frame does."""
+    if isinstance(df, Dataset):
+        return df
+    dataset = df.__dict__.get('_pattern_dataset')
+    if dataset is None or dataset._current_frame() is not df or dataset._fingerprint != _frame_fingerprint(df):
+        dataset = Dataset(path=None, frame=df)
+        _attach_dataset(df, dataset)
+    return dataset
+
+
+#Default dataset used by trade() and the command line entry point
+DATASET = Dataset()
+
+
+class SharedArrays:
+    """Named NumPy arrays packed into one multiprocessing.shared_memory block.
+    The creating process owns the block and frees it on close(); other processes call attach()
+    with the picklable handle and get read-only views of the same memory, nothing is copied."""
+
+    ALIGNMENT = 64
+
+    def __init__(self, arrays):
+        layout = {}
+        size = 0
+        for key, values in arrays.items():
+            offset = -(-size // self.ALIGNMENT) * self.ALIGNMENT
+            layout[key] = (offset, values.shape, values.dtype.str)
+            size = offset + values.nbytes
+
+        self._shm = shared_memory.SharedMemory(create=True, size=max(size, 1))
+        for key, values in arrays.items():
+            offset, shape, dtype = layout[key]
+            np.ndarray(shape, dtype=dtype, buffer=self._shm.buf, offset=offset)[...] = values
+        self.handle = (self._shm.name, layout)
+
+    @staticmethod
+    def attach(handle):
+        """Returns (shared memory block, {key: array}), keep the block referenced while the arrays are used."""
+        name, layout = handle
+        shm = shared_memory.SharedMemory(name=name)
+        arrays = {}
+        for key, (offset, shape, dtype) in layout.items():
+            values = np.ndarray(shape, dtype=dtype, buffer=shm.buf, offset=offset)
+            values.setflags(write=False)
+            arrays[key] = values
+        return shm, arrays
+
+    def close(self):
+        self._shm.close()
+        self._shm.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+#Datasets a worker process has already attached to, keyed by shared memory name
+_WORKER_DATASETS = {}
+
+
+def _shared_dataset(handle):
+    name = handle[0]
+    if name not in _WORKER_DATASETS:
+        _WORKER_DATASETS.clear()
+        shm, arrays = SharedArrays.attach(handle)
+        _WORKER_DATASETS[name] = (shm, Dataset.from_features(arrays))
+    return _WORKER_DATASETS[name][1]
+
+
+def _run_shared_pattern(handle, func_name, params=None):
+    #Worker side: runs one detector on the shared dataset, returns its printed output and
+    #either its PatternResult or the exception it raised
+    dataset = _shared_dataset(handle)
+    output = io.StringIO()
+    with contextlib.redirect_stdout(output):
+        try:
+            result = globals()[func_name](dataset.frame, **(params or {}))
+        except Exception as e:
+            result = e
+    return output.getvalue(), result
+
 
-df = load_data()
+def _pool_context():
+    #fork starts workers without re-importing this module, spawn is the portable fallback
+    return get_context('fork' if 'fork' in get_all_start_methods() else 'spawn')
 
 
+def run_patterns_parallel(df, pattern_names=None, workers=None, **params):
+    """Runs detectors in a process pool, one detector per task, each called with params. The dataset's
+    columns and shared features are placed in shared memory once and each worker attaches to them
+    without copying, so only the detector name goes out and only its trades table comes back.
+    Returns {function name: (printed output, PatternResult or the raised exception)}."""
+    pattern_names = list(pattern_names or PATTERN_REGISTRY)
+    workers = min(workers or os.cpu_count() or 1, len(pattern_names))
+    data = get_dataset(df).prepare_features()
+
+    with SharedArrays(data.export_features()) as shared:
+        with ProcessPoolExecutor(max_workers=workers, mp_context=_pool_context()) as pool:
+            futures = {name: pool.submit(_run_shared_pattern, shared.handle, name, params) for name in pattern_names}
+            return {name: future.result() for name, future in futures.items()}
+
 
 
 def prepare_visualisation_data(df, trades_results):
@@ -75,7 +1001,9 @@ def prepare_visualisation_data(df, trades_results):
         pattern_name = PATTERN_REGISTRY.get(func_name, "Unknown Pattern")
         
         #Handle different return types
-        if isinstance(result, tuple):
+        if isinstance(result, PatternResult):
+            trades_df = result.trades
+        elif isinstance(result, tuple):
             trades_df = result[0]  
         elif isinstance(result, list):
             trades_df = pd.DataFrame(result)
@@ -1200,608 +2128,1066 @@ def save_visualisation(df, trades_dfs, output_path='trading_visualization.html')
         return False
 
 
-def trade(date, stoploss, stopprofit, days):
-    point = df.index[df['Date'] == date]
-    if len(point) == 0:
-        raise ValueError("Date not found in the dataset.")
-    point = point[0]
-
-    buyprice = df["Open"][point]
-    sellprice = 0
-    stop = False
-
-    for day in range(days):
-        #Ensure point + day does not exceed the DataFrame length
-        if point + day >= len(df):
+#Trades simulated per chunk, bounds the (trades x max_days) windows held in memory
+EXIT_CHUNK_SIZE = 65536
+#Scan windows evaluated per chunk when building candidate tables, bounds the per-window arrays
+CANDIDATE_CHUNK_SIZE = 65536
+#Candidate tables a Dataset keeps, the least recently used is dropped beyond this
+CANDIDATE_TABLES_KEPT = 8
+
+
+def _window_rows(values, start_idx, width):
+    #Rows of `width` consecutive values starting at each index, NaN past the end of the data
+    n = len(values)
+    full = start_idx + width <= n
+    if full.all():
+        return sliding_window_view(values, width)[start_idx]
+    rows = np.full((len(start_idx), width), np.nan)
+    if full.any():
+        rows[full] = sliding_window_view(values, width)[start_idx[full]]
+    if not full.all():
+        tail_start = max(0, n - width + 1)
+        tail = np.concatenate((values[tail_start:], np.full(width - 1, np.nan)))
+        rows[~full] = sliding_window_view(tail, width)[start_idx[~full] - tail_start]
+    return rows
+
+
+def _first_true(hits):
+    #Column of the first True in each row, or the row width if there is none
+    return np.where(hits.any(axis=1), hits.argmax(axis=1), hits.shape[1])
+
+
+def atr_exit_multipliers(entry_price, atr, stoploss, stopprofit, stop_atr, target_atr, direction='long'):
+    """Per-trade stop/target multipliers tightened to stop_atr and target_atr ATRs from the entry.
+    A NaN ATR leaves the fixed stoploss/stopprofit in place."""
+    entry_price = np.asarray(entry_price, dtype=np.float64)
+    atr = np.asarray(atr, dtype=np.float64)
+    if direction == 'long':
+        stop = np.fmax(stoploss, 1 - (stop_atr * atr / entry_price))
+        target = np.fmin(stopprofit, 1 + (target_atr * atr / entry_price))
+    else:
+        stop = np.fmin(stoploss, 1 + (stop_atr * atr / entry_price))
+        target = np.fmax(stopprofit, 1 - (target_atr * atr / entry_price))
+    return stop, target
+
+
+def simulate_exits(high, low, close, entry_idx, entry_price, stoploss, stopprofit, max_days,
+                   direction='long', stop_first=False, target_price=None):
+    """Batch exit simulation shared by trade() and every detector.
+
+    Each trade is checked from entry_idx for max_days bars and exits on the first bar that
+    touches its target (entry_price * stopprofit) or stop (entry_price * stoploss); on the same
+    bar the target wins unless stop_first. For 'short' trades the target is below the entry.
+    stoploss/stopprofit are scalars or one multiplier per trade. target_price is an optional
+    absolute target per trade checked alongside the multiplier target.
+    Trades that touch neither are closed at the close of their last bar.
+
+    Returns a dict of arrays: exit_idx, exit_price, profit, reason (1 target, -1 stop,
+    0 held to max_days), stop_level, target_level and complete (all max_days bars exist)."""
+    if max_days < 1:
+        raise ValueError("max_days must be at least 1")
+
+    entry_idx = np.asarray(entry_idx, dtype=np.int64)
+    entry_price = np.asarray(entry_price, dtype=np.float64)
+    n_trades = len(entry_idx)
+    n = len(close)
+
+    stop_level = entry_price * np.broadcast_to(np.asarray(stoploss, dtype=np.float64), (n_trades,))
+    target_level = entry_price * np.broadcast_to(np.asarray(stopprofit, dtype=np.float64), (n_trades,))
+    if target_price is not None:
+        target_price = np.broadcast_to(np.asarray(target_price, dtype=np.float64), (n_trades,))
+
+    #Bar by bar from the entry, a trade drops out once it touches its target or stop (or runs out
+    #of data), so each bar only looks at the trades still open. A trade's outcome is fixed by the
+    #first touch, a later touch of the other level leaves its first bar at max_days
+    first_target = np.full(n_trades, max_days, dtype=np.int64)
+    first_stop = np.full(n_trades, max_days, dtype=np.int64)
+    target_extreme = np.full(n_trades, np.nan)  #Price extreme on the target bar
+
+    active = np.arange(n_trades)
+    for day in range(max_days):
+        bar = entry_idx[active] + day
+        if len(bar) and bar.max() >= n:
+            active, bar = active[bar < n], bar[bar < n]
+        if not len(active):
             break
+        highs, lows = high[bar], low[bar]
+
+        if direction == 'long':
+            target_hits = highs >= target_level[active]
+            if target_price is not None:
+                target_hits |= highs >= target_price[active]
+            stop_hits = lows <= stop_level[active]
+        else:
+            target_hits = lows <= target_level[active]
+            if target_price is not None:
+                target_hits |= lows <= target_price[active]
+            stop_hits = highs >= stop_level[active]
+
+        first_target[active[target_hits]] = day
+        first_stop[active[stop_hits]] = day
+        target_extreme[active[target_hits]] = (highs if direction == 'long' else lows)[target_hits]
+        active = active[~(target_hits | stop_hits)]
+
+    if stop_first:
+        hit_stop = (first_stop < max_days) & (first_stop <= first_target)
+        hit_target = (first_target < max_days) & ~hit_stop
+    else:
+        hit_target = (first_target < max_days) & (first_target <= first_stop)
+        hit_stop = (first_stop < max_days) & ~hit_target
+
+    timeout_idx = np.minimum(entry_idx + max_days - 1, n - 1)
+    reason = np.where(hit_target, 1, np.where(hit_stop, -1, 0))
+    exit_idx = np.where(hit_target, entry_idx + first_target,
+                        np.where(hit_stop, entry_idx + first_stop, timeout_idx))
+
+    target_exit = target_level
+    if target_price is not None:
+        #The absolute target is used whenever the exit bar reached it
+        reached = target_extreme >= target_price if direction == 'long' else target_extreme <= target_price
+        target_exit = np.where(reached, target_price, target_level)
+    exit_price = np.where(hit_target, target_exit, np.where(hit_stop, stop_level, close[timeout_idx]))
+    profit = exit_price - entry_price if direction == 'long' else entry_price - exit_price
 
-        current_high = df["High"][point + day]
-        current_low = df["Low"][point + day]
+    return {
+        'exit_idx': exit_idx,
+        'exit_price': exit_price,
+        'profit': profit,
+        'reason': reason,
+        'stop_level': stop_level,
+        'target_level': target_level,
+        'complete': entry_idx + max_days <= n
+    }
 
-        if not stop and current_high >= stopprofit * buyprice:
-            sellprice = stopprofit * buyprice
-            stop = True
-        elif not stop and current_low <= stoploss * buyprice:
-            sellprice = stoploss * buyprice
-            stop = True
 
-    #If no stop condition is met use last available price within range
-    if not stop:
-        if point + days - 1 >= len(df):
-            sellprice = df["Close/Last"].iloc[-1]  #Use last available price
+def exit_surface(high, low, close, entry_idx, entry_price, stoplosses, stopprofits, max_days_values,
+                 direction='long', stop_first=False):
+    """simulate_exits for a whole grid of exit rules over the same entries in one pass.
+
+    The running High and Low extremes from each entry give the first bar every stop and target
+    level is touched, so each (stoploss, stopprofit, max_days) combination is just a comparison
+    of first-passage times. Rules match simulate_exits with scalar multipliers.
+
+    Returns a dict with the stoploss, stopprofit and max_days axes, the total profit and the
+    winning trade count as (stop x target x days) cubes, and the number of trades."""
+    stoplosses = np.atleast_1d(np.asarray(stoplosses, dtype=np.float64))
+    stopprofits = np.atleast_1d(np.asarray(stopprofits, dtype=np.float64))
+    days = np.atleast_1d(np.asarray(max_days_values, dtype=np.int64))
+    if len(days) and days.min() < 1:
+        raise ValueError("max_days must be at least 1")
+
+    entry_idx = np.asarray(entry_idx, dtype=np.int64)
+    entry_price = np.asarray(entry_price, dtype=np.float64)
+    n = len(close)
+    width = int(days.max()) if len(days) else 1
+    shape = (len(stoplosses), len(stopprofits), len(days))
+    profit = np.zeros(shape)
+    wins = np.zeros(shape, dtype=np.int64)
+
+    #Bounds the (trades x bars x levels) comparisons held in memory at once
+    per_trade = max(width * max(len(stoplosses), len(stopprofits)), len(stoplosses) * len(stopprofits))
+    chunk_size = max(1, (EXIT_CHUNK_SIZE * 64) // per_trade)
+
+    for chunk_start in range(0, len(entry_idx), chunk_size):
+        chunk = slice(chunk_start, chunk_start + chunk_size)
+        idx, price = entry_idx[chunk], entry_price[chunk]
+        highs = _window_rows(high, idx, width)
+        lows = _window_rows(low, idx, width)
+
+        #A level is first touched on the bar where the running extreme reaches it, NaN bars never touch
+        stop_level = price[:, None] * stoplosses
+        target_level = price[:, None] * stopprofits
+        if direction == 'long':
+            best, worst = np.fmax.accumulate(highs, axis=1), np.fmin.accumulate(lows, axis=1)
+            first_target = (~(best[:, :, None] >= target_level[:, None, :])).sum(axis=1)
+            first_stop = (~(worst[:, :, None] <= stop_level[:, None, :])).sum(axis=1)
         else:
-            sellprice = df["Close/Last"][point + days - 1]
+            best, worst = np.fmin.accumulate(lows, axis=1), np.fmax.accumulate(highs, axis=1)
+            first_target = (~(best[:, :, None] <= target_level[:, None, :])).sum(axis=1)
+            first_stop = (~(worst[:, :, None] >= stop_level[:, None, :])).sum(axis=1)
+
+        #Trades x stops x targets for each holding period
+        first_target, first_stop = first_target[:, None, :], first_stop[:, :, None]
+        for k, max_days in enumerate(days):
+            if stop_first:
+                hit_stop = (first_stop < max_days) & (first_stop <= first_target)
+                hit_target = (first_target < max_days) & ~hit_stop
+            else:
+                hit_target = (first_target < max_days) & (first_target <= first_stop)
+                hit_stop = (first_stop < max_days) & ~hit_target
 
-    global totaltrades
-    totaltrades += 1
-    return sellprice - buyprice
+            timeout_close = close[np.minimum(idx + max_days - 1, n - 1)]
+            exit_price = np.where(hit_target, target_level[:, None, :],
+                                  np.where(hit_stop, stop_level[:, :, None], timeout_close[:, None, None]))
+            trade_profit = exit_price - price[:, None, None] if direction == 'long' else price[:, None, None] - exit_price
+            profit[:, :, k] += trade_profit.sum(axis=0)
+            wins[:, :, k] += (trade_profit > 0).sum(axis=0)
+
+    return {
+        'stoploss': stoplosses,
+        'stopprofit': stopprofits,
+        'max_days': days,
+        'profit': profit,
+        'wins': wins,
+        'trades': len(entry_idx)
+    }
+
+
+def detector_exit_surface(df, detector, stoplosses, stopprofits, max_days_values, **params):
+    """Runs a detector once with params and evaluates exit_surface over the entries it found.
+    Plain multiplier exits only: the ATR-tightened stops some detectors apply and the broadening
+    formation's absolute target are not part of the surface."""
+    func_name = detector if isinstance(detector, str) else detector.__name__
+    result = globals()[func_name](df, **params, verbose=False)
+    data = get_dataset(df)
+    entry_price = result.trades['entry_price'].to_numpy() if not result.trades.empty else np.empty(0)
+    return exit_surface(data.high, data.low, data.close, result.positions['entry_idx'], entry_price,
+                        stoplosses, stopprofits, max_days_values, direction=DIRECTION_REGISTRY[func_name])
+
+
+def _first_per_date(df, pattern_idx, rows=None):
+    #Keeps the first pattern on each date, like the executed_dates checks in the loops.
+    #rows, if given, are returned instead of pattern_idx (e.g. positions in a candidate table)
+    dates = df['Date'].to_numpy()[pattern_idx]
+    first = ~pd.Index(dates).duplicated()
+    return (pattern_idx if rows is None else rows)[first]
+
+
+class PatternResult:
+    """What a detector returns: its trades table, summary statistics and the per trade positions.
+    Unpacks as (trades, total_profit) like the tuples the detectors used to return."""
+
+    def __init__(self, detector, trades, positions=None, stats=None):
+        self.detector = detector
+        self.pattern_name = PATTERN_REGISTRY.get(detector, detector)
+        self.trades = trades
+        self.positions = positions if positions is not None else _positions()
+        self.stats = stats or {}
+
+        profit = trades['profit'] if not trades.empty else pd.Series(dtype=float)
+        self.total_profit = profit.sum() if not trades.empty else 0
+        self.trade_count = len(trades)
+        self.winning_trades = int((profit > 0).sum())
+        self.losing_trades = int((profit <= 0).sum())
+        self.win_rate = self.winning_trades / self.trade_count if self.trade_count else 0
+
+    @property
+    def max_drawdown(self):
+        #Largest fall of the cumulative profit from its running peak, trades taken in exit order
+        if self.trades.empty:
+            return 0.0
+        equity = np.cumsum(self.trades.sort_values('exit_date', kind='stable')['profit'].to_numpy())
+        return float(np.max(np.maximum.accumulate(np.maximum(equity, 0)) - equity))
+
+    def __iter__(self):
+        return iter((self.trades, self.total_profit))
+
+    def __repr__(self):
+        return (f"PatternResult({self.detector!r}, trades={self.trade_count}, "
+                f"total_profit={self.total_profit:.5f})")
+
+
+def _positions(pattern_idx=(), entry_idx=(), exits=None):
+    #Row positions behind each trade, aligned with the rows of the trades table
+    return {
+        'pattern_idx': np.asarray(pattern_idx, dtype=np.int64),
+        'entry_idx': np.asarray(entry_idx, dtype=np.int64),
+        'exit_idx': exits['exit_idx'] if exits is not None else np.empty(0, dtype=np.int64),
+        'reason': exits['reason'] if exits is not None else np.empty(0, dtype=np.int8),
+        'complete': exits['complete'] if exits is not None else np.empty(0, dtype=bool),
+        'stop_level': exits['stop_level'] if exits is not None else np.empty(0),
+        'target_level': exits['target_level'] if exits is not None else np.empty(0)
+    }
 
 
+def _pattern_trades(df, pattern_idx, entry_idx, exit_date_idx, entry_prices, exits, pattern_name,
+                    extra_columns=None):
+    #Trades table in the detectors' column order and the positions behind it,
+    #an empty frame if no patterns were found
+    if len(pattern_idx) == 0:
+        return pd.DataFrame(), _positions()
+
+    dates = df['Date'].to_numpy()
+    return pd.DataFrame({
+        'pattern_date': dates[pattern_idx],
+        'entry_date': dates[entry_idx],
+        'exit_date': dates[exit_date_idx],
+        'entry_price': entry_prices,
+        'exit_price': exits['exit_price'],
+        'profit': exits['profit'],
+        'pattern_name': pattern_name,
+        **(extra_columns or {})
+    }), _positions(pattern_idx, entry_idx, exits)
+
+
+def _first_breakout(close, from_idx, level, width=10, direction='up'):
+    #Offset of the first close above (or below) each level within width bars of from_idx, width if none
+    rows = _window_rows(close, from_idx, width)
+    crossed = rows > level[:, None] if direction == 'up' else rows < level[:, None]
+    return _first_true(crossed)
+
+
+def _scan_swing_points(data, column, kind, start_idx, end_idx, window):
+    #Swing points inside any scan window for c in range(start_idx, end_idx)
+    if end_idx <= start_idx:
+        return np.array([], dtype=np.int64)
+    return data.window_swing_points(column, kind, max(0, start_idx - window), end_idx - 1 + window)
+
+
+def _consecutive_swing_pairs(data, column, kind, start_idx, end_idx, window):
+    """Neighbouring swing points (first_idx, second_idx) that sit together in at least one scan
+    window, rows [max(0, c - window) + 1, c + window - 2] for c in range(start_idx, end_idx).
+    These are exactly the pairs the per-window loops compared, returned in the order the scan
+    first reached them."""
+    points = _scan_swing_points(data, column, kind, start_idx, end_idx, window)
+    first_idx, second_idx = points[:-1], points[1:]
+    first_window = np.maximum(start_idx, second_idx + 2 - window)
+    valid = (first_window < end_idx) & (first_idx >= np.maximum(0, first_window - window) + 1)
+    return first_idx[valid], second_idx[valid]
+
+
+def _next_day_trades(df, pattern_idx, pattern_name, stoploss, stopprofit, max_days,
+                     direction='long', extra_columns=None):
+    #Trades table for single candle patterns: enter on the next day's open and hold for up to max_days
+    if len(pattern_idx) == 0:
+        return pd.DataFrame(), _positions()
+
+    data = get_dataset(df)
+    entry_idx = pattern_idx + 1
+    entry_prices = data.open[entry_idx]
+    exits = simulate_exits(data.high, data.low, data.close, entry_idx, entry_prices,
+                           stoploss, stopprofit, max_days, direction=direction)
+
+    return _pattern_trades(df, pattern_idx, entry_idx, np.minimum(pattern_idx + max_days, len(df)-1),
+                           entry_prices, exits, pattern_name, extra_columns)
+
+
+def trade(date, stoploss, stopprofit, days, dataset=None):
+    dataset = get_dataset(dataset) if dataset is not None else DATASET
+    point = dataset.positions(date)[0]
+
+    #Buy on the open and hold for up to `days` bars
+    exits = simulate_exits(dataset.high, dataset.low, dataset.close, [point], [dataset.open[point]],
+                           stoploss, stopprofit, days)
+    return exits['profit'][0]
+
+
+def trade_many(dates, stoploss, stopprofit, days, dataset=None):
+    """Vectorised trade() for a batch of entry dates, returns a NumPy array of profits.
+    stoploss and stopprofit can be scalars or one value per date."""
+    dataset = get_dataset(dataset) if dataset is not None else DATASET
+    points = dataset.positions(dates)
+
+    exits = simulate_exits(dataset.high, dataset.low, dataset.close, points, dataset.open[points],
+                           stoploss, stopprofit, days)
+    return exits['profit']
+
+
+def _range_rows(df, start=None, end=None):
+    """Rows [first, stop) covered by a start/end range. Integers are row positions like a slice
+    (negative counts from the end, so start=-90 is the last 90 bars), anything else is a date and
+    both ends are inclusive."""
+    n = len(df)
+
+    def row(value, default, side):
+        if value is None:
+            return default
+        if isinstance(value, (int, np.integer)):
+            return min(max(int(value) + n if value < 0 else int(value), 0), n)
+        return int(df['Date'].searchsorted(pd.Timestamp(value), side=side))
+
+    return row(start, 0, 'left'), row(end, n, 'right')
+
+
+def _halo_bars(halo, params):
+    return int(halo(params) if callable(halo) else halo)
+
+
+def detector_range(warmup, lookahead):
+    """Gives a detector keyword-only start/end arguments (see _range_rows) that restrict it to
+    patterns dated inside the range. The detector only runs on the range plus a halo of warmup
+    bars before it (indicators, pattern formation) and lookahead bars after it (breakouts and
+    exits), so a short range costs a short scan. warmup and lookahead are bar counts or
+    functions of the detector's parameters."""
+    def decorate(func):
+        signature = inspect.signature(func)
+        func_name = func.__name__
+
+        @functools.wraps(func)
+        def detector(df, *args, start=None, end=None, **kwargs):
+            if start is None and end is None:
+                return func(df, *args, **kwargs)
+
+            bound = signature.bind(df, *args, **kwargs)
+            bound.apply_defaults()
+            params = dict(bound.arguments)
+            del params['df']
+            verbose = params.pop('verbose', True)
+
+            n = len(df)
+            first, stop = _range_rows(df, start, end)
+            if first >= stop:
+                if verbose:
+                    print(f"\nNo bars between {start} and {end}")
+                return PatternResult(func_name, pd.DataFrame())
+            lo = max(0, first - _halo_bars(warmup, params))
+            hi = min(n, stop + _halo_bars(lookahead, params))
+            if 'lookback_days' in params:
+                params['lookback_days'] = hi - lo  #The slice is the lookback
+
+            #The slice is a view of the frame's Dataset, so features already built for it are reused
+            frame = df if (lo, hi) == (0, n) else get_dataset(df).slice_frame(lo, hi)
+            result = func(frame, **params, verbose=False)
+
+            pattern_idx = result.positions['pattern_idx'] + lo
+            inside = (pattern_idx >= first) & (pattern_idx < stop)
+            trades = result.trades[inside].reset_index(drop=True) if not result.trades.empty else result.trades
+            positions = {key: values[inside] for key, values in result.positions.items()}
+            for key in ('pattern_idx', 'entry_idx', 'exit_idx'):
+                positions[key] = positions[key] + lo
+            result = PatternResult(func_name, trades, positions, result.stats)
+
+            if verbose:
+                if result.trade_count:
+                    print(f"\n{result.pattern_name} Results ({df['Date'].iloc[first]:%Y-%m-%d} to {df['Date'].iloc[stop - 1]:%Y-%m-%d}):")
+                    print(f"Bars Scanned: {hi - lo} of {n}")
+                    print(f"Total Trades: {result.trade_count}")
+                    print(f"Profitable Trades: {result.winning_trades}")
+                    print(f"Win Rate: {result.win_rate * 100:.1f}%")
+                    print(f"Total Profit: ${result.total_profit:.5f}")
+                else:
+                    print(f"\nNo {result.pattern_name} patterns found in the range")
+            return result
+
+        range_parameters = [inspect.Parameter(name, inspect.Parameter.KEYWORD_ONLY, default=None)
+                            for name in ('start', 'end')]
+        detector.__signature__ = signature.replace(parameters=[*signature.parameters.values(), *range_parameters])
+        detector.halo = (warmup, lookahead)
+        return detector
+    return decorate
+
+
+def range_halo(detector, **params):
+    """(warmup, lookahead) bars a detector reads around a start/end range, for params on top of its defaults."""
+    func = globals()[detector] if isinstance(detector, str) else detector
+    defaults = {name: parameter.default for name, parameter in inspect.signature(func).parameters.items()
+                if parameter.default is not inspect.Parameter.empty}
+    warmup, lookahead = func.halo
+    return _halo_bars(warmup, {**defaults, **params}), _halo_bars(lookahead, {**defaults, **params})
+
+
+#Halo each detector needs around a start/end range: indicator warm-up and pattern formation before
+#the first pattern, breakout confirmation and the exit window after the last one
+def _chart_pattern_warmup(params):
+    return 3 * params['max_pattern_days'] + INDICATOR_WARMUP
+
+
+def _chart_pattern_lookahead(params):
+    return 2 * params['max_pattern_days'] + params['max_days'] + 15
+
+
+def _candle_lookahead(params):
+    return params['max_days'] + 2
+
+
+@detector_range(warmup=INDICATOR_WARMUP, lookahead=_candle_lookahead)
 def find_bullishhammer(df, stoploss=0.999, stopprofit=1.006, max_days=5, 
                        body_to_wick_ratio=2.5, max_body_percentage=30, 
-                       lookback_days=3000, min_hammer_size=0.005):
+                       lookback_days=3000, min_hammer_size=0.005, verbose=True):
     
     #Finds bullish hammer patterns.
     
     if not {'Date', 'Close/Last', 'Open', 'High', 'Low'}.issubset(df.columns):
         raise ValueError("CSV must contain 'Date', 'Open', 'High', 'Low', 'Close/Last' columns")
 
-    trade_results = []
-    total_profit = 0
-    executed_dates = set()
-
-    
-    df['SMA10'] = df['Close/Last'].rolling(window=10).mean()
-    df['SMA20'] = df['Close/Last'].rolling(window=20).mean()
-    df['ATR'] = (df['High'] - df['Low']).rolling(window=14).mean()
+    data = get_dataset(df)
+    candles = data.candles()
+    indicators = data.indicators
+    sma10 = indicators.sma(10)
+    sma20 = indicators.sma(20)
+    atr_values = indicators.atr(14)
+
+    #Define range for lookback, skipping the first 20 bars until there's enough data for moving averages
+    start_idx = max(0, len(df) - lookback_days, 20)
+    end_idx = max(start_idx, len(df) - max_days - 1)
+    bars = slice(start_idx, end_idx)
+
+    #Cheap, selective tests run over every bar, the rest only on the bars that pass them
+    idx = start_idx + np.flatnonzero(
+        (data.close[bars] > data.open[bars]) &                                  #Bullish candle
+        (candles['lower_shadow'][bars] >= (candles['total_range'][bars] * 0.65)))  #Lower wick dominance
+
+    open_price = data.open[idx]
+    close_price = data.close[idx]
+    body = candles['body'][idx]
+    total_range = candles['total_range'][idx]
+    lower_shadow = candles['lower_shadow'][idx]
+    upper_shadow = candles['upper_shadow'][idx]
+
+    #Skip if candle is too small relative to ATR
+    large_enough = ~(total_range < atr_values[idx] * 0.5)
+
+    is_hammer = (
+        (body <= (total_range * (max_body_percentage/100))) &    #Small body
+        (lower_shadow >= (body * body_to_wick_ratio)) &          #Long lower wick
+        (upper_shadow <= (lower_shadow * 0.25)) &                #Very short upper wick
+        (total_range >= (open_price * min_hammer_size))          #Minimum size requirement
+    )
+
+    #Trend confirmation, mean of the last 3 closes against the 3 before
+    sma3 = indicators.sma(3)
+    downtrend = (
+        (sma3[idx - 1] < sma3[idx - 4]) &
+        (sma10[idx] < sma20[idx]) &
+        (close_price < sma20[idx])
+    )
+
+    #Volume confirmation
+    if 'Volume' in df.columns:
+        volume_surge = data.column('Volume')[idx] > indicators.sma(5, 'Volume')[idx - 1] * 1.2
+    else:
+        volume_surge = True
+
+    pattern_idx = _first_per_date(df, idx[large_enough & is_hammer & downtrend & volume_surge])
+
+    #Enter on next day's open with dynamic stop loss and take profit based on ATR
+    atrs = atr_values[pattern_idx]
+    dynamic_stoploss, dynamic_stopprofit = atr_exit_multipliers(data.open[pattern_idx + 1], atrs,
+                                                                stoploss, stopprofit, 1.5, 2.5)
+    body = candles['body'][pattern_idx]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        wick_ratio = np.where(body != 0, candles['lower_shadow'][pattern_idx] / body, float('inf'))
+
+    trades_df, positions = _next_day_trades(df, pattern_idx, 'Bullish Hammer', dynamic_stoploss, dynamic_stopprofit,
+                                            max_days, extra_columns={
+                                                'hammer_size': candles['total_range'][pattern_idx] / data.open[pattern_idx],
+                                                'wick_ratio': wick_ratio,
+                                                'atr': atrs
+                                            })
+    total_profit = trades_df['profit'].sum() if not trades_df.empty else 0
     
-    #Define range for lookback
-    start_idx = max(0, len(df) - lookback_days)
-
-    for i in range(start_idx, len(df) - max_days - 1):
-        if i < 20:  #Skip until theres enough data for moving averages
-            continue
-            
-        open_price = df['Open'].iloc[i]
-        close_price = df['Close/Last'].iloc[i]
-        high_price = df['High'].iloc[i]
-        low_price = df['Low'].iloc[i]
-        
-        #Calculate components
-        body = abs(close_price - open_price)
-        total_range = high_price - low_price
-        lower_shadow = min(open_price, close_price) - low_price
-        upper_shadow = high_price - max(open_price, close_price)
-        
-        #Skip if candle is too small relative to ATR
-        if total_range < df['ATR'].iloc[i] * 0.5:
-            continue
-            
-        
-        is_hammer = (
-            close_price > open_price and                          #Bullish candle
-            body <= (total_range * (max_body_percentage/100)) and #Small body
-            lower_shadow >= (body * body_to_wick_ratio) and      #Long lower wick
-            upper_shadow <= (lower_shadow * 0.25) and            #Very short upper wick
-            lower_shadow >= (total_range * 0.65) and             #Lower wick dominance
-            total_range >= (open_price * min_hammer_size)        #Minimum size requirement
-        )
-        
-        #Trend confirmation
-        downtrend = (
-            df['Close/Last'].iloc[i-3:i].mean() < df['Close/Last'].iloc[i-6:i-3].mean() and
-            df['SMA10'].iloc[i] < df['SMA20'].iloc[i] and
-            close_price < df['SMA20'].iloc[i]
-        )
-        
-        #Volume confirmation
-        if 'Volume' in df.columns:
-            volume_surge = df['Volume'].iloc[i] > df['Volume'].iloc[i-5:i].mean() * 1.2
+    if verbose:
+        if not trades_df.empty:
+            print("\nBullish Hammer Results:")
+            print(f"Total Trades: {len(trades_df)}")
+            print(f"Profitable Trades: {len(trades_df[trades_df['profit'] > 0])}")
+            print(f"Win Rate: {len(trades_df[trades_df['profit'] > 0]) / len(trades_df) * 100:.1f}%")
+            print(f"Average Profit: ${total_profit/len(trades_df):.5f}")
+            print(f"Total Profit: ${total_profit:.5f}")
         else:
-            volume_surge = True
-        
-        if is_hammer and downtrend and volume_surge and i < len(df) - max_days:
-            trade_date = df['Date'].iloc[i]
-            if trade_date in executed_dates:
-                continue
-            executed_dates.add(trade_date)
-            
-            entry_price = df['Open'].iloc[i + 1]  #Enter on next day's open
-            
-            #Calculate dynamic stop loss and take profit based on ATR
-            atr = df['ATR'].iloc[i]
-            dynamic_stoploss = max(stoploss, 1 - (1.5 * atr / entry_price))
-            dynamic_stopprofit = min(stopprofit, 1 + (2.5 * atr / entry_price))
-            
-            exit_price = None
-            stop = False
-            
-            for j in range(max_days):
-                current_idx = i + 1 + j
-                if current_idx >= len(df):
-                    break
-                    
-                current_high = df['High'].iloc[current_idx]
-                current_low = df['Low'].iloc[current_idx]
-                
-                if not stop:
-                    if current_high >= entry_price * dynamic_stopprofit:
-                        exit_price = entry_price * dynamic_stopprofit
-                        stop = True
-                    elif current_low <= entry_price * dynamic_stoploss:
-                        exit_price = entry_price * dynamic_stoploss
-                        stop = True
-            
-            if not stop:
-                exit_price = df['Close/Last'].iloc[min(i + max_days, len(df)-1)]
-                
-            profit = exit_price - entry_price
-            total_profit += profit
-            
-            trade_results.append({
-                'pattern_date': df['Date'].iloc[i],
-                'entry_date': df['Date'].iloc[i + 1],
-                'exit_date': df['Date'].iloc[min(i + max_days, len(df)-1)],
-                'entry_price': entry_price,
-                'exit_price': exit_price,
-                'profit': profit,
-                'pattern_name': 'Bullish Hammer',
-                'hammer_size': total_range/open_price,
-                'wick_ratio': lower_shadow/body if body != 0 else float('inf'),
-                'atr': atr
-            })
-
-    trades_df = pd.DataFrame(trade_results)
-    
-    if not trades_df.empty:
-        print("\nBullish Hammer Results:")
-        print(f"Total Trades: {len(trades_df)}")
-        print(f"Profitable Trades: {len(trades_df[trades_df['profit'] > 0])}")
-        print(f"Win Rate: {len(trades_df[trades_df['profit'] > 0]) / len(trades_df) * 100:.1f}%")
-        print(f"Average Profit: ${total_profit/len(trades_df):.5f}")
-        print(f"Total Profit: ${total_profit:.5f}")
-    else:
-        print("\nNo Bullish Hammer patterns found")
+            print("\nNo Bullish Hammer patterns found")
 
-    global totalprofit
-    totalprofit += total_profit
+    return PatternResult('find_bullishhammer', trades_df, positions)
 
-    return trades_df, total_profit
-
-def find_broadeningbottoms(df, stoploss=0.997, stopprofit=1.02, max_days=25, n_candles=4):
+@detector_range(warmup=1, lookahead=lambda params: params['n_candles'] + params['max_days'] + 1)
+def find_broadeningbottoms(df, stoploss=0.997, stopprofit=1.02, max_days=25, n_candles=4, verbose=True):
     """Identifies broadening bottom reversals.
     Parameters: stoploss=0.997, stopprofit=1.02, max_days=25, n_candles=4"""
     if not {'Date', 'Close/Last', 'Open', 'High', 'Low'}.issubset(df.columns):
         raise ValueError("DataFrame must contain 'Date', 'Open', 'High', 'Low', 'Close/Last' columns")
 
-    trade_results = []  
-    total_profit = 0
-
-    for i in range(len(df) - max_days - n_candles + 1):
-        highs = df['High'][i:i + n_candles].tolist()
-        lows = df['Low'][i:i + n_candles].tolist()
-        
-        if all(highs[j] > highs[j - 1] for j in range(1, n_candles)) and \
-           all(lows[j] < lows[j - 1] for j in range(1, n_candles)):
-            
-            entry_price = df['Open'][i + n_candles - 1]
-            exit_price = None
-            stop = False
-
-            for day in range(max_days):
-                if not stop and df["High"][i + n_candles - 1 + day] >= stopprofit * entry_price:
-                    exit_price = stopprofit * entry_price
-                    stop = True
-                elif not stop and df["Low"][i + n_candles - 1 + day] <= stoploss * entry_price:
-                    exit_price = stoploss * entry_price
-                    stop = True
-
-            if not stop:
-                exit_price = df["Close/Last"][i + n_candles - 1 + max_days - 1]
-
-            profit = exit_price - entry_price
-            total_profit += profit
-            
-            trade_results.append({
-                'pattern_date': df['Date'][i],
-                'entry_date': df['Date'][i + n_candles - 1],
-                'exit_date': df['Date'][i + n_candles - 1 + max_days - 1],
-                'entry_price': entry_price,
-                'exit_price': exit_price,
-                'profit': profit,
-                'pattern_name': 'Broadening Bottoms'
-            })
-
-    trades_df = pd.DataFrame(trade_results)
-    
-    if not trades_df.empty:
-        print("\nBroadening Bottoms Results:")
-        print(f"Total Trades: {len(trades_df)}")
-        print(f"Profitable Trades: {len(trades_df[trades_df['profit'] > 0])}")
-        print(f"Win Rate: {len(trades_df[trades_df['profit'] > 0]) / len(trades_df) * 100:.1f}%")
-        print(f"Total Profit: ${total_profit:.2f}")
-    else:
-        print("\nNo Broadening Bottom patterns found")
+    data = get_dataset(df)
+    high, low = data.high, data.low
+
+    #Each high above the one before and each low below it, for n_candles in a row
+    n_starts = max(0, len(df) - max_days - n_candles + 1)
+    broadening = np.ones(n_starts, dtype=bool)
+    for j in range(1, n_candles):
+        broadening &= (high[j:j + n_starts] > high[j - 1:j - 1 + n_starts]) & \
+                      (low[j:j + n_starts] < low[j - 1:j - 1 + n_starts])
+    patterns = np.flatnonzero(broadening)
+
+    #Enter on the open of the last candle of the formation
+    entry_idx = patterns + n_candles - 1
+    entry_prices = data.open[entry_idx]
+    exits = simulate_exits(data.high, data.low, data.close, entry_idx, entry_prices,
+                           stoploss, stopprofit, max_days)
+
+    trades_df, positions = _pattern_trades(df, patterns, entry_idx, entry_idx + max_days - 1, entry_prices, exits,
+                                           'Broadening Bottoms')
+    total_profit = trades_df['profit'].sum() if not trades_df.empty else 0
 
-    global totalprofit
-    totalprofit += total_profit
+    if verbose:
+        if not trades_df.empty:
+            print("\nBroadening Bottoms Results:")
+            print(f"Total Trades: {len(trades_df)}")
+            print(f"Profitable Trades: {len(trades_df[trades_df['profit'] > 0])}")
+            print(f"Win Rate: {len(trades_df[trades_df['profit'] > 0]) / len(trades_df) * 100:.1f}%")
+            print(f"Total Profit: ${total_profit:.2f}")
+        else:
+            print("\nNo Broadening Bottom patterns found")
 
-    return trades_df, total_profit  
+    return PatternResult('find_broadeningbottoms', trades_df, positions)
 
-def find_broadening_formations(df, stoploss=0.995, stopprofit=1.008, max_days=10, min_pattern_days=3):
+@detector_range(warmup=lambda params: params['min_pattern_days'] + INDICATOR_WARMUP,
+                lookahead=lambda params: params['min_pattern_days'] + 2 * params['max_days'] + 2)
+def find_broadening_formations(df, stoploss=0.995, stopprofit=1.008, max_days=10, min_pattern_days=3, verbose=True):
     """Identifies broadening formations with horizontal support and ascending resistance.
     Parameters: stoploss=0.995, stopprofit=1.008, max_days=10, min_pattern_days=3"""
-    def is_horizontal_support(prices, tolerance=0.002):  
-        lows = sorted(prices)
-        return abs(lows[0] - lows[-1]) / lows[0] < tolerance
-    
-    def is_ascending_resistance(prices, tolerance=0.001):
-        return all(prices[i] > prices[i-1] * (1 + tolerance) for i in range(1, len(prices)))
-    
-    def calculate_atr(high, low, close, period=14):
-        #Calculate Average True Range for volatility
-        tr = pd.DataFrame()
-        tr['h-l'] = high - low
-        tr['h-pc'] = abs(high - close.shift(1))
-        tr['l-pc'] = abs(low - close.shift(1))
-        tr['tr'] = tr[['h-l', 'h-pc', 'l-pc']].max(axis=1)
-        return tr['tr'].rolling(period).mean()
-    
-    #Calculate ATR for the whole dataset
-    atr = calculate_atr(df['High'], df['Low'], df['Close/Last'])
-    
-    trades = []
-    total_profit = 0
-    
-    for i in range(len(df) - min_pattern_days - max_days - max_days):
-        pattern_window = df.iloc[i:i + min_pattern_days]
-        
-        lows = pattern_window['Low'].tolist()
-        highs = pattern_window['High'].tolist()
-        
-        #Skip if ATR is too high (volatile period)
-        current_atr = atr.iloc[i + min_pattern_days]
-        if pd.notna(current_atr) and current_atr > pattern_window['Close/Last'].mean() * 0.006:
-            continue
-            
-        if not (is_horizontal_support(lows) and is_ascending_resistance(highs)):
-            continue
-            
-        pattern_height = max(highs) - min(lows)
-        
-        #Skip if pattern is too wide relative to price
-        if pattern_height / min(lows) > 0.02:  
-            continue
-            
-        target_price = max(highs) + (pattern_height * 0.382)  #More conservative target (38.2% Fibonacci)
-        pattern_support = min(lows)
-        
-        pattern_end_idx = i + min_pattern_days
-        
-        #Check trend direction
-        if pattern_end_idx >= 20:
-            sma20 = df['Close/Last'].iloc[pattern_end_idx-20:pattern_end_idx].mean()
-            sma5 = df['Close/Last'].iloc[pattern_end_idx-5:pattern_end_idx].mean()
-            if sma5 <= sma20:  #Only take trades in uptrend
-                continue
-        
-        entry_price = None
-        entry_date = None
-        
-        for j in range(max_days):
-            entry_idx = pattern_end_idx + j
-            if entry_idx >= len(df):
-                break
-                
-            current_low = df['Low'].iloc[entry_idx]
-            
-            #More conservative entry criteria
-            if (current_low <= pattern_support * 1.002 and 
-                df['Close/Last'].iloc[entry_idx] > df['Open'].iloc[entry_idx]):  #Only enter on bullish candles
-                entry_price = df['Close/Last'].iloc[entry_idx]
-                entry_date = df['Date'].iloc[entry_idx]
-                break
-        
-        if entry_price is None or entry_date is None:
-            continue
-            
-        exit_price = None
-        exit_date = None
-        
-        for k in range(max_days):
-            exit_idx = entry_idx + k + 1
-            if exit_idx >= len(df):
-                break
-                
-            high = df['High'].iloc[exit_idx]
-            low = df['Low'].iloc[exit_idx]
-            current_date = df['Date'].iloc[exit_idx]
-            
-            if low <= entry_price * stoploss:
-                exit_price = entry_price * stoploss
-                exit_date = current_date
-                break
-            elif high >= target_price:
-                exit_price = target_price
-                exit_date = current_date
-                break
-            elif high >= entry_price * stopprofit:
-                exit_price = entry_price * stopprofit
-                exit_date = current_date
-                break
-        
-        if exit_price is not None and exit_date is not None:
-            profit = exit_price - entry_price
-            total_profit += profit
-            
-            trades.append({
-                'pattern_date': df['Date'].iloc[pattern_end_idx],
-                'entry_date': entry_date,
-                'exit_date': exit_date,
-                'entry_price': entry_price,
-                'exit_price': exit_price,
-                'target_price': target_price,
-                'profit': profit,
-                'profit_pct': (profit / entry_price) * 100,
-                'pattern_name': 'Broadening Formations'
-            })
-    
-    trades_df = pd.DataFrame(trades)
-    if not trades_df.empty:
-        print(f"\nBroadening Formations Results:")
-        print(f"Total trades: {len(trades_df)}")
-        print(f"Profitable trades: {len(trades_df[trades_df['profit'] > 0])}")
-        print(f"Win rate: {len(trades_df[trades_df['profit'] > 0]) / len(trades_df) * 100:.1f}%")
-        print(f"Total profit: ${total_profit:.2f}")
-    global totalprofit
-    totalprofit += total_profit
-    return trades_df, total_profit
-
-def find_flags_high_and_tight(df, stoploss=0.984, stopprofit=1.04, max_days=12):
+    support_tolerance = 0.002
+    resistance_tolerance = 0.001
+
+    data = get_dataset(df)
+    open_, high, low, close = data.open, data.high, data.low, data.close
+
+    #Average True Range for volatility, shared through the dataset's indicator store
+    atr = data.indicators.true_range_atr(14)
+
+    #Ascending resistance: every high in the window clears the previous one by the tolerance
+    n_starts = max(0, len(df) - min_pattern_days - max_days - max_days)
+    idx = np.arange(n_starts)
+    ascending = np.ones(n_starts, dtype=bool)
+    for j in range(1, min_pattern_days):
+        ascending &= high[j:j + n_starts] > high[j - 1:j - 1 + n_starts] * (1 + resistance_tolerance)
+    idx = idx[ascending]
+
+    #Window rows are only gathered for the starts that pass the cheap test
+    pattern_end_idx = idx + min_pattern_days
+    lows = _window_rows(low, idx, min_pattern_days)
+    highs = _window_rows(high, idx, min_pattern_days)
+    pattern_support = lows.min(axis=1)
+    pattern_top = highs.max(axis=1)
+    pattern_height = pattern_top - pattern_support
+
+    #Skip if ATR is too high (volatile period)
+    current_atr = atr[pattern_end_idx]
+    window_mean = _window_rows(close, idx, min_pattern_days).mean(axis=1)
+    calm = np.isnan(current_atr) | ~(current_atr > window_mean * 0.006)
+
+    #Horizontal support, and skip if pattern is too wide relative to price
+    formation = (
+        calm &
+        (np.abs(pattern_support - lows.max(axis=1)) / pattern_support < support_tolerance) &
+        ~(pattern_height / pattern_support > 0.02)
+    )
+
+    #Check trend direction, only take trades in uptrend once there are 20 bars of history
+    has_history = pattern_end_idx >= 20
+    trend_rows = np.flatnonzero(formation & has_history)
+    sma20 = _window_rows(close, pattern_end_idx[trend_rows] - 20, 20).mean(axis=1)
+    sma5 = _window_rows(close, pattern_end_idx[trend_rows] - 5, 5).mean(axis=1)
+    formation[trend_rows[sma5 <= sma20]] = False
+
+    idx = idx[formation]
+    pattern_end_idx = pattern_end_idx[formation]
+    pattern_support = pattern_support[formation]
+    target_price = pattern_top[formation] + (pattern_height[formation] * 0.382)  #More conservative target (38.2% Fibonacci)
+
+    #More conservative entry criteria, first bullish candle within max_days that tests the support
+    entry_hits = ((_window_rows(low, pattern_end_idx, max_days) <= pattern_support[:, None] * 1.002) &
+                  (_window_rows(close, pattern_end_idx, max_days) > _window_rows(open_, pattern_end_idx, max_days)))
+    entry_offset = _first_true(entry_hits)
+    entered = entry_offset < max_days
+    pattern_end_idx = pattern_end_idx[entered]
+    entry_idx = pattern_end_idx + entry_offset[entered]
+    target_price = target_price[entered]
+    entry_prices = close[entry_idx]
+
+    #Exits start the bar after the entry; the stop is checked before either target and
+    #positions that hit nothing within max_days are not counted as trades
+    exits = simulate_exits(data.high, data.low, data.close, entry_idx + 1, entry_prices,
+                           stoploss, stopprofit, max_days, stop_first=True, target_price=target_price)
+    closed = exits['reason'] != 0
+
+    trades_df = pd.DataFrame()
+    positions = _positions()
+    if closed.any():
+        dates = df['Date'].to_numpy()
+        entry_prices = entry_prices[closed]
+        profit = exits['exit_price'][closed] - entry_prices
+        trades_df = pd.DataFrame({
+            'pattern_date': dates[pattern_end_idx[closed]],
+            'entry_date': dates[entry_idx[closed]],
+            'exit_date': dates[exits['exit_idx'][closed]],
+            'entry_price': entry_prices,
+            'exit_price': exits['exit_price'][closed],
+            'target_price': target_price[closed],
+            'profit': profit,
+            'profit_pct': (profit / entry_prices) * 100,
+            'pattern_name': 'Broadening Formations'
+        })
+        positions = _positions(pattern_end_idx[closed], entry_idx[closed],
+                               {key: value[closed] for key, value in exits.items()})
+    total_profit = trades_df['profit'].sum() if not trades_df.empty else 0
+
+    if verbose:
+        if not trades_df.empty:
+            print(f"\nBroadening Formations Results:")
+            print(f"Total trades: {len(trades_df)}")
+            print(f"Profitable trades: {len(trades_df[trades_df['profit'] > 0])}")
+            print(f"Win rate: {len(trades_df[trades_df['profit'] > 0]) / len(trades_df) * 100:.1f}%")
+            print(f"Total profit: ${total_profit:.2f}")
+
+    return PatternResult('find_broadening_formations', trades_df, positions)
+
+@detector_range(warmup=1, lookahead=lambda params: params['max_days'] + 6)
+def find_flags_high_and_tight(df, stoploss=0.984, stopprofit=1.04, max_days=12, verbose=True):
     """Identifies Flags High and Tight patterns and returns trades DataFrame
     Parameters: stoploss=0.984, stopprofit=1.04, max_days=12"""
     if not {'Date', 'Close/Last', 'Open', 'High', 'Low'}.issubset(df.columns):
         raise ValueError("DataFrame must contain required columns")
 
-    trade_results = []
-    
-    for i in range(len(df) - max_days):
-        #Flag pole criteria
-        flagpole_start = df['Close/Last'][i]
-        flagpole_end = df['Close/Last'][i + 1]
-        flagpole_gain = flagpole_end / flagpole_start
-
-        if 1.02 <= flagpole_gain <= 1.05:
-            #Consolidation check
-            consolidation = True
-            for j in range(i + 2, i + 4):
-                if (df["High"][j] > flagpole_end * 1.01 or 
-                    df["Low"][j] < flagpole_end * 0.99):
-                    consolidation = False
-                    break
-
-            if consolidation:
-                entry_idx = i + 5
-                if entry_idx >= len(df):
-                    continue
-                    
-                entry_price = df['Open'][entry_idx]
-                exit_price = None
-                stop = False
-
-                for day in range(max_days):
-                    current_idx = entry_idx + day
-                    if current_idx >= len(df):
-                        break
-                        
-                    if not stop and df['High'][current_idx] >= entry_price * stopprofit:
-                        exit_price = entry_price * stopprofit
-                        stop = True
-                    elif not stop and df['Low'][current_idx] <= entry_price * stoploss:
-                        exit_price = entry_price * stoploss
-                        stop = True
-
-                if not stop:
-                    exit_price = df['Close/Last'][min(entry_idx + max_days - 1, len(df)-1)]
-
-                profit = exit_price - entry_price
-                
-                trade_results.append({
-                    'pattern_date': df['Date'][i],
-                    'entry_date': df['Date'][entry_idx],
-                    'exit_date': df['Date'][min(entry_idx + max_days - 1, len(df)-1)],
-                    'entry_price': entry_price,
-                    'exit_price': exit_price,
-                    'profit': profit,
-                    'pattern_name': 'Flags High & Tight'
-                })
+    data = get_dataset(df)
+    high, low, close = data.high, data.low, data.close
+
+    #Entry is 5 bars after the pole starts, so later starts can't trade
+    idx = np.arange(max(0, min(len(df) - max_days, len(df) - 5)))
+
+    #Flag pole criteria
+    with np.errstate(divide='ignore', invalid='ignore'):
+        flagpole_gain = close[idx + 1] / close[idx]
+    idx = idx[(1.02 <= flagpole_gain) & (flagpole_gain <= 1.05)]
+
+    #Consolidation check, the two bars after the pole stay within 1% of its end
+    flagpole_end = close[idx + 1]
+    consolidation = np.ones(len(idx), dtype=bool)
+    for j in (2, 3):
+        consolidation &= ~((high[idx + j] > flagpole_end * 1.01) | (low[idx + j] < flagpole_end * 0.99))
+    patterns = idx[consolidation]
+
+    entry_idx = patterns + 5
+    entry_prices = data.open[entry_idx]
+    exits = simulate_exits(data.high, data.low, data.close, entry_idx, entry_prices,
+                           stoploss, stopprofit, max_days)
 
-    trades_df = pd.DataFrame(trade_results)
+    trades_df, positions = _pattern_trades(df, patterns, entry_idx, np.minimum(entry_idx + max_days - 1, len(df)-1),
+                                           entry_prices, exits, 'Flags High & Tight')
     total_profit = trades_df['profit'].sum() if not trades_df.empty else 0
-    
-    if not trades_df.empty:
-        print("\nFlags High & Tight Results:")
-        print(f"Total Trades: {len(trades_df)}")
-        print(f"Total Profit: ${total_profit:.2f}")
-    
-    global totalprofit
-    totalprofit += total_profit
-    
-    return trades_df, total_profit
+
+    if verbose:
+        if not trades_df.empty:
+            print("\nFlags High & Tight Results:")
+            print(f"Total Trades: {len(trades_df)}")
+            print(f"Total Profit: ${total_profit:.2f}")
+
+    return PatternResult('find_flags_high_and_tight', trades_df, positions)
 
 def simulate_flagstrades(df):
     return find_flags_high_and_tight(df)
+def _headandshoulder_triples(data, start_idx, end_idx, min_pattern_days, max_pattern_days,
+                             min_head_shoulder_diff, shoulder_symmetry_threshold):
+    """Enumerates every (left shoulder, head, right shoulder) triple of swing highs once.
+
+    The per-window search re-examined each triple in every overlapping window. Here heads are
+    paired with the left shoulders close enough to fit the duration bound, and the right shoulders
+    come from the sorted swing index, limited to the time-symmetry and duration range.
+    Only the triples in those ranges get the symmetry, prominence and duration tests.
+
+    Returns the passing triples as arrays (ls_idx, head_idx, rs_idx, shoulder_diff, first_window),
+    where first_window is the first scan position whose window holds the triple, plus the number
+    of triples examined and the number the per-window search would have examined."""
+    max_window = max_pattern_days
+    peaks = _scan_swing_points(data, 'High', 'max', start_idx, end_idx, max_window)
+    heights = data.high[peaks]
+
+    #What the per-window search examined, every triple of peaks in every window
+    window_triples = 0
+    if end_idx > start_idx:
+        scan = np.arange(start_idx, end_idx)
+        in_window = (np.searchsorted(peaks, scan + max_window - 1) -
+                     np.searchsorted(peaks, np.maximum(0, scan - max_window) + 1))
+        window_triples = int((in_window * (in_window - 1) * (in_window - 2) // 6).sum())
+
+    #Left shoulder/head pairs, the head must be close enough to leave room for a right shoulder
+    pair_ls, pair_head = [], []
+    for offset in range(1, len(peaks)):
+        gaps = peaks[offset:] - peaks[:-offset]
+        close_enough = gaps <= max_pattern_days - 1
+        if not close_enough.any():
+            break
+        head_pos = np.flatnonzero(close_enough) + offset
+        ls_pos = head_pos - offset
+        #Head prominence over the left shoulder, the right shoulder is tested below
+        prominent = (heights[head_pos] - heights[ls_pos]) / heights[head_pos] >= min_head_shoulder_diff
+        pair_ls.append(ls_pos[prominent])
+        pair_head.append(head_pos[prominent])
+
+    if not pair_ls:
+        empty = np.array([], dtype=np.int64)
+        return (empty, empty, empty, np.array([]), empty), 0, window_triples
+
+    pair_ls = np.concatenate(pair_ls)
+    pair_head = np.concatenate(pair_head)
+    ls_bar, head_bar = peaks[pair_ls], peaks[pair_head]
+
+    #Right shoulder range from time symmetry (within 30% of the left distance) and pattern length,
+    #rounded outwards, the exact tests are applied afterwards
+    left_dist = head_bar - ls_bar
+    rs_first = np.maximum(head_bar + np.floor(left_dist * 0.7).astype(np.int64), ls_bar + min_pattern_days)
+    rs_last = np.minimum(head_bar + np.ceil(left_dist / 0.7).astype(np.int64) + 1, ls_bar + max_pattern_days)
+    lo = np.maximum(np.searchsorted(peaks, rs_first, 'left'), pair_head + 1)
+    hi = np.searchsorted(peaks, rs_last, 'right')
+    counts = np.maximum(hi - lo, 0)
+
+    #Expand each pair to its right shoulder candidates
+    pair = np.repeat(np.arange(len(pair_ls)), counts)
+    rs_pos = np.arange(len(pair)) - np.repeat(np.cumsum(counts) - counts, counts) + lo[pair]
+    triples_examined = len(pair)
+
+    ls_idx, head_idx, rs_idx = ls_bar[pair], head_bar[pair], peaks[rs_pos]
+    ls_high, head_high, rs_high = heights[pair_ls[pair]], heights[pair_head[pair]], heights[rs_pos]
+
+    #The per-window tests, in the same floating point form
+    ls_dist = head_idx - ls_idx
+    rs_dist = rs_idx - head_idx
+    time_symmetry_ratio = np.abs(ls_dist - rs_dist) / np.maximum(ls_dist, rs_dist)
+    shoulder_diff = np.abs(ls_high - rs_high) / np.minimum(ls_high, rs_high)
+    head_shoulder_diff = np.minimum(head_high - ls_high, head_high - rs_high) / head_high
+    pattern_length = rs_idx - ls_idx
+
+    #First scan position whose window [max(0, c - max_window) + 1, c + max_window - 2] holds the triple
+    first_window = np.maximum(start_idx, rs_idx + 2 - max_window)
+    valid = (
+        ~(time_symmetry_ratio > 0.3) &
+        ~(shoulder_diff > shoulder_symmetry_threshold) &
+        ~(head_shoulder_diff < min_head_shoulder_diff) &
+        (min_pattern_days <= pattern_length) & (pattern_length <= max_pattern_days) &
+        (first_window < end_idx) &
+        (ls_idx >= np.maximum(0, first_window - max_window) + 1)
+    )
+
+    triples = (ls_idx[valid], head_idx[valid], rs_idx[valid], shoulder_diff[valid], first_window[valid])
+    return triples, triples_examined, window_triples
+
+
+@detector_range(warmup=_chart_pattern_warmup, lookahead=_chart_pattern_lookahead)
 def find_headandshouldertops(df, stoploss=1.015, stopprofit=0.975, max_days=18, 
                             min_pattern_days=15, max_pattern_days=40, 
                             lookback_days=3000, min_head_shoulder_diff=0.012,
-                            shoulder_symmetry_threshold=0.03):
-    
-    #Finds head-and-shoulders top reversals.    
-    
+                            shoulder_symmetry_threshold=0.03, verbose=True):
+
+    #Finds head-and-shoulders top reversals.
+
     required_columns = {'Date', 'Open', 'High', 'Low', 'Close/Last'}
     if not required_columns.issubset(df.columns):
         missing_columns = required_columns - set(df.columns)
         raise ValueError(f"Missing columns: {missing_columns}")
 
-    #Convert columns to numeric
-    for col in ['Open', 'High', 'Low', 'Close/Last']:
-        df[col] = pd.to_numeric(df[col].astype(str).str.replace(',', '').str.replace('$', ''), errors='coerce')
 
-    #Calculate trend indicators
-    df['SMA20'] = df['Close/Last'].rolling(window=20).mean()
-    df['SMA50'] = df['Close/Last'].rolling(window=50).mean()
-    df['ATR'] = (df['High'] - df['Low']).rolling(window=14).mean()
+    #Trend indicators, shared with the other detectors through the dataset's indicator store
+    data = get_dataset(df)
+    indicators = data.indicators
+    sma20 = indicators.sma(20)
+    sma50 = indicators.sma(50)
+    atr_values = indicators.atr(14)
 
-    trade_results = []
-    total_profit = 0
-    executed_dates = set()
     start_idx = max(0, len(df) - lookback_days)
+    end_idx = len(df) - max_days - max_pattern_days
+    high, low, close = data.high, data.low, data.close
+
+    triples, triples_examined, window_triples = _headandshoulder_triples(
+        data, start_idx, end_idx, min_pattern_days, max_pattern_days,
+        min_head_shoulder_diff, shoulder_symmetry_threshold)
+    ls_idx, head_idx, rs_idx, shoulder_diff, first_window = triples
+
+    #Neckline construction
+    left_trough_idx = data.range_table('Low', 'min').query_many(ls_idx, head_idx)
+    right_trough_idx = data.range_table('Low', 'min').query_many(head_idx, rs_idx)
+    left_trough, right_trough = low[left_trough_idx], low[right_trough_idx]
+    neckline_value = np.where(right_trough < left_trough, right_trough, left_trough)
+
+    #Confirm downward breakout within 10 bars of the right shoulder
+    breakout_offset = _first_breakout(close, rs_idx, neckline_value, direction='down')
+    breakout_idx = rs_idx + np.where(breakout_offset < 10, breakout_offset, 0)
+
+    #Trend confirmation
+    confirmed = ((breakout_offset < 10) &
+                 (sma20[breakout_idx] <= sma50[breakout_idx]) &
+                 (close[breakout_idx] < sma20[breakout_idx]))
+
+    #Same order as the sliding window scan (first window, then tallest head, then shoulders
+    #left to right) so the one-trade-per-day rule keeps the same pattern
+    keep = np.flatnonzero(confirmed)
+    keep = keep[np.lexsort((rs_idx[keep], ls_idx[keep], head_idx[keep], -high[head_idx[keep]], first_window[keep]))]
+    keep = _first_per_date(df, breakout_idx[keep], keep)
+    head_idx, breakouts = head_idx[keep], breakout_idx[keep]
+
+    #Short position entry on the breakout open with dynamic stops based on ATR
+    direction = DIRECTION_REGISTRY['find_headandshouldertops']
+    entry_prices = data.open[breakouts]
+    dynamic_stoploss, dynamic_stopprofit = atr_exit_multipliers(entry_prices, atr_values[breakouts],
+                                                                stoploss, stopprofit, 2, 3, direction)
+    exits = simulate_exits(data.high, data.low, data.close, breakouts, entry_prices,
+                           dynamic_stoploss, dynamic_stopprofit, max_days, direction=direction)
+
+    trades_df, positions = _pattern_trades(df, head_idx, breakouts, np.minimum(breakouts + max_days - 1, len(df)-1),
+                                           entry_prices, exits, 'Head and Shoulders Top', extra_columns={
+                                               'pattern_height': high[head_idx] - neckline_value[keep],
+                                               'shoulder_symmetry': shoulder_diff[keep]
+                                           })
+    total_profit = trades_df['profit'].sum() if not trades_df.empty else 0
 
-    for current_idx in range(start_idx, len(df) - max_days - max_pattern_days):
-        window_start = max(0, current_idx - max_pattern_days)
-        window = df.iloc[window_start:current_idx + max_pattern_days]
+    if verbose:
+        if not trades_df.empty:
+            print("\nHead-and-Shoulders Top Results:")
+            print(f"Lookback Period: {lookback_days} days")
+            print(f"Shoulder Triples Examined: {triples_examined} (per-window search: {window_triples})")
+            print(f"Total Patterns Found: {len(trades_df)}")
+            print(f"Total Trades Executed: {len(trades_df)}")
+            print(f"Profitable Trades: {len(trades_df[trades_df['profit'] > 0])}")
+            print(f"Win Rate: {len(trades_df[trades_df['profit'] > 0]) / len(trades_df) * 100:.1f}%")
+            print(f"Average Profit per Trade: ${total_profit/len(trades_df):.5f}")
+            print(f"Total Profit: ${total_profit:.5f}")
+        else:
+            print("\nNo Head-and-Shoulders Top patterns found")
+            print(f"Shoulder Triples Examined: {triples_examined} (per-window search: {window_triples})")
 
-        #Find peaks
-        peaks = [
-            (idx + window_start, window['High'].iloc[idx])
-            for idx in range(1, len(window) - 1)
-            if window['High'].iloc[idx] > window['High'].iloc[idx - 1] and
-               window['High'].iloc[idx] > window['High'].iloc[idx + 1]
-        ]
+    return PatternResult('find_headandshouldertops', trades_df, positions, stats={'triples_examined': triples_examined, 'window_triples': window_triples})
 
-        if len(peaks) < 3:
-            continue
 
-        #Sort peaks by height
-        peaks_sorted = sorted(peaks, key=lambda x: -x[1])
+def _doublebottom_candidates(data, start_idx, end_idx, window):
+    #Neighbouring bottoms that share a scan window, in the order the window scan compared them,
+    #with the metrics find_doublebottoms thresholds
+    high, low, close = data.high, data.low, data.close
+    first_idx, second_idx = _consecutive_swing_pairs(data, 'Low', 'min', start_idx, end_idx, window)
+    first_low, second_low = low[first_idx], low[second_idx]
+    lowest = np.minimum(first_low, second_low)
 
-        #Check for valid head and shoulders pattern
-        for head_idx, head_high in peaks_sorted:
-            left_shoulders = [(idx, high) for idx, high in peaks if idx < head_idx]
-            right_shoulders = [(idx, high) for idx, high in peaks if idx > head_idx]
+    #Peak between the bottoms and the first close above it
+    peak_high = high[data.range_table('High', 'max').query_many(first_idx, second_idx)]
+    breakout_offset = _first_breakout(close, second_idx, peak_high)
 
-            if not left_shoulders or not right_shoulders:
-                continue
+    return {
+        'first_idx': first_idx,
+        'second_idx': second_idx,
+        'time_between': second_idx - first_idx,
+        'price_diff': np.abs(first_low - second_low) / np.maximum(first_low, second_low),
+        'rise': (peak_high - lowest) / lowest,
+        'breakout_idx': second_idx + breakout_offset,
+        'confirmed': breakout_offset < 10
+    }
 
-            for ls_idx, ls_high in left_shoulders:
-                for rs_idx, rs_high in right_shoulders:
-                    #Time symmetry check
-                    ls_dist = head_idx - ls_idx
-                    rs_dist = rs_idx - head_idx
-                    time_symmetry_ratio = abs(ls_dist - rs_dist) / max(ls_dist, rs_dist)
-                    if time_symmetry_ratio > 0.3:
-                        continue
-
-                    #Price symmetry check
-                    shoulder_diff = abs(ls_high - rs_high) / min(ls_high, rs_high)
-                    if shoulder_diff > shoulder_symmetry_threshold:
-                        continue
-
-                    #Head prominence check
-                    head_shoulder_diff = min(head_high - ls_high, head_high - rs_high) / head_high
-                    if head_shoulder_diff < min_head_shoulder_diff:
-                        continue
-
-                    #Pattern duration check
-                    pattern_length = rs_idx - ls_idx
-                    if not (min_pattern_days <= pattern_length <= max_pattern_days):
-                        continue
-
-                    #Neckline construction
-                    left_trough_idx = df['Low'].iloc[ls_idx:head_idx].idxmin()
-                    right_trough_idx = df['Low'].iloc[head_idx:rs_idx].idxmin()
-                    neckline_value = min(df['Low'].iloc[left_trough_idx], df['Low'].iloc[right_trough_idx])
-
-                    #Confirm downward breakout
-                    breakout_idx = None
-                    for idx in range(rs_idx, min(rs_idx + 10, len(df))):
-                        if df['Close/Last'].iloc[idx] < neckline_value:
-                            breakout_idx = idx
-                            break
-
-                    if breakout_idx is None:
-                        continue
-
-                    #Trend confirmation
-                    if (df['SMA20'].iloc[breakout_idx] <= df['SMA50'].iloc[breakout_idx] and 
-                        df['Close/Last'].iloc[breakout_idx] < df['SMA20'].iloc[breakout_idx]):
-
-                        trade_date = df['Date'].iloc[breakout_idx]
-                        if trade_date in executed_dates:
-                            continue
-                        executed_dates.add(trade_date)
-
-                        #Short position entry
-                        entry_price = df['Open'].iloc[breakout_idx]
-                        exit_price = None
-                        stop = False
-
-                        #Dynamic stops based on ATR
-                        atr = df['ATR'].iloc[breakout_idx]
-                        dynamic_stoploss = min(stoploss, 1 + (2 * atr / entry_price))
-                        dynamic_stopprofit = max(stopprofit, 1 - (3 * atr / entry_price))
-
-                        for day in range(max_days):
-                            current_idx = breakout_idx + day
-                            if current_idx >= len(df):
-                                break
-
-                            current_high = df['High'].iloc[current_idx]
-                            current_low = df['Low'].iloc[current_idx]
-
-                            if not stop:
-                                if current_low <= entry_price * dynamic_stopprofit:  #Target hit (price fell)
-                                    exit_price = entry_price * dynamic_stopprofit
-                                    stop = True
-                                elif current_high >= entry_price * dynamic_stoploss:  #Stop loss hit (price rose)
-                                    exit_price = entry_price * dynamic_stoploss
-                                    stop = True
-
-                        if not stop:
-                            exit_price = df['Close/Last'].iloc[min(breakout_idx + max_days - 1, len(df)-1)]
-
-                        profit = entry_price - exit_price
-                        total_profit += profit
-
-                        trade_results.append({
-                            'pattern_date': df['Date'].iloc[head_idx],
-                            'entry_date': trade_date,
-                            'exit_date': df['Date'].iloc[min(breakout_idx + max_days - 1, len(df)-1)],
-                            'entry_price': entry_price,
-                            'exit_price': exit_price,
-                            'profit': profit,
-                            'pattern_name': 'Head and Shoulders Top',
-                            'pattern_height': head_high - neckline_value,
-                            'shoulder_symmetry': shoulder_diff
-                        })
-
-    trades_df = pd.DataFrame(trade_results)
-
-    if not trades_df.empty:
-        print("\nHead-and-Shoulders Top Results:")
-        print(f"Lookback Period: {lookback_days} days")
-        print(f"Total Patterns Found: {len(trade_results)}")
-        print(f"Total Trades Executed: {len(trades_df)}")
-        print(f"Profitable Trades: {len(trades_df[trades_df['profit'] > 0])}")
-        print(f"Win Rate: {len(trades_df[trades_df['profit'] > 0]) / len(trades_df) * 100:.1f}%")
-        print(f"Average Profit per Trade: ${total_profit/len(trades_df):.5f}")
-        print(f"Total Profit: ${total_profit:.5f}")
-    else:
-        print("\nNo Head-and-Shoulders Top patterns found")
 
-    global totalprofit
-    totalprofit += total_profit
+def _doubletop_candidates(data, start_idx, end_idx, window):
+    #Neighbouring tops that share a scan window, in the order the window scan compared them,
+    #with the metrics find_doubletops thresholds
+    high, low, close = data.high, data.low, data.close
+    sma20 = data.indicators.sma(20)
+    first_idx, second_idx = _consecutive_swing_pairs(data, 'High', 'max', start_idx, end_idx, window)
+    first_high, second_high = high[first_idx], high[second_idx]
+    lowest_top = np.minimum(first_high, second_high)
 
-    return trades_df, total_profit
+    #Trough between the tops and the first close below it
+    trough_low = low[data.range_table('Low', 'min').query_many(first_idx, second_idx)]
+    breakout_offset = _first_breakout(close, second_idx, trough_low, direction='down')
+
+    return {
+        'first_idx': first_idx,
+        'second_idx': second_idx,
+        'time_between': second_idx - first_idx,
+        'price_diff': np.abs(first_high - second_high) / np.maximum(first_high, second_high),
+        'drop': (lowest_top - trough_low) / lowest_top,
+        'downtrend': ~(close[second_idx] > sma20[second_idx]),
+        'breakout_idx': second_idx + breakout_offset,
+        'confirmed': breakout_offset < 10
+    }
 
 
+def _cup_candidates(data, start_idx, end_idx, min_pattern_days, max_pattern_days):
+    #Distinct cups the scan windows find, in the order the scan first found them, with the metrics
+    #find_cup_with_handle thresholds. Windows are evaluated CANDIDATE_CHUNK_SIZE at a time and only
+    #cups passing the fixed checks are kept; a cup found again by later windows has the same
+    #metrics and breakout, so the repeats are dropped too
+    def distinct(table):
+        keep = _first_occurrences(table['left_high_idx'], table['cup_bottom_idx'], table['right_high_idx'])
+        return {key: values[keep] for key, values in table.items()}
+
+    #Repeats are dropped within each chunk first, then across chunk boundaries
+    chunks = [distinct(_cup_window_candidates(data, chunk_start, min(chunk_start + CANDIDATE_CHUNK_SIZE, end_idx),
+                                              min_pattern_days, max_pattern_days))
+              for chunk_start in range(start_idx, end_idx, CANDIDATE_CHUNK_SIZE) or [start_idx]]
+    return distinct({key: np.concatenate([chunk[key] for chunk in chunks]) for key in chunks[0]})
+
+
+def _first_occurrences(*keys):
+    #Rows whose key tuple does not appear in an earlier row, in row order. lexsort is stable, so the
+    #first row of each run of equal keys is the earliest
+    order = np.lexsort(keys[::-1])
+    repeat = np.ones(max(len(order) - 1, 0), dtype=bool)
+    for key in keys:
+        ordered = key[order]
+        repeat &= ordered[1:] == ordered[:-1]
+    return np.sort(order[np.concatenate(([True], ~repeat))[:len(order)]])
+
+
+def _cup_window_candidates(data, start_idx, end_idx, min_pattern_days, max_pattern_days):
+    #Cup found by each scan window in [start_idx, end_idx), in scan order, dropping windows whose cup
+    #fails the checks find_cup_with_handle applies whatever its tolerances
+    high, low, close = data.high, data.low, data.close
+    highest, lowest = data.range_table('High', 'max'), data.range_table('Low', 'min')
+    n = len(close)
+
+    #Every scan window at once, each step below drops the windows that cannot hold a cup
+    current_idx = np.arange(start_idx, max(start_idx, end_idx))
+    window_start = np.maximum(0, current_idx - max_pattern_days)
+    window_length = np.minimum(current_idx + max_pattern_days, n) - window_start
+
+    #Skip if window is too small, find initial high (left side of cup) in the first part of the window
+    left_length = np.minimum(min_pattern_days + 5, window_length // 2)
+    valid = (window_length >= min_pattern_days) & (left_length > 0)
+    current_idx, window_start, left_length = current_idx[valid], window_start[valid], left_length[valid]
+    left_high_idx = highest.query_many(window_start, window_start + left_length)
+
+    #Find the cup bottom
+    cup_search_start = np.maximum(left_high_idx + 2, window_start + min_pattern_days)
+    cup_search_end = np.minimum(current_idx + max_pattern_days // 2, n)
+    valid = cup_search_start < cup_search_end
+    left_high_idx = left_high_idx[valid]
+    cup_bottom_idx = lowest.query_many(cup_search_start[valid], cup_search_end[valid])
+
+    #Find right side of cup - more flexible
+    right_search_start = cup_bottom_idx + 1
+    right_search_end = np.minimum(cup_bottom_idx + max_pattern_days, n)
+    valid = (cup_bottom_idx > left_high_idx) & (right_search_start < right_search_end)
+    left_high_idx, cup_bottom_idx = left_high_idx[valid], cup_bottom_idx[valid]
+    right_high_idx = highest.query_many(right_search_start[valid], right_search_end[valid])
+
+    left_high, cup_bottom, right_high = high[left_high_idx], low[cup_bottom_idx], high[right_high_idx]
+    left_time = cup_bottom_idx - left_high_idx
+    right_time = right_high_idx - cup_bottom_idx
+    with np.errstate(divide='ignore', invalid='ignore'):
+        symmetry_ratio = np.abs(left_time - right_time) / np.maximum(left_time, right_time)
+
+    #Handle low just after the right side, NaN depth where there is no room for a handle
+    handle_search_start = right_high_idx + 1
+    handle_search_end = np.minimum(right_high_idx + min_pattern_days + 5, n)
+    has_handle = handle_search_start < handle_search_end
+    rows = np.flatnonzero(has_handle)
+    handle_depth = np.full(len(right_high_idx), np.nan)
+    handle_low = low[lowest.query_many(handle_search_start[rows], handle_search_end[rows])]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        handle_depth[rows] = (right_high[rows] - handle_low) / (right_high[rows] - cup_bottom[rows])
+
+    #First close above the cup rim, allowing a slight tolerance
+    breakout_offset = np.full(len(right_high_idx), 14, dtype=np.int64)
+    breakout_offset[rows] = _first_breakout(close, right_high_idx[rows] + 1, right_high[rows] * 0.995, width=14)
+
+    cup_depth = (left_high - cup_bottom) / left_high
+    min_side_time = np.minimum(left_time, right_time)
+    confirmed = breakout_offset < 14
+    keep = ~((cup_depth < 0.005) | (cup_depth > 0.95)) & ~(min_side_time < 2) & has_handle & confirmed
+    return {
+        'left_high_idx': left_high_idx[keep],
+        'cup_bottom_idx': cup_bottom_idx[keep],
+        'right_high_idx': right_high_idx[keep],
+        'cup_depth': cup_depth[keep],
+        'min_side_time': min_side_time[keep],
+        'symmetry_ratio': symmetry_ratio[keep],
+        'has_handle': has_handle[keep],
+        'handle_depth': handle_depth[keep],
+        'breakout_idx': right_high_idx[keep] + 1 + breakout_offset[keep],
+        'confirmed': confirmed[keep]
+    }
+
+
+@detector_range(warmup=_chart_pattern_warmup, lookahead=_chart_pattern_lookahead)
 def find_doublebottoms(df, stoploss=0.97, stopprofit=1.05, max_days=20, 
                       min_pattern_days=5, max_pattern_days=50, 
                       lookback_days=3000, bottom_price_tolerance=0.03, 
-                      min_rise_between_bottoms=0.01):
-    
+                      min_rise_between_bottoms=0.01, verbose=True):
+
     #Detects Double Bottom (Adam & Adam) patterns in historical stock data and simulates trades.
-    
+
 
     #Validate required columns
     required_columns = {'Date', 'Open', 'High', 'Low', 'Close/Last'}
@@ -1809,868 +3195,773 @@ def find_doublebottoms(df, stoploss=0.97, stopprofit=1.05, max_days=20,
         missing_columns = required_columns - set(df.columns)
         raise ValueError(f"Missing columns: {missing_columns}")
 
-    #Convert columns to numeric if needed
-    for col in ['Open', 'High', 'Low', 'Close/Last']:
-        df[col] = pd.to_numeric(df[col].astype(str).str.replace(',', '').str.replace('$', ''), errors='coerce')
 
-    
-    patterns = []
-    trade_results = []
-    total_profit = 0
-    executed_dates = set()  #Track dates where trades have already been executed
+    data = get_dataset(df)
 
     #Define range for lookback
     start_idx = max(0, len(df) - lookback_days)
 
-    #Iterate through dataset to find patterns
-    for current_idx in range(start_idx, len(df) - max_days - max_pattern_days):
-        window_start = max(0, current_idx - max_pattern_days)
-        window = df.iloc[window_start:current_idx + max_pattern_days]
-
-        #Identify potential bottoms
-        bottoms = [
-            (idx + window_start, window['Low'].iloc[idx])
-            for idx in range(1, len(window) - 1)
-            if window['Low'].iloc[idx] < window['Low'].iloc[idx - 1] and
-               window['Low'].iloc[idx] < window['Low'].iloc[idx + 1]
-        ]
-
-        if len(bottoms) < 2:
-            continue
-
-        #Check all pairs of bottoms for valid Double Bottom patterns
-        for i in range(len(bottoms) - 1):
-            first_idx, first_low = bottoms[i]
-            second_idx, second_low = bottoms[i + 1]
-
-            #Validate time between bottoms
-            time_between_bottoms = second_idx - first_idx
-            if not (min_pattern_days <= time_between_bottoms <= max_pattern_days):
-                continue
-
-            #Validate price similarity between bottoms
-            price_diff = abs(first_low - second_low) / max(first_low, second_low)
-            if price_diff > bottom_price_tolerance:
-                continue
-
-            #Validate rise between bottoms
-            peak_idx = df['High'].iloc[first_idx:second_idx].idxmax()
-            peak_high = df['High'].iloc[peak_idx]
-            rise_between_bottoms = (peak_high - min(first_low, second_low)) / min(first_low, second_low)
-            if rise_between_bottoms < min_rise_between_bottoms:
-                continue
-
-            #Confirm breakout above peak between bottoms
-            breakout_idx = None
-            for idx in range(second_idx, min(second_idx + 10, len(df))):
-                if df['Close/Last'].iloc[idx] > peak_high:
-                    breakout_idx = idx
-                    break
-
-            if breakout_idx is None:
-                continue
-
-            #Execute trade
-            trade_date = df['Date'].iloc[breakout_idx]
-            if trade_date in executed_dates:
-                continue
-            executed_dates.add(trade_date)
-
-            entry_price = df['Open'].iloc[breakout_idx]
-            exit_price = 0
-            stop = False
-
-            for day in range(max_days):
-                if breakout_idx + day >= len(df):
-                    break
+    #Every bottom pair the scan can reach, only the thresholds below depend on the parameters
+    candidates = data.candidate_table(_doublebottom_candidates, start_idx=start_idx,
+                                      end_idx=len(df) - max_days - max_pattern_days, window=max_pattern_days)
 
-                current_high = df['High'].iloc[breakout_idx + day]
-                current_low = df['Low'].iloc[breakout_idx + day]
+    #Validate time between bottoms, price similarity, rise between bottoms and the breakout above the peak
+    time_between_bottoms = candidates['time_between']
+    valid = ((min_pattern_days <= time_between_bottoms) & (time_between_bottoms <= max_pattern_days) &
+             ~(candidates['price_diff'] > bottom_price_tolerance) &
+             ~(candidates['rise'] < min_rise_between_bottoms) &
+             candidates['confirmed'])
 
-                if not stop and current_high >= entry_price * stopprofit:
-                    exit_price = entry_price * stopprofit
-                    stop = True
-                elif not stop and current_low <= entry_price * stoploss:
-                    exit_price = entry_price * stoploss
-                    stop = True
+    #One trade per breakout date
+    keep = _first_per_date(df, candidates['breakout_idx'][valid], np.flatnonzero(valid))
+    first_idx, breakouts = candidates['first_idx'][keep], candidates['breakout_idx'][keep]
 
-            if not stop:
-                if breakout_idx + max_days - 1 >= len(df):
-                    exit_price = df['Close/Last'].iloc[-1]
-                else:
-                    exit_price = df['Close/Last'].iloc[breakout_idx + max_days - 1]
-
-            profit = exit_price - entry_price
-            total_profit += profit
-
-            #Record trade details
-            trade_results.append({
-                'pattern_date': df['Date'].iloc[first_idx],  #First top date
-            'entry_date': df['Date'].iloc[breakout_idx],
-            'exit_date': df['Date'].iloc[min(breakout_idx + max_days - 1, len(df)-1)],
-            'entry_price': entry_price,
-            'exit_price': exit_price,
-            'profit': profit,
-            'pattern_name': 'Double Bottoms'
-            })
+    entry_prices = data.open[breakouts]
+    exits = simulate_exits(data.high, data.low, data.close, breakouts, entry_prices,
+                           stoploss, stopprofit, max_days)
 
-    #Create results DataFrame
-    trades_df = pd.DataFrame(trade_results)
+    #Pattern date is the first bottom
+    trades_df, positions = _pattern_trades(df, first_idx, breakouts, np.minimum(breakouts + max_days - 1, len(df)-1),
+                                           entry_prices, exits, 'Double Bottoms')
+    total_profit = trades_df['profit'].sum() if not trades_df.empty else 0
 
     #Print summary
-    if not trades_df.empty:
-        print("\nDouble Bottoms (Adam & Adam) Results:")
-        print(f"Lookback Period: {lookback_days} days")
-        print(f"Total Patterns Found: {len(trade_results)}")
-        print(f"Total Trades Executed: {len(trades_df)}")
-        print(f"Profitable Trades: {len(trades_df[trades_df['profit'] > 0])}")
-        print(f"Win Rate: {len(trades_df[trades_df['profit'] > 0]) / len(trades_df) * 100:.1f}%")
-        print(f"Average Profit per Trade: ${total_profit / len(trades_df):.2f}")
-        print(f"Total Profit: ${total_profit:.2f}")
-    else:
-        print("\nDouble Bottoms (Adam & Adam) Results:")
-        print("No patterns were found during the specified lookback period.")
-
-    global totalprofit
-    totalprofit += total_profit
+    if verbose:
+        if not trades_df.empty:
+            print("\nDouble Bottoms (Adam & Adam) Results:")
+            print(f"Lookback Period: {lookback_days} days")
+            print(f"Total Patterns Found: {len(trades_df)}")
+            print(f"Total Trades Executed: {len(trades_df)}")
+            print(f"Profitable Trades: {len(trades_df[trades_df['profit'] > 0])}")
+            print(f"Win Rate: {len(trades_df[trades_df['profit'] > 0]) / len(trades_df) * 100:.1f}%")
+            print(f"Average Profit per Trade: ${total_profit / len(trades_df):.2f}")
+            print(f"Total Profit: ${total_profit:.2f}")
+        else:
+            print("\nDouble Bottoms (Adam & Adam) Results:")
+            print("No patterns were found during the specified lookback period.")
 
-    return trades_df, total_profit
+    return PatternResult('find_doublebottoms', trades_df, positions)
 
+@detector_range(warmup=_chart_pattern_warmup, lookahead=_chart_pattern_lookahead)
 def find_doubletops(df, stoploss=1.015, stopprofit=0.97, max_days=20, 
                      min_pattern_days=3, max_pattern_days=50, 
                      lookback_days=3000, top_price_tolerance=0.05, 
-                     min_drop_between_tops=0.006):
+                     min_drop_between_tops=0.006, verbose=True):
 
     required_columns = {'Date', 'Open', 'High', 'Low', 'Close/Last'}
     if not required_columns.issubset(df.columns):
         missing_columns = required_columns - set(df.columns)
         raise ValueError(f"Missing columns: {missing_columns}")
 
-    #Convert columns to numeric
-    for col in ['Open', 'High', 'Low', 'Close/Last']:
-        df[col] = pd.to_numeric(df[col].astype(str).str.replace(',', '').str.replace('$', ''), errors='coerce')
 
-    #Calculate trend indicators
-    df['SMA20'] = df['Close/Last'].rolling(window=20).mean()
-    df['SMA50'] = df['Close/Last'].rolling(window=50).mean()
-    df['ATR'] = (df['High'] - df['Low']).rolling(window=14).mean()
+    data = get_dataset(df)
+    atr_values = data.indicators.atr(14)
 
-    trade_results = []
-    total_profit = 0
-    executed_dates = set()
     start_idx = max(0, len(df) - lookback_days)
 
-    for current_idx in range(start_idx, len(df) - max_days - max_pattern_days):
-        window_start = max(0, current_idx - max_pattern_days)
-        window = df.iloc[window_start:current_idx + max_pattern_days]
-
-        #Find tops
-        tops = [
-            (idx + window_start, window['High'].iloc[idx])
-            for idx in range(1, len(window) - 1)
-            if window['High'].iloc[idx] > window['High'].iloc[idx - 1] and
-               window['High'].iloc[idx] > window['High'].iloc[idx + 1]
-        ]
-
-        if len(tops) < 2:
-            continue
-
-        #Check all pairs of tops for validity
-        for i in range(len(tops) - 1):
-            first_idx, first_high = tops[i]
-            second_idx, second_high = tops[i + 1]
-
-            #Validate time between tops
-            time_between_tops = second_idx - first_idx
-            if not (min_pattern_days <= time_between_tops <= max_pattern_days):
-                continue
-
-            #Validate price similarity between tops
-            price_diff = abs(first_high - second_high) / max(first_high, second_high)
-            if price_diff > top_price_tolerance:
-                continue
-
-            #Find trough between tops
-            trough_idx = df['Low'].iloc[first_idx:second_idx].idxmin()
-            trough_low = df['Low'].iloc[trough_idx]
-
-            #Validate significant drop between tops
-            drop_between_tops = (min(first_high, second_high) - trough_low) / min(first_high, second_high)
-            if drop_between_tops < min_drop_between_tops:
-                continue
-
-            #Trend confirmation
-            if df['Close/Last'].iloc[second_idx] > df['SMA20'].iloc[second_idx]:
-                continue  #Skip if not in downtrend
-
-            #Look for breakout below trough
-            breakout_idx = None
-            for idx in range(second_idx, min(second_idx + 10, len(df))):
-                if df['Close/Last'].iloc[idx] < trough_low:
-                    breakout_idx = idx
-                    break
-
-            if breakout_idx is None:
-                continue
-
-            #Execute short trade
-            trade_date = df['Date'].iloc[breakout_idx]
-            if trade_date in executed_dates:
-                continue
-            executed_dates.add(trade_date)
-
-            entry_price = df['Open'].iloc[breakout_idx]
-            exit_price = None
-            stop = False
-
-            #Dynamic stops based on ATR
-            atr = df['ATR'].iloc[breakout_idx]
-            dynamic_stoploss = min(stoploss, 1 + (2 * atr / entry_price))
-            dynamic_stopprofit = max(stopprofit, 1 - (3 * atr / entry_price))
-
-            for day in range(max_days):
-                current_idx = breakout_idx + day
-                if current_idx >= len(df):
-                    break
-
-                current_high = df['High'].iloc[current_idx]
-                current_low = df['Low'].iloc[current_idx]
-
-                if not stop:
-                    if current_low <= entry_price * dynamic_stopprofit:  #Target hit (price fell)
-                        exit_price = entry_price * dynamic_stopprofit
-                        stop = True
-                    elif current_high >= entry_price * dynamic_stoploss:  #Stop loss hit (price rose)
-                        exit_price = entry_price * dynamic_stoploss
-                        stop = True
-
-            if not stop:
-                exit_price = df['Close/Last'].iloc[min(breakout_idx + max_days - 1, len(df)-1)]
-
-            profit = entry_price - exit_price
-            total_profit += profit
-
-            trade_results.append({
-            'pattern_date': df['Date'].iloc[first_idx],  #First top date
-            'entry_date': df['Date'].iloc[breakout_idx],
-            'exit_date': df['Date'].iloc[min(breakout_idx + max_days - 1, len(df)-1)],
-            'entry_price': entry_price,
-            'exit_price': exit_price,
-            'profit': profit,
-            'pattern_name': 'Double Top'
-            })
-
-    trades_df = pd.DataFrame(trade_results)
-
-    if not trades_df.empty:
-        print("\nDouble Tops Results:")
-        print(f"Lookback Period: {lookback_days} days")
-        print(f"Total Patterns Found: {len(trade_results)}")
-        print(f"Total Trades Executed: {len(trades_df)}")
-        print(f"Profitable Trades: {len(trades_df[trades_df['profit'] > 0])}")
-        print(f"Win Rate: {len(trades_df[trades_df['profit'] > 0]) / len(trades_df) * 100:.1f}%")
-        print(f"Average Profit per Trade: ${total_profit/len(trades_df):.5f}")
-        print(f"Total Profit: ${total_profit:.5f}")
-    else:
-        print("\nNo Double Top patterns found")
+    #Every top pair the scan can reach, only the thresholds below depend on the parameters
+    candidates = data.candidate_table(_doubletop_candidates, start_idx=start_idx,
+                                      end_idx=len(df) - max_days - max_pattern_days, window=max_pattern_days)
+
+    #Validate time between tops, price similarity, the drop to the trough, the downtrend and the breakout below the trough
+    time_between_tops = candidates['time_between']
+    valid = ((min_pattern_days <= time_between_tops) & (time_between_tops <= max_pattern_days) &
+             ~(candidates['price_diff'] > top_price_tolerance) &
+             ~(candidates['drop'] < min_drop_between_tops) &
+             candidates['downtrend'] &
+             candidates['confirmed'])
+
+    #One short trade per breakout date
+    keep = _first_per_date(df, candidates['breakout_idx'][valid], np.flatnonzero(valid))
+    first_idx, breakouts = candidates['first_idx'][keep], candidates['breakout_idx'][keep]
+
+    #Dynamic stops based on ATR
+    direction = DIRECTION_REGISTRY['find_doubletops']
+    entry_prices = data.open[breakouts]
+    dynamic_stoploss, dynamic_stopprofit = atr_exit_multipliers(entry_prices, atr_values[breakouts],
+                                                                stoploss, stopprofit, 2, 3, direction)
+    exits = simulate_exits(data.high, data.low, data.close, breakouts, entry_prices,
+                           dynamic_stoploss, dynamic_stopprofit, max_days, direction=direction)
+
+    #Pattern date is the first top
+    trades_df, positions = _pattern_trades(df, first_idx, breakouts, np.minimum(breakouts + max_days - 1, len(df)-1),
+                                           entry_prices, exits, 'Double Top')
+    total_profit = trades_df['profit'].sum() if not trades_df.empty else 0
 
-    global totalprofit
-    totalprofit += total_profit
+    if verbose:
+        if not trades_df.empty:
+            print("\nDouble Tops Results:")
+            print(f"Lookback Period: {lookback_days} days")
+            print(f"Total Patterns Found: {len(trades_df)}")
+            print(f"Total Trades Executed: {len(trades_df)}")
+            print(f"Profitable Trades: {len(trades_df[trades_df['profit'] > 0])}")
+            print(f"Win Rate: {len(trades_df[trades_df['profit'] > 0]) / len(trades_df) * 100:.1f}%")
+            print(f"Average Profit per Trade: ${total_profit/len(trades_df):.5f}")
+            print(f"Total Profit: ${total_profit:.5f}")
+        else:
+            print("\nNo Double Top patterns found")
 
-    return trades_df, total_profit
+    return PatternResult('find_doubletops', trades_df, positions)
 
+@detector_range(warmup=_chart_pattern_warmup, lookahead=_chart_pattern_lookahead)
 def find_invertedcupwithhandle(df, stoploss=1.01, stopprofit=0.95, max_days=10, 
                              min_pattern_days=5, max_pattern_days=40, 
                              lookback_days=3000, handle_depth_tolerance=1.0, 
-                             cup_symmetry_tolerance=0.3):
+                             cup_symmetry_tolerance=0.3, verbose=True):
 
     required_columns = {'Date', 'Open', 'High', 'Low', 'Close/Last'}
     if not required_columns.issubset(df.columns):
         missing_columns = required_columns - set(df.columns)
         raise ValueError(f"Missing columns: {missing_columns}")
 
-    #Convert columns to numeric if needed
-    for col in ['Open', 'High', 'Low', 'Close/Last']:
-        df[col] = pd.to_numeric(df[col].astype(str).str.replace(',', '').str.replace('$', ''), errors='coerce')
 
-    trade_results = []
-    total_profit = 0
-    executed_dates = set()
+    data = get_dataset(df)
+    high, close = data.high, data.close
 
     start_idx = max(0, len(df) - lookback_days)
 
-    for current_idx in range(start_idx, len(df) - max_days - max_pattern_days):
-        window_start = max(0, current_idx - max_pattern_days)
-        window = df.iloc[window_start:current_idx + max_pattern_days]
+    #Neighbouring peaks (left and right side of cup) that share a scan window
+    left_idx, right_idx = _consecutive_swing_pairs(data, 'High', 'max', start_idx,
+                                                   len(df) - max_days - max_pattern_days, max_pattern_days)
 
-        #Find peaks (left and right side of cup)
-        peaks = [
-            (idx + window_start, window['High'].iloc[idx])
-            for idx in range(1, len(window) - 1)
-            if window['High'].iloc[idx] > window['High'].iloc[idx - 1] and
-               window['High'].iloc[idx] > window['High'].iloc[idx + 1]
-        ]
+    #Find trough (top of inverted cup), for inverted cup we look for HIGHEST low
+    trough_high = high[data.range_table('Low', 'max').query_many(left_idx, right_idx)]
 
-        if len(peaks) < 2:
-            continue
+    #Confirm breakout below trough
+    breakout_offset = _first_breakout(close, right_idx, trough_high, direction='down')
+    confirmed = breakout_offset < 10
+    breakouts = right_idx[confirmed] + breakout_offset[confirmed]
 
-        #Check all pairs of peaks for valid inverted cup patterns
-        for i in range(len(peaks) - 1):
-            left_idx, left_high = peaks[i]      #First peak (left side of cup)
-            right_idx, right_high = peaks[i + 1] #Second peak (right side of cup)
+    #One trade per breakout date
+    keep = _first_per_date(df, breakouts, np.flatnonzero(confirmed))
+    left_idx, breakouts = left_idx[keep], right_idx[keep] + breakout_offset[keep]
 
-            
-            #Find trough (top of inverted cup)
-            trough_idx = df['Low'].iloc[left_idx:right_idx].idxmax()  #For inverted cup, we look for HIGHEST low
-            trough_high = df['High'].iloc[trough_idx]
+    #Short entries, profit is the opposite way round to a long
+    entry_prices = data.open[breakouts]
+    exits = simulate_exits(data.high, data.low, data.close, breakouts, entry_prices,
+                           stoploss, stopprofit, max_days, direction=DIRECTION_REGISTRY['find_invertedcupwithhandle'])
 
+    #Pattern date is the left peak
+    trades_df, positions = _pattern_trades(df, left_idx, breakouts, np.minimum(breakouts + max_days - 1, len(df)-1),
+                                           entry_prices, exits, 'Inverted Cup with Handle')
+    total_profit = trades_df['profit'].sum() if not trades_df.empty else 0
 
-            #Confirm breakout below trough
-            breakout_idx = None
-            for idx in range(right_idx, min(right_idx + 10, len(df))):
-                if df['Close/Last'].iloc[idx] < trough_high:
-                    breakout_idx = idx
-                    break
-
-            if breakout_idx is None:
-                continue
-
-            #Execute trade
-            trade_date = df['Date'].iloc[breakout_idx]
-            if trade_date in executed_dates:
-                continue
-            executed_dates.add(trade_date)
-
-            entry_price = df['Open'].iloc[breakout_idx]
-            exit_price = None
-            stop = False
-
-            for day in range(max_days):
-                if breakout_idx + day >= len(df):
-                    break
-
-                current_high = df['High'].iloc[breakout_idx + day]
-                current_low = df['Low'].iloc[breakout_idx + day]
-
-                if not stop and current_low <= entry_price * stopprofit:
-                    exit_price = entry_price * stopprofit
-                    stop = True
-                elif not stop and current_high >= entry_price * stoploss:
-                    exit_price = entry_price * stoploss
-                    stop = True
-
-            if not stop:
-                exit_price = df['Close/Last'].iloc[min(breakout_idx + max_days - 1, len(df)-1)]
-
-            profit = entry_price-exit_price    #opposite as shorting
-            total_profit += profit
-
-            #Record trade with all required fields
-            trade_results.append({
-                'pattern_date': df['Date'].iloc[left_idx],  #Date of left peak
-                'entry_date': trade_date,
-                'exit_date': df['Date'].iloc[min(breakout_idx + max_days - 1, len(df)-1)],
-                'entry_price': entry_price,
-                'exit_price': exit_price,
-                'profit': profit,
-                'pattern_name': 'Inverted Cup with Handle'
-            })
-
-    trades_df = pd.DataFrame(trade_results)
-    
-    if not trades_df.empty:
-        print("\nInverted Cup with Handle Results:")
-        print(f"Total Trades: {len(trades_df)}")
-        print(f"Profitable Trades: {len(trades_df[trades_df['profit'] > 0])}")
-        print(f"Win Rate: {len(trades_df[trades_df['profit'] > 0]) / len(trades_df) * 100:.1f}%")
-        print(f"Total Profit: ${total_profit:.2f}")
-    else:
-        print("\nNo Inverted Cup with Handle patterns found")
-
-    global totalprofit
-    totalprofit += total_profit
+    if verbose:
+        if not trades_df.empty:
+            print("\nInverted Cup with Handle Results:")
+            print(f"Total Trades: {len(trades_df)}")
+            print(f"Profitable Trades: {len(trades_df[trades_df['profit'] > 0])}")
+            print(f"Win Rate: {len(trades_df[trades_df['profit'] > 0]) / len(trades_df) * 100:.1f}%")
+            print(f"Total Profit: ${total_profit:.2f}")
+        else:
+            print("\nNo Inverted Cup with Handle patterns found")
 
-    return trades_df, total_profit
+    return PatternResult('find_invertedcupwithhandle', trades_df, positions)
 
+@detector_range(warmup=_chart_pattern_warmup, lookahead=_chart_pattern_lookahead)
 def find_cup_with_handle(df, stoploss=0.94, stopprofit=1.2, max_days=105, 
                         min_pattern_days=4, max_pattern_days=40, 
                         lookback_days=3000, handle_depth_tolerance=5.0, 
-                        cup_symmetry_tolerance=5.0):
+                        cup_symmetry_tolerance=5.0, verbose=True):
     
     required_columns = {'Date', 'Open', 'High', 'Low', 'Close/Last'}
     if not required_columns.issubset(df.columns):
         missing_cols = required_columns - set(df.columns)
         raise ValueError(f"Missing columns: {missing_cols}")
 
-    #Convert columns to numeric 
-    for col in ['Open', 'High', 'Low', 'Close/Last']:
-        df[col] = pd.to_numeric(df[col].astype(str).str.replace(',', '').str.replace('$', ''), errors='coerce')
 
-    trade_results = []
-    total_profit = 0
-    executed_dates = set()
+    data = get_dataset(df)
     start_idx = max(0, len(df) - lookback_days)
 
-    for current_idx in range(start_idx, len(df) - max_days - max_pattern_days):
-        window_start = max(0, current_idx - max_pattern_days)
-        window_end = min(current_idx + max_pattern_days, len(df))
-        window = df.iloc[window_start:window_end]
+    #Every cup the scan windows can find, only the thresholds below depend on the tolerances
+    candidates = data.candidate_table(_cup_candidates, start_idx=start_idx,
+                                      end_idx=len(df) - max_days - max_pattern_days,
+                                      min_pattern_days=min_pattern_days, max_pattern_days=max_pattern_days)
+    cup_depth, symmetry_ratio, handle_depth = (candidates['cup_depth'], candidates['symmetry_ratio'],
+                                               candidates['handle_depth'])
+
+    #Validate cup formation, cup symmetry and handle depth, then the breakout above the cup rim
+    valid = (
+        ~((cup_depth < 0.005) | (cup_depth > 0.95)) &
+        ~(candidates['min_side_time'] < 2) &  #Minimum time requirement
+        ~(symmetry_ratio > cup_symmetry_tolerance) &
+        candidates['has_handle'] &
+        ~(handle_depth > handle_depth_tolerance) &
+        candidates['confirmed']
+    )
+
+    #One trade per breakout date, windows in scan order
+    rows = _first_per_date(df, candidates['breakout_idx'][valid], np.flatnonzero(valid))
+    left_high_idx, breakouts = candidates['left_high_idx'][rows], candidates['breakout_idx'][rows]
+
+    entry_prices = data.open[breakouts]
+    exits = simulate_exits(data.high, data.low, data.close, breakouts, entry_prices,
+                           stoploss, stopprofit, max_days)
+
+    trades_df, positions = _pattern_trades(df, left_high_idx, breakouts, np.minimum(breakouts + max_days - 1, len(df)-1),
+                                           entry_prices, exits, 'Cup with Handle', extra_columns={
+                                               'cup_depth': cup_depth[rows],
+                                               'handle_depth': handle_depth[rows],
+                                               'symmetry_ratio': symmetry_ratio[rows]
+                                           })
+    total_profit = trades_df['profit'].sum() if not trades_df.empty else 0
 
-        #Skip if window is too small
-        if len(window) < min_pattern_days:
-            continue
+    if verbose:
+        if not trades_df.empty:
+            print("\nCup with Handle Results:")
+            print(f"Total Trades: {len(trades_df)}")
+            print(f"Profitable Trades: {len(trades_df[trades_df['profit'] > 0])}")
+            print(f"Win Rate: {len(trades_df[trades_df['profit'] > 0]) / len(trades_df) * 100:.1f}%")
+            print(f"Total Profit: ${total_profit:.2f}")
+        else:
+            print("\nNo Cup with Handle patterns found")
 
-        try:
-            #Find initial high (left side of cup) 
-            left_section = window.iloc[0:min(min_pattern_days + 5, len(window)//2)]
-            if len(left_section) == 0:
-                continue
-            left_high_idx = left_section['High'].idxmax()
-            left_high = window['High'].loc[left_high_idx]
+    return PatternResult('find_cup_with_handle', trades_df, positions)
 
-            #Find the cup bottom 
-            cup_search_start = max(left_high_idx + 2, window_start + min_pattern_days)
-            cup_search_end = min(current_idx + max_pattern_days//2, len(df))
-            
-            if cup_search_start >= cup_search_end:
-                continue
-                
-            cup_section = df.iloc[cup_search_start:cup_search_end]
-            if len(cup_section) == 0:
-                continue
-                
-            cup_bottom_idx = cup_section['Low'].idxmin()
-            cup_bottom = df['Low'].loc[cup_bottom_idx]
+@detector_range(warmup=2, lookahead=_candle_lookahead)
+def find_invertedhammer(df, stoploss=0.999, stopprofit=1.003, max_days=3, min_shadow_ratio=1.003, body_percentage=0.5, verbose=True):
+    
+    #Looks for inverted hammer reversals.
 
-            if cup_bottom_idx <= left_high_idx:
-                continue
+    data = get_dataset(df)
+    candles = data.candles()
+
+    #Bearish candle followed by a bullish day, the cheap test over every bar
+    end_idx = max(0, len(df) - max_days - 1)
+    bars, next_day = slice(0, end_idx), slice(1, end_idx + 1)
+    idx = np.flatnonzero((data.close[bars] < data.open[bars]) & ~(data.close[next_day] <= data.open[next_day]))
+
+    body = candles['body'][idx]
+    total_range = candles['total_range'][idx]
+    upper_shadow = candles['upper_shadow'][idx]
+    lower_shadow = candles['lower_shadow'][idx]
+
+    is_hammer = (
+        (total_range != 0) &
+        (upper_shadow > (body * min_shadow_ratio)) &
+        (lower_shadow < upper_shadow) &
+        (body < (total_range * body_percentage))
+    )
+
+    #Execute trades on the next day's open
+    trades_df, positions = _next_day_trades(df, idx[is_hammer], 'Inverted Hammer',
+                                            stoploss, stopprofit, max_days)
+    total_profit = trades_df['profit'].sum() if not trades_df.empty else 0
+    
+    if verbose:
+        if not trades_df.empty:
+            print("\nInverted Hammer Results:")
+            print(f"Total Trades: {len(trades_df)}")
+            print(f"Profitable Trades: {len(trades_df[trades_df['profit'] > 0])}")
+            print(f"Win Rate: {len(trades_df[trades_df['profit'] > 0]) / len(trades_df) * 100:.1f}%")
+            print(f"Total Profit: ${total_profit:.2f}")
+        else:
+            print("\nNo Inverted Hammer patterns found")
 
-            #Find right side of cup - more flexible
-            right_search_start = cup_bottom_idx + 1
-            right_search_end = min(cup_bottom_idx + max_pattern_days, len(df))
-            
-            if right_search_start >= right_search_end:
-                continue
-                
-            right_section = df.iloc[right_search_start:right_search_end]
-            if len(right_section) == 0:
-                continue
-                
-            right_high_idx = right_section['High'].idxmax()
-            right_high = right_section['High'].loc[right_high_idx]
+    return PatternResult('find_invertedhammer', trades_df, positions)
 
-            #Validate cup formation 
-            cup_depth = (left_high - cup_bottom) / left_high
-            if cup_depth < 0.005 or cup_depth > 0.95:  
-                continue
+@detector_range(warmup=3, lookahead=_candle_lookahead)
+def find_shootingstar(df, stoploss=1.001, stopprofit=0.998, max_days=5, min_shadow_ratio=1.5, body_percentage=0.4, verbose=True):
+    
+    #Finds shooting star topping patterns with proper variable references.
 
-            #Check cup symmetry axed
-            left_time = cup_bottom_idx - left_high_idx
-            right_time = right_high_idx - cup_bottom_idx
-            if min(left_time, right_time) < 2:  #Minimum time requirement
-                continue
-            if abs(left_time - right_time) / max(left_time, right_time) > cup_symmetry_tolerance:
-                continue
+    data = get_dataset(df)
+    candles = data.candles()
 
-            #Verify handle formation 
-            handle_search_start = right_high_idx + 1
-            handle_search_end = min(right_high_idx + min_pattern_days + 5, len(df))
-            
-            if handle_search_start >= handle_search_end:
-                continue
-                
-            handle_section = df.iloc[handle_search_start:handle_search_end]
-            if len(handle_section) == 0:
-                continue
-                
-            handle_low = handle_section['Low'].min()
-            handle_depth = (right_high - handle_low) / (right_high - cup_bottom)
-            
-            if handle_depth > handle_depth_tolerance:
-                continue
+    #Short lower shadow relative to the upper one, the cheap test over every bar
+    end_idx = max(0, len(df) - max_days - 1)
+    bars = slice(0, end_idx)
+    idx = np.flatnonzero(candles['lower_shadow'][bars] < (candles['upper_shadow'][bars] * 0.25))
 
-            #Look for breakout above cup rim 
-            breakout_idx = None
-            for idx in range(right_high_idx + 1, min(right_high_idx + 15, len(df))):
-                if df['Close/Last'].iloc[idx] > right_high * 0.995:  #Allow slight tolerance
-                    breakout_idx = idx
-                    break
+    body = candles['body'][idx]
+    total_range = candles['total_range'][idx]
+    upper_shadow = candles['upper_shadow'][idx]
 
-            if breakout_idx is None:
-                continue
+    with np.errstate(divide='ignore', invalid='ignore'):
+        is_shooting_star = (
+            (total_range != 0) &
+            (upper_shadow > (body * min_shadow_ratio)) &
+            (body < (total_range * body_percentage)) &
+            (upper_shadow / total_range > 0.5)
+        )
 
-            #Execute trade
-            trade_date = df['Date'].iloc[breakout_idx]
-            if trade_date in executed_dates:
-                continue
-            executed_dates.add(trade_date)
-
-            entry_price = df['Open'].iloc[breakout_idx]
-            exit_price = None
-            stop = False
-
-            for day in range(max_days):
-                if breakout_idx + day >= len(df):
-                    break
-
-                current_high = df['High'].iloc[breakout_idx + day]
-                current_low = df['Low'].iloc[breakout_idx + day]
-
-                if not stop and current_high >= entry_price * stopprofit:
-                    exit_price = entry_price * stopprofit
-                    stop = True
-                elif not stop and current_low <= entry_price * stoploss:
-                    exit_price = entry_price * stoploss
-                    stop = True
-
-            if not stop:
-                exit_price = df['Close/Last'].iloc[min(breakout_idx + max_days - 1, len(df)-1)]
-
-            profit = exit_price - entry_price
-            total_profit += profit
-
-            trade_results.append({
-                'pattern_date': df['Date'].iloc[left_high_idx],
-                'entry_date': trade_date,
-                'exit_date': df['Date'].iloc[min(breakout_idx + max_days - 1, len(df)-1)],
-                'entry_price': entry_price,
-                'exit_price': exit_price,
-                'profit': profit,
-                'pattern_name': 'Cup with Handle',
-                'cup_depth': cup_depth,
-                'handle_depth': handle_depth,
-                'symmetry_ratio': abs(left_time - right_time) / max(left_time, right_time)
-            })
+    #uptrend confirmation (2 higher closes), the first two bars have no history and count as uptrend
+    close = data.close
+    uptrend = (idx < 2) | (close[idx - 2] < close[idx - 1])
 
-        except (IndexError, KeyError) as e:
-            #Skip window if any index errors occur
-            continue
+    #Execute trades (short position) on the next day's open, allowing both bearish and neutral candles
+    trades_df, positions = _next_day_trades(df, idx[is_shooting_star & uptrend], 'Shooting Star',
+                                            stoploss, stopprofit, max_days, direction=DIRECTION_REGISTRY['find_shootingstar'])
+    total_profit = trades_df['profit'].sum() if not trades_df.empty else 0
+    
+    if verbose:
+        if not trades_df.empty:
+            print("\nShooting Star Results:")
+            print(f"Total Trades: {len(trades_df)}")
+            print(f"Profitable Trades: {len(trades_df[trades_df['profit'] > 0])}")
+            print(f"Win Rate: {len(trades_df[trades_df['profit'] > 0]) / len(trades_df) * 100:.1f}%")
+            print(f"Average Profit: ${total_profit/len(trades_df):.5f}")
+            print(f"Total Profit: ${total_profit:.5f}")
+        else:
+            print("\nNo Shooting Star patterns found")
+
+    return PatternResult('find_shootingstar', trades_df, positions)
 
-    trades_df = pd.DataFrame(trade_results)
+@detector_range(warmup=INDICATOR_WARMUP, lookahead=_candle_lookahead)
+def find_tweezerbottoms(df, stoploss=0.9998, stopprofit=1.003, max_days=4, 
+                        price_tolerance=0.0033, body_ratio_tolerance=0.95, verbose=True):
     
-    if not trades_df.empty:
-        print("\nCup with Handle Results:")
-        print(f"Total Trades: {len(trades_df)}")
-        print(f"Profitable Trades: {len(trades_df[trades_df['profit'] > 0])}")
-        print(f"Win Rate: {len(trades_df[trades_df['profit'] > 0]) / len(trades_df) * 100:.1f}%")
-        print(f"Total Profit: ${total_profit:.2f}")
-    else:
-        print("\nNo Cup with Handle patterns found")
+    #Identifies tweezer bottom reversals with proper variable references.
+    
+    data = get_dataset(df)
+    body_sizes = data.candles()['body']
 
-    global totalprofit
-    totalprofit += total_profit
+    #RSI and moving averages for trend context
+    indicators = data.indicators
+    rsi = indicators.rsi(12)
+    sma5 = indicators.sma(5)
+    sma10 = indicators.sma(10)
 
-    return trades_df, total_profit
+    #First candle bearish, second bullish, the cheap test over every bar
+    end_idx = max(1, len(df) - max_days - 1)
+    open_, close, low = data.open, data.close, data.low
+    prev_bars, curr_bars = slice(0, end_idx - 1), slice(1, end_idx)
+    idx = 1 + np.flatnonzero((close[prev_bars] < open_[prev_bars]) & (close[curr_bars] > open_[curr_bars]))
 
-def find_invertedhammer(df, stoploss=0.999, stopprofit=1.003, max_days=3, min_shadow_ratio=1.003, body_percentage=0.5):
-    
-    #Looks for inverted hammer reversals.
+    #Price similarity check
+    prev_low = low[idx - 1]
+    idx = idx[np.abs(prev_low - low[idx]) <= (prev_low * price_tolerance)]
 
-    trade_results = []
-    total_profit = 0
-    executed_dates = set()
+    #Oversold condition, the most selective of the remaining tests so it narrows the bars first
+    idx = idx[rsi[idx] < 45]
 
-    for i in range(len(df) - max_days - 1):
-        #Calculate candlestick components
-        open_price = df['Open'].iloc[i]
-        close_price = df['Close/Last'].iloc[i]
-        high_price = df['High'].iloc[i]
-        low_price = df['Low'].iloc[i]
-        
-        body = abs(close_price - open_price)
-        total_range = high_price - low_price
-        upper_shadow = high_price - max(open_price, close_price)
-        lower_shadow = min(open_price, close_price) - low_price
-        
-        if total_range == 0:  #Avoid division by zero
-            continue
-            
-        is_hammer = (
-            upper_shadow > (body * min_shadow_ratio) and  
-            lower_shadow < upper_shadow and              
-            body < (total_range * body_percentage) and
-            close_price < open_price                     
-        )
-        
-        if is_hammer:
-            #Confirming next day is bullish
-            if i + 1 >= len(df):
-                continue
-                
-            next_day = df.iloc[i + 1]
-            if next_day['Close/Last'] <= next_day['Open']:  
-                continue
+    prev, curr = idx - 1, idx
+    prev_body, curr_body = body_sizes[prev], body_sizes[curr]
+    curr_close, curr_sma5 = close[curr], sma5[curr]
 
-            #Execute trade
-            entry_price = df['Open'].iloc[i + 1]
-            exit_price = None
-            
-            for j in range(max_days):
-                current_idx = i + 1 + j
-                if current_idx >= len(df):
-                    break
-                
-                current_high = df['High'].iloc[current_idx]
-                current_low = df['Low'].iloc[current_idx]
-                
-                if current_high >= entry_price * stopprofit:
-                    exit_price = entry_price * stopprofit
-                    break
-                elif current_low <= entry_price * stoploss:
-                    exit_price = entry_price * stoploss
-                    break
-                    
-            if exit_price is None:
-                exit_price = df['Close/Last'].iloc[min(i + max_days, len(df)-1)]
-            
-            profit = exit_price - entry_price
-            
-            trade_results.append({
-                'pattern_date': df['Date'].iloc[i],  
-                'entry_date': df['Date'].iloc[i + 1],
-                'exit_date': df['Date'].iloc[min(i + max_days, len(df)-1)],
-                'entry_price': entry_price,
-                'exit_price': exit_price,
-                'profit': profit,
-                'pattern_name': 'Inverted Hammer'  
-            })
-            total_profit += profit
+    is_tweezer_bottom = (
+        #Body size similarity
+        (np.abs(prev_body - curr_body) <= (np.maximum(prev_body, curr_body) * body_ratio_tolerance)) &
 
-    trades_df = pd.DataFrame(trade_results)
-    
-    if not trades_df.empty:
-        print("\nInverted Hammer Results:")
-        print(f"Total Trades: {len(trades_df)}")
-        print(f"Profitable Trades: {len(trades_df[trades_df['profit'] > 0])}")
-        print(f"Win Rate: {len(trades_df[trades_df['profit'] > 0]) / len(trades_df) * 100:.1f}%")
-        print(f"Total Profit: ${total_profit:.2f}")
-    else:
-        print("\nNo Inverted Hammer patterns found")
+        #Simplified downtrend check, idx - 2 wraps to the last bar for the first candle like iloc[-1]
+        ((close[prev] < close[idx - 2]) | (curr_close < curr_sma5)) &
 
-    global totalprofit
-    totalprofit += total_profit
+        #Price below moving average
+        ((curr_close < sma10[curr]) | (curr_close < curr_sma5)) &
 
-    return trades_df, total_profit
+        #Minimum body size
+        (curr_body > curr_close * 0.0001)
+    )
 
-def find_shootingstar(df, stoploss=1.001, stopprofit=0.998, max_days=5, min_shadow_ratio=1.5, body_percentage=0.4):
+    trades_df, positions = _next_day_trades(df, _first_per_date(df, idx[is_tweezer_bottom]), 'Tweezer Bottoms',
+                                            stoploss, stopprofit, max_days)
+    total_profit = trades_df['profit'].sum() if not trades_df.empty else 0
     
-    #Finds shooting star topping patterns with proper variable references.
+    if verbose:
+        if not trades_df.empty:
+            print("\nTweezer Bottoms Results:")
+            print(f"Total Trades: {len(trades_df)}")
+            print(f"Profitable Trades: {len(trades_df[trades_df['profit'] > 0])}")
+            print(f"Win Rate: {len(trades_df[trades_df['profit'] > 0]) / len(trades_df) * 100:.1f}%")
+            print(f"Average Profit: ${total_profit/len(trades_df):.5f}")
+            print(f"Total Profit: ${total_profit:.5f}")
+        else:
+            print("\nNo Tweezer Bottom patterns found")
 
-    trade_results = []
-    total_profit = 0
-    executed_dates = set()
+    return PatternResult('find_tweezerbottoms', trades_df, positions)
 
-    for i in range(len(df) - max_days - 1):
-        open_price = df['Open'].iloc[i]
-        close_price = df['Close/Last'].iloc[i]
-        high_price = df['High'].iloc[i]
-        low_price = df['Low'].iloc[i]
-        
-        body = abs(close_price - open_price)
-        total_range = high_price - low_price
-        upper_shadow = high_price - max(open_price, close_price)
-        lower_shadow = min(open_price, close_price) - low_price
-        
-        if total_range == 0:
-            continue
-            
-        is_shooting_star = (
-            upper_shadow > (body * min_shadow_ratio) and     
-            lower_shadow < (upper_shadow * 0.25) and        
-            body < (total_range * body_percentage) and      
-            upper_shadow / total_range > 0.5                
-        )
-        
-        #uptrend confirmation (2 higher closes)
-        if i >= 2:
-            prior_closes = df['Close/Last'].iloc[i-2:i].tolist()
-            uptrend = prior_closes[0] < prior_closes[1]
-        else:
-            uptrend = True
-        
-        if is_shooting_star and uptrend:
-            #Allow both bearish and neutral candles
-            if i + 1 >= len(df):
-                continue
-                
-            #Execute trade (short position)
-            entry_price = df['Open'].iloc[i + 1]
-            exit_price = None
-            stop = False
-            
-            for j in range(max_days):
-                current_idx = i + 1 + j
-                if current_idx >= len(df):
-                    break
-                
-                current_high = df['High'].iloc[current_idx]
-                current_low = df['Low'].iloc[current_idx]
-                
-                if not stop and current_low <= entry_price * stopprofit:
-                    exit_price = entry_price * stopprofit
-                    stop = True
-                elif not stop and current_high >= entry_price * stoploss:
-                    exit_price = entry_price * stoploss
-                    stop = True
-    
-            if exit_price is None:
-                exit_price = df['Close/Last'].iloc[min(i + max_days, len(df)-1)]
-            
-            profit = entry_price - exit_price
-            
-            trade_results.append({
-                'pattern_date': df['Date'].iloc[i],  
-                'entry_date': df['Date'].iloc[i + 1],
-                'exit_date': df['Date'].iloc[min(i + max_days, len(df)-1)],
-                'entry_price': entry_price,
-                'exit_price': exit_price,
-                'profit': profit,
-                'pattern_name': 'Shooting Star'  
-            })
-            total_profit += profit
+def scan_patterns(df, pattern_names=None, workers=None, **params):
+    """Shared feature preparation plus every detector: the columns, indicators, swing points and range
+    tables are built once up front, then each detector in PATTERN_REGISTRY (or just pattern_names)
+    runs its own pass over them in turn with params (e.g. start/end), across a process pool if
+    workers > 1. The detectors are not merged into one pass over the bars.
+    Returns {pattern name: trades DataFrame} in registry order."""
+    pattern_names = list(pattern_names or PATTERN_REGISTRY)
+    get_dataset(df).prepare_features()
 
-    trades_df = pd.DataFrame(trade_results)
-    
-    if not trades_df.empty:
-        print("\nShooting Star Results:")
-        print(f"Total Trades: {len(trades_df)}")
-        print(f"Profitable Trades: {len(trades_df[trades_df['profit'] > 0])}")
-        print(f"Win Rate: {len(trades_df[trades_df['profit'] > 0]) / len(trades_df) * 100:.1f}%")
-        print(f"Average Profit: ${total_profit/len(trades_df):.5f}")
-        print(f"Total Profit: ${total_profit:.5f}")
+    if workers and workers > 1:
+        outcomes = run_patterns_parallel(df, pattern_names, workers, **params)
+    else:
+        outcomes = {func_name: ('', globals()[func_name](df, **params)) for func_name in pattern_names}
+
+    trades = {}
+    for func_name in pattern_names:
+        output, result = outcomes[func_name]
+        print(output, end='')
+        if isinstance(result, Exception):
+            raise result
+        trades[PATTERN_REGISTRY[func_name]] = result.trades
+    return trades
+
+def expand_grid(grid):
+    """Every combination of a parameter grid {name: values} as a list of keyword dicts."""
+    names = list(grid)
+    return [dict(zip(names, values)) for values in product(*(grid[name] for name in names))]
+
+
+def _grid_rows(df, func_name, combinations):
+    #Runs one detector once per parameter combination, the dataset's cached features are reused by every run
+    detector = globals()[func_name]
+    rows = []
+    for params in combinations:
+        result = detector(df, **params, verbose=False)
+        rows.append({
+            **params,
+            'total_profit': result.total_profit,
+            'win_rate': result.win_rate * 100,
+            'trades': result.trade_count,
+            'avg_profit': result.total_profit / result.trade_count if result.trade_count else 0,
+            'max_drawdown': result.max_drawdown
+        })
+    return rows
+
+
+def _run_shared_grid(handle, func_name, combinations):
+    #Worker side: a chunk of the grid on the shared dataset
+    return _grid_rows(_shared_dataset(handle).frame, func_name, combinations)
+
+
+def grid_search(df, detector, grid, workers=None, rank_by='total_profit', ascending=False):
+    """Evaluates a detector over every combination of grid {parameter: values}, e.g.
+    grid_search(df, 'find_bullishhammer', {'stoploss': [0.998, 0.999], 'max_days': [3, 5, 8]}).
+    The dataset's features are built once and shared with a process pool when workers > 1,
+    so every combination reuses the same indicators, swing points and range tables.
+    Returns a DataFrame with one row per combination ranked by rank_by."""
+    func_name = detector if isinstance(detector, str) else detector.__name__
+    if func_name not in PATTERN_REGISTRY:
+        raise ValueError(f"Unknown detector {func_name}")
+    accepted = set(inspect.signature(globals()[func_name]).parameters) - {'df', 'verbose'}
+    unknown = [name for name in grid if name not in accepted]
+    if unknown:
+        raise ValueError(f"{func_name} has no parameter(s) {', '.join(unknown)}")
+
+    combinations = expand_grid(grid)
+    workers = min(workers or os.cpu_count() or 1, max(len(combinations), 1))
+    data = get_dataset(df).prepare_features()
+
+    if workers == 1:
+        rows = _grid_rows(df, func_name, combinations)
     else:
-        print("\nNo Shooting Star patterns found")
+        #A few chunks per worker keeps the pool busy without sending one task per combination
+        chunk_size = max(1, -(-len(combinations) // (workers * 4)))
+        chunks = [combinations[i:i + chunk_size] for i in range(0, len(combinations), chunk_size)]
+        with SharedArrays(data.export_features()) as shared:
+            with ProcessPoolExecutor(max_workers=workers, mp_context=_pool_context()) as pool:
+                futures = [pool.submit(_run_shared_grid, shared.handle, func_name, chunk) for chunk in chunks]
+                rows = [row for future in futures for row in future.result()]
 
-    global totalprofit
-    totalprofit += total_profit
+    ranked = pd.DataFrame(rows, columns=[*grid, 'total_profit', 'win_rate', 'trades', 'avg_profit', 'max_drawdown'])
+    return ranked.sort_values(rank_by, ascending=ascending, kind='stable').reset_index(drop=True)
 
-    return trades_df, total_profit
+def _score_profit(result):
+    return float(result.total_profit)
 
-def find_tweezerbottoms(df, stoploss=0.9998, stopprofit=1.003, max_days=4, 
-                        price_tolerance=0.0033, body_ratio_tolerance=0.95):
-    
-    #Identifies tweezer bottom reversals with proper variable references.
-    
-    trade_results = []
-    total_profit = 0
-    executed_dates = set()
-
-    #Calculate RSI 
-    delta = df['Close/Last'].diff()
-    gain = (delta.where(delta > 0, 0)).rolling(window=12).mean()
-    loss = (-delta.where(delta < 0, 0)).rolling(window=12).mean()
-    rs = gain / loss
-    df['RSI'] = 100 - (100 / (1 + rs))
-
-    #Calculate multiple moving averages for trend context
-    df['SMA5'] = df['Close/Last'].rolling(window=5).mean()
-    df['SMA10'] = df['Close/Last'].rolling(window=10).mean()
-
-    for i in range(1, len(df) - max_days - 1):
-        prev_candle = df.iloc[i-1]
-        curr_candle = df.iloc[i]
-        
-        prev_body = abs(prev_candle['Close/Last'] - prev_candle['Open'])
-        curr_body = abs(curr_candle['Close/Last'] - curr_candle['Open'])
-        
-        is_tweezer_bottom = (
-            #Price similarity check
-            abs(prev_candle['Low'] - curr_candle['Low']) <= (prev_candle['Low'] * price_tolerance) and
-            
-            #First candle bearish, second bullish
-            prev_candle['Close/Last'] < prev_candle['Open'] and
-            curr_candle['Close/Last'] > curr_candle['Open'] and
-            
-            #Body size similarity
-            abs(prev_body - curr_body) <= (max(prev_body, curr_body) * body_ratio_tolerance) and
-            
-            #Simplified downtrend check
-            (df['Close/Last'].iloc[i-1] < df['Close/Last'].iloc[i-2] or
-             df['Close/Last'].iloc[i] < df['SMA5'].iloc[i]) and
-            
-            #Oversold condition
-            df['RSI'].iloc[i] < 45 and
-            
-            #Price below moving average
-            (curr_candle['Close/Last'] < df['SMA10'].iloc[i] or 
-             curr_candle['Close/Last'] < df['SMA5'].iloc[i]) and
-            
-            #Minimum body size
-            curr_body > curr_candle['Close/Last'] * 0.0001
-        )
-        
-        if is_tweezer_bottom:
-            trade_date = curr_candle['Date']
-            if trade_date in executed_dates:
-                continue
-            executed_dates.add(trade_date)
-            
-            entry_price = df['Open'].iloc[i+1]
-            exit_price = None
-            stop = False
-            
-            for j in range(max_days):
-                current_idx = i + 1 + j
-                if current_idx >= len(df):
-                    break
-                
-                current_high = df['High'].iloc[current_idx]
-                current_low = df['Low'].iloc[current_idx]
-                
-                if not stop:
-                    if current_high >= entry_price * stopprofit:
-                        exit_price = entry_price * stopprofit
-                        stop = True
-                    elif current_low <= entry_price * stoploss:
-                        exit_price = entry_price * stoploss
-                        stop = True
-            
-            if not stop:
-                exit_price = df['Close/Last'].iloc[min(i + max_days, len(df)-1)]
-            
-            profit = exit_price - entry_price
-            
-            trade_results.append({
-                'pattern_date': df['Date'].iloc[i],  
-                'entry_date': df['Date'].iloc[i + 1],
-                'exit_date': df['Date'].iloc[min(i + max_days, len(df)-1)],
-                'entry_price': entry_price,
-                'exit_price': exit_price,
-                'profit': profit,
-                'pattern_name': 'Tweezer Bottoms'  
-            })
-            total_profit += profit
 
-    trades_df = pd.DataFrame(trade_results)
-    
-    if not trades_df.empty:
-        print("\nTweezer Bottoms Results:")
-        print(f"Total Trades: {len(trades_df)}")
-        print(f"Profitable Trades: {len(trades_df[trades_df['profit'] > 0])}")
-        print(f"Win Rate: {len(trades_df[trades_df['profit'] > 0]) / len(trades_df) * 100:.1f}%")
-        print(f"Average Profit: ${total_profit/len(trades_df):.5f}")
-        print(f"Total Profit: ${total_profit:.5f}")
-    else:
-        print("\nNo Tweezer Bottom patterns found")
+def _score_sharpe(result):
+    #Per trade Sharpe ratio scaled by the square root of the trade count, 0 with fewer than two trades
+    profit = result.trades['profit'].to_numpy() if not result.trades.empty else np.empty(0)
+    if len(profit) < 2 or profit.std() == 0:
+        return 0.0
+    return float(profit.mean() / profit.std() * np.sqrt(len(profit)))
 
-    global totalprofit
-    totalprofit += total_profit
 
-    return trades_df, total_profit
+#Fitness functions for optimise_parameters, looked up by name so workers can receive them
+FITNESS_SCORES = {
+    'profit': _score_profit,
+    'sharpe': _score_sharpe
+}
+
+
+def _fitness(df, func_name, score, params):
+    return FITNESS_SCORES[score](globals()[func_name](df, **params, verbose=False))
+
+
+def _run_shared_fitness(handle, func_name, score, params):
+    #Worker side: one backtest on the shared dataset
+    return _fitness(_shared_dataset(handle).frame, func_name, score, params)
+
+
+def _decode_genes(individual, bounds):
+    #Clamps each gene to its bounds and snaps it to the parameter's step (1 for integers),
+    #writing the result back so equal parameter sets are equal individuals
+    params = {}
+    for i, (name, bound) in enumerate(bounds.items()):
+        low, high = bound[0], bound[1]
+        step = bound[2] if len(bound) > 2 else (1 if isinstance(low, int) and isinstance(high, int) else None)
+        value = min(max(individual[i], low), high)
+        value = round(low + round((value - low) / step) * step, 10) if step else round(value, 6)
+        value = min(max(value, low), high)
+        if isinstance(step, int) and isinstance(low, int):
+            value = int(value)
+        individual[i] = value
+        params[name] = value
+    return params
+
+
+def optimise_parameters(df, detector, bounds, population_size=30, generations=10, workers=None,
+                        score='profit', crossover_rate=0.6, mutation_rate=0.3, seed=None):
+    """Evolves a detector's keyword parameters with a DEAP genetic algorithm.
+    bounds maps each parameter to (low, high) or (low, high, step); integer bounds give integer parameters.
+    Fitness is FITNESS_SCORES[score] of the detector's result, evaluated through a process pool map
+    registered on the toolbox when workers > 1. Parameter sets that were already scored are
+    answered from a cache instead of being backtested again.
+    Returns a dict with the best parameters, their fitness, per generation statistics and run counters."""
+    from deap import base, creator, tools, algorithms
+
+    func_name = detector if isinstance(detector, str) else detector.__name__
+    if func_name not in PATTERN_REGISTRY:
+        raise ValueError(f"Unknown detector {func_name}")
+    if score not in FITNESS_SCORES:
+        raise ValueError(f"Unknown score {score}, expected one of {', '.join(FITNESS_SCORES)}")
+    accepted = set(inspect.signature(globals()[func_name]).parameters) - {'df', 'verbose'}
+    unknown = [name for name in bounds if name not in accepted]
+    if unknown:
+        raise ValueError(f"{func_name} has no parameter(s) {', '.join(unknown)}")
+
+    if seed is not None:
+        random.seed(seed)
+
+    #creator classes are module level in DEAP, only create them once per process
+    if not hasattr(creator, 'PatternFitness'):
+        creator.create('PatternFitness', base.Fitness, weights=(1.0,))
+    if not hasattr(creator, 'PatternIndividual'):
+        creator.create('PatternIndividual', list, fitness=creator.PatternFitness)
+
+    lows = [bound[0] for bound in bounds.values()]
+    highs = [bound[1] for bound in bounds.values()]
+    toolbox = base.Toolbox()
+    toolbox.register('individual', tools.initIterate, creator.PatternIndividual,
+                     lambda: [random.uniform(low, high) for low, high in zip(lows, highs)])
+    toolbox.register('population', tools.initRepeat, list, toolbox.individual)
+    toolbox.register('mate', tools.cxBlend, alpha=0.5)
+    toolbox.register('mutate', tools.mutGaussian, mu=0, sigma=[(high - low) / 10 for low, high in zip(lows, highs)],
+                     indpb=0.3)
+    toolbox.register('select', tools.selTournament, tournsize=3)
+
+    data = get_dataset(df).prepare_features()
+    cache = {}
+    counters = {'evaluations': 0, 'cache_hits': 0, 'seconds': 0.0}
+
+    def evaluate(individuals):
+        #Only parameter sets never seen before are sent to toolbox.map, the rest come from the cache
+        keys = [tuple(_decode_genes(ind, bounds).items()) for ind in individuals]
+        missing = list(dict.fromkeys(key for key in keys if key not in cache))
+        counters['cache_hits'] += len(keys) - len(missing)
+        start = time.perf_counter()
+        for key, value in zip(missing, toolbox.map(toolbox.evaluate, [dict(key) for key in missing])):
+            cache[key] = value
+        counters['seconds'] += time.perf_counter() - start
+        counters['evaluations'] += len(missing)
+        for ind, key in zip(individuals, keys):
+            ind.fitness.values = (cache[key],)
+
+    workers = min(workers or os.cpu_count() or 1, population_size)
+    with contextlib.ExitStack() as stack:
+        if workers > 1:
+            shared = stack.enter_context(SharedArrays(data.export_features()))
+            pool = stack.enter_context(ProcessPoolExecutor(max_workers=workers, mp_context=_pool_context()))
+            toolbox.register('evaluate', _run_shared_fitness, shared.handle, func_name, score)
+            toolbox.register('map', pool.map)
+        else:
+            toolbox.register('evaluate', _fitness, df, func_name, score)
+
+        stats = tools.Statistics(lambda ind: ind.fitness.values[0])
+        for name, func in (('max', np.max), ('avg', np.mean), ('min', np.min)):
+            stats.register(name, func)
+        hall_of_fame = tools.HallOfFame(1)
+
+        population = toolbox.population(n=population_size)
+        evaluate(population)
+        hall_of_fame.update(population)
+        history = [{'generation': 0, **stats.compile(population)}]
+
+        for generation in range(1, generations + 1):
+            offspring = algorithms.varAnd(toolbox.select(population, len(population)), toolbox,
+                                          crossover_rate, mutation_rate)
+            evaluate([ind for ind in offspring if not ind.fitness.valid])
+            #Keep the best individual found so far in the population
+            offspring[min(range(len(offspring)), key=lambda i: offspring[i].fitness.values[0])] = \
+                toolbox.clone(hall_of_fame[0])
+            population[:] = offspring
+            hall_of_fame.update(population)
+            history.append({'generation': generation, **stats.compile(population)})
+
+    requested = counters['evaluations'] + counters['cache_hits']
+    rate = counters['evaluations'] / counters['seconds'] if counters['seconds'] > 0 else 0
+    hit_rate = counters['cache_hits'] / requested * 100 if requested else 0
+    best = dict(zip(bounds, hall_of_fame[0]))
+
+    print(f"\nGenetic optimisation of {PATTERN_REGISTRY[func_name]} ({score})")
+    print(f"Generations: {generations}, population: {population_size}")
+    print(f"Backtests: {counters['evaluations']} ({rate:.1f} evaluations/s)")
+    print(f"Fitness cache: {counters['cache_hits']} hits of {requested} requests ({hit_rate:.1f}% hit rate)")
+    print(f"Best fitness: {hall_of_fame[0].fitness.values[0]:.5f} with {best}")
+
+    return {
+        'best_params': best,
+        'best_fitness': hall_of_fame[0].fitness.values[0],
+        'history': pd.DataFrame(history),
+        'generations': generations,
+        'evaluations': counters['evaluations'],
+        'cache_hits': counters['cache_hits'],
+        'cache_hit_rate': hit_rate,
+        'evaluations_per_second': rate
+    }
 
-def analysepatterns(df, lookback_days=3000):
+def _detector_parameters(func_name):
+    return inspect.signature(globals()[func_name]).parameters
+
+
+def _fold_halo(func_name, grid):
+    #max_pattern_days + max_days bars, using the largest value the grid (or the default) allows
+    parameters = _detector_parameters(func_name)
+    halo = 0
+    for name in ('max_pattern_days', 'max_days'):
+        if name in grid:
+            halo += int(max(grid[name]))
+        elif name in parameters:
+            halo += int(parameters[name].default)
+    return halo
+
+
+def _walk_forward_fold(fold, train_df, test_df, test_rows, func_name, grid, method, rank_by, options):
+    #Optimises on the train slice and scores the winner on the test slice, test_rows are the
+    #[start, stop) rows of test_df whose entries belong to this fold
+    scan_all = 'lookback_days' in _detector_parameters(func_name) and 'lookback_days' not in grid
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        if method == 'grid':
+            fixed = {'lookback_days': [len(train_df)]} if scan_all else {}
+            ranked = grid_search(train_df, func_name, {**grid, **fixed}, workers=1, rank_by=rank_by)
+            params = {name: ranked[name].iloc[0] for name in grid}
+            params = {name: value.item() if hasattr(value, 'item') else value for name, value in params.items()}
+            train_score = ranked[rank_by].iloc[0]
+        else:
+            fixed = {'lookback_days': (len(train_df), len(train_df))} if scan_all else {}
+            outcome = optimise_parameters(train_df, func_name, {**grid, **fixed}, workers=1, **options)
+            params = {name: outcome['best_params'][name] for name in grid}
+            train_score = outcome['best_fitness']
+    optimise_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    fixed = {'lookback_days': len(test_df)} if scan_all else {}
+    result = globals()[func_name](test_df, **params, **fixed, verbose=False)
+    entry_idx = result.positions['entry_idx']
+    trades = result.trades[(entry_idx >= test_rows[0]) & (entry_idx < test_rows[1])] if not result.trades.empty else result.trades
+    trades = trades.assign(fold=fold) if not trades.empty else trades
+    test_seconds = time.perf_counter() - start
+
+    summary = {
+        'fold': fold,
+        'train_start': train_df['Date'].iloc[0],
+        'train_end': train_df['Date'].iloc[-1],
+        'test_start': test_df['Date'].iloc[test_rows[0]],
+        'test_end': test_df['Date'].iloc[test_rows[1] - 1],
+        'params': params,
+        'train_score': train_score,
+        'test_trades': len(trades),
+        'test_profit': trades['profit'].sum() if not trades.empty else 0,
+        'optimise_seconds': optimise_seconds,
+        'test_seconds': test_seconds
+    }
+    return summary, trades
+
+
+def walk_forward(df, detector, grid, train_bars=1000, test_bars=250, step=None, method='grid',
+                 workers=None, rank_by='total_profit', **options):
+    """Rolling walk-forward backtest. The series is split into train/test folds, the detector is
+    optimised on each train fold (method='grid' over grid {parameter: values}, or method='ga' with
+    grid as optimise_parameters bounds and options passed on to it) and the winning parameters are
+    scored on the following test fold. Folds run across a process pool when workers > 1.
+
+    Each test fold is given a halo of max_pattern_days + max_days bars on both sides (plus the
+    indicator warm-up before it), so patterns that form or exit across its edges are found; only
+    trades entered inside the test fold are kept. Train folds never see bars after their end.
+    Returns the stitched out-of-sample trades and one summary row per fold, with timings."""
+    func_name = detector if isinstance(detector, str) else detector.__name__
+    if func_name not in PATTERN_REGISTRY:
+        raise ValueError(f"Unknown detector {func_name}")
+    if method not in ('grid', 'ga'):
+        raise ValueError("method must be 'grid' or 'ga'")
+    unknown = [name for name in grid if name not in set(_detector_parameters(func_name)) - {'df', 'verbose'}]
+    if unknown:
+        raise ValueError(f"{func_name} has no parameter(s) {', '.join(unknown)}")
+
+    n = len(df)
+    step = step or test_bars
+    halo = _fold_halo(func_name, grid)
+    folds = []
+    for train_start in range(0, max(n - train_bars, 0), step):
+        train_end = train_start + train_bars
+        test_end = min(train_end + test_bars, n)
+        #Test slice with its halos, and the test fold's rows within that slice
+        lo, hi = max(0, train_end - halo - INDICATOR_WARMUP), min(n, test_end + halo)
+        folds.append((len(folds), df.iloc[train_start:train_end].reset_index(drop=True),
+                      df.iloc[lo:hi].reset_index(drop=True), (train_end - lo, test_end - lo)))
+    if not folds:
+        raise ValueError(f"Need more than train_bars={train_bars} bars, got {n}")
+
+    print(f"\nWalk-forward {PATTERN_REGISTRY[func_name]}: {len(folds)} folds, "
+          f"{train_bars} train / {test_bars} test bars, halo {halo} bars")
+    start = time.perf_counter()
+    workers = min(workers or os.cpu_count() or 1, len(folds))
+    arguments = [(*fold, func_name, grid, method, rank_by, options) for fold in folds]
+    if workers == 1:
+        outcomes = [_walk_forward_fold(*args) for args in arguments]
+    else:
+        with ProcessPoolExecutor(max_workers=workers, mp_context=_pool_context()) as pool:
+            outcomes = list(pool.map(_walk_forward_fold, *zip(*arguments)))
+
+    summary = pd.DataFrame([outcome[0] for outcome in outcomes])
+    fold_trades = [outcome[1] for outcome in outcomes if not outcome[1].empty]
+    trades = pd.concat(fold_trades, ignore_index=True) if fold_trades else pd.DataFrame()
+
+    for row in summary.itertuples():
+        print(f"Fold {row.fold}: {row.test_start:%Y-%m-%d} to {row.test_end:%Y-%m-%d}, {row.test_trades} trades, "
+              f"profit ${row.test_profit:.5f} ({row.optimise_seconds:.2f}s optimise, {row.test_seconds:.3f}s test)")
+    print(f"Out-of-sample: {len(trades)} trades, profit ${summary['test_profit'].sum():.5f} "
+          f"in {time.perf_counter() - start:.2f}s")
+    return trades, summary
+
+def analysepatterns(df, lookback_days=3000, fused=True, workers=None,
+                    output_path='trading_visualization.html', start=None, end=None):
     
     #Runs all pattern detection functions and presents results showing every pattern and their profits.
+    #fused builds every shared feature up front before the detectors run,
+    #instead of each detector building what it reads on first use,
+    #workers > 1 runs the detectors in a process pool over shared memory,
+    #output_path=None skips saving the visualisation.
+    #start/end (dates or rows) limit the patterns to a range, without them the last lookback_days bars are used
     
-    global totalprofit
-    totalprofit = 0
+    range_params = {}
+    if start is None and end is None and lookback_days < len(df):
+        start = -lookback_days
+    if start is not None or end is not None:
+        #Only the range plus the widest detector halo is scanned, the detectors slice their own halos from
+        #it and all of them share the features built once for it
+        first, stop = _range_rows(df, start, end)
+        if first >= stop:
+            raise ValueError(f"No bars between {start} and {end}")
+        halos = [range_halo(func_name) for func_name in PATTERN_REGISTRY]
+        lo = max(0, first - max(warmup for warmup, _ in halos))
+        hi = min(len(df), stop + max(lookahead for _, lookahead in halos))
+        if (lo, hi) != (0, len(df)):
+            df = get_dataset(df).slice_frame(lo, hi)
+        range_params = {'start': first - lo, 'end': stop - lo}
+
+    if fused:
+        get_dataset(df).prepare_features()
     
     results = {}
     total_trades = 0
     all_trades_dfs = []
     
     print("\nStarting complete pattern analysis")
-    print(f"Analyzing {lookback_days} days of data")
+    if range_params:
+        print(f"Analyzing {df['Date'].iloc[range_params['start']]:%Y-%m-%d} to "
+              f"{df['Date'].iloc[range_params['end'] - 1]:%Y-%m-%d} ({range_params['end'] - range_params['start']} bars)")
+    else:
+        print(f"Analyzing {lookback_days} days of data")
     print(f"Testing {len(PATTERN_REGISTRY)} different pattern types")
     
     #Define all pattern functions with their names
@@ -2689,20 +3980,26 @@ def analysepatterns(df, lookback_days=3000):
         ('Tweezer Bottoms', find_tweezerbottoms)
     ]
     
+    parallel_results = None
+    if workers and workers > 1:
+        parallel_results = run_patterns_parallel(df, [func.__name__ for _, func in pattern_functions], workers,
+                                                 **range_params)
+
     #Run each pattern detection function
     for i, (pattern_name, pattern_func) in enumerate(pattern_functions, 1):
         print(f"\n[{i:2d}/{len(pattern_functions)}] Analyzing {pattern_name} patterns...")
         
         try:
-            #Execute pattern detection
-            result = pattern_func(df)
-            
-            #Handle different return types
-            if isinstance(result, tuple):
-                trades_df, profit = result
+            #Execute pattern detection, or collect the result a worker already produced
+            if parallel_results is not None:
+                output, result = parallel_results[pattern_func.__name__]
+                print(output, end='')
+                if isinstance(result, Exception):
+                    raise result
             else:
-                trades_df = result
-                profit = trades_df['profit'].sum() if not trades_df.empty else 0
+                result = pattern_func(df, **range_params)
+            
+            trades_df, profit = result.trades, result.total_profit
             
             #Store results
             results[pattern_name] = {
@@ -2812,6 +4109,11 @@ def analysepatterns(df, lookback_days=3000):
     print(f"Overall Win Rate: {total_profitable_trades/total_trades*100:.1f}%" if total_trades > 0 else "Overall Win Rate: N/A")
     print(f"Total Combined Profit: ${total_profit:.5f}")
     print(f"Average Profit per Trade: ${total_profit/total_trades:.5f}" if total_trades > 0 else "Average Profit per Trade: N/A")
+
+    #Each indicator should be a miss once per dataset and a hit for every later detector, the counts
+    #include the slices the detectors ran on
+    cache_report = get_dataset(df).indicators.report()
+    print(f"Indicator Cache: {cache_report['hits']} hits, {cache_report['misses']} misses, {cache_report['cached']} indicators cached")
     
     #Profit distribution analysis
     if total_trades > 0:
@@ -2829,10 +4131,10 @@ def analysepatterns(df, lookback_days=3000):
                 print(f"  {i}. {name}: ${stats['profit']:.5f} ({stats['trades']} trades)")
     
             #Save visualisation with all trade data
-        if all_trades_dfs:
+        if all_trades_dfs and output_path:
             print("\nSaving comprehensive visualisation")
             try:
-                save_visualisation(df, all_trades_dfs, 'trading_visualization.html')
+                save_visualisation(df, all_trades_dfs, output_path)
                 print("visualisation saved successfully!")
             except Exception as e:
                 print(f"visualisation failed: {str(e)}")
@@ -2840,12 +4142,1032 @@ def analysepatterns(df, lookback_days=3000):
     return results, total_profit, all_trades_dfs
 
 
+class GrowableColumns:
+    """Named numpy columns with spare capacity that doubles when full, so appending k rows costs
+    O(k) amortised instead of copying everything stored so far."""
+
+    def __init__(self, columns=None):
+        self._arrays = {}
+        self.size = 0
+        if columns is not None:
+            self.extend(columns)
+
+    def __len__(self):
+        return self.size
+
+    def extend(self, columns):
+        columns = {name: np.asarray(values) for name, values in columns.items()}
+        count = len(next(iter(columns.values()), ()))
+        if not self._arrays:
+            #The first rows fix the column set
+            self._arrays = {name: np.empty(max(count, 16), dtype=values.dtype) for name, values in columns.items()}
+        needed = self.size + count
+        for name, values in columns.items():
+            array = self._arrays[name]
+            dtype = np.result_type(array.dtype, values.dtype)
+            if needed > len(array) or dtype != array.dtype:
+                grown = np.empty(max(needed, 2 * len(array)), dtype=dtype)
+                grown[:self.size] = array[:self.size]
+                array = self._arrays[name] = grown
+            array[self.size:needed] = values
+        self.size = needed
+
+    def columns(self, start=0):
+        """Rows start onwards of every column, as views."""
+        return {name: array[start:self.size] for name, array in self._arrays.items()}
+
+
+class IncrementalAnalysis:
+    """Keeps every detector's trades between runs so appending bars only recomputes the tail.
+
+    After append(), a pattern can only change if it lies within its detector's look-ahead halo of
+    the old last bar, or if its trade was still open (no stop or target hit and its max_days window
+    not yet complete). Those patterns are rerun through the detector's start/end range on a frame
+    of just that tail plus the warm-up before it, and everything before it is settled for good.
+    The bars live in growable column buffers and settled trades are kept in chunks, so an append
+    costs the tail it rescans, not the history. Trade tables carry a status column, 'open' while a
+    trade is still inside its holding window."""
+
+    def __init__(self, df, pattern_names=None, **params):
+        self.pattern_names = list(pattern_names or PATTERN_REGISTRY)
+        self.params = params
+        self.columns = list(df.columns)
+        self.history = GrowableColumns({column: df[column].to_numpy() for column in self.columns})
+        self.bars_recomputed = {}
+        get_dataset(df).prepare_features()
+        #Settled positions and trade chunks, then the latest rescan whose patterns may still change
+        self._settled = {func_name: (GrowableColumns(_positions()), []) for func_name in self.pattern_names}
+        self._live = {func_name: self._with_status(globals()[func_name](df, **params, start=0, verbose=False))
+                      for func_name in self.pattern_names}
+        self._results = None
+
+    @staticmethod
+    def _with_status(result):
+        if not result.trades.empty:
+            still_open = (result.positions['reason'] == 0) & ~result.positions['complete']
+            result.trades = result.trades.assign(status=np.where(still_open, 'open', 'closed'))
+        return result
+
+    @property
+    def frame(self):
+        """The whole history as a DataFrame, built on request."""
+        return self._tail_frame(0)
+
+    def _tail_frame(self, first):
+        return pd.DataFrame(self.history.columns(first))
+
+    def _recompute_from(self, func_name, n_old):
+        #First row whose patterns may change once bars are appended after row n_old - 1. It never
+        #moves back: open trades were all rescanned last time, and n_old only grows
+        positions = self._live[func_name].positions
+        first = n_old - range_halo(func_name, **self.params)[1]
+        still_open = (positions['reason'] == 0) & ~positions['complete']
+        if still_open.any():
+            first = min(first, int(positions['pattern_idx'][still_open].min()))
+        return max(0, first)
+
+    def append(self, bars):
+        """Appends new bars (same columns, later dates) and updates every detector's trades. Returns
+        {function name: PatternResult} for just the rescanned tail, row positions over the whole
+        history; results holds the whole history."""
+        n_old = len(self.history)
+        bars = bars[self.columns]
+        if len(bars) and n_old and not (bars['Date'].iloc[0] > self.history.columns(n_old - 1)['Date'][0]):
+            raise ValueError("Appended bars must start after the last bar")
+        self.history.extend({column: bars[column].to_numpy() for column in self.columns})
+
+        for func_name in self.pattern_names:
+            first = self._recompute_from(func_name, n_old)
+            live = self._live[func_name]
+            settled_positions, settled_trades = self._settled[func_name]
+            newly_settled = live.positions['pattern_idx'] < first
+            if newly_settled.any():
+                settled_positions.extend({key: values[newly_settled] for key, values in live.positions.items()})
+                settled_trades.append(live.trades[newly_settled])
+
+            #Only the tail and its warm-up are rebuilt into a frame, row positions are shifted back
+            lo = max(0, first - range_halo(func_name, **self.params)[0])
+            tail = globals()[func_name](self._tail_frame(lo), **self.params, start=first - lo, verbose=False)
+            for key in ('pattern_idx', 'entry_idx', 'exit_idx'):
+                tail.positions[key] = tail.positions[key] + lo
+            self._live[func_name] = self._with_status(tail)
+            self.bars_recomputed[func_name] = len(self.history) - first
+        self._results = None
+        return dict(self._live)
+
+    @property
+    def results(self):
+        """{function name: PatternResult} over the whole history, assembled from the settled
+        chunks and the latest rescan when first read after an append."""
+        if self._results is None:
+            self._results = {}
+            for func_name in self.pattern_names:
+                settled_positions, settled_trades = self._settled[func_name]
+                live = self._live[func_name]
+                trades = [frame for frame in (*settled_trades, live.trades) if not frame.empty]
+                if len(settled_trades) > 1:
+                    #Merged once, so later reads only join the chunks settled since
+                    settled_trades[:] = [pd.concat(settled_trades, ignore_index=True)]
+                positions = {key: np.concatenate((values, live.positions[key]))
+                             for key, values in settled_positions.columns().items()}
+                self._results[func_name] = PatternResult(
+                    func_name, pd.concat(trades, ignore_index=True) if trades else pd.DataFrame(),
+                    positions, live.stats)
+        return self._results
+
+    def summary(self):
+        """Prints and returns {pattern name: (trades, open trades, total profit)} for the current history."""
+        summary = {}
+        print(f"\nIncremental analysis over {len(self.history)} bars")
+        for func_name, result in self.results.items():
+            open_trades = int((result.trades['status'] == 'open').sum()) if not result.trades.empty else 0
+            summary[result.pattern_name] = (result.trade_count, open_trades, result.total_profit)
+            recomputed = self.bars_recomputed.get(func_name)
+            tail = f", last update rescanned {recomputed} bars" if recomputed is not None else ""
+            print(f"{result.pattern_name:<25} {result.trade_count:>5} trades ({open_trades} open), "
+                  f"profit ${result.total_profit:.5f}{tail}")
+        return summary
+
+
+class BarBuffer:
+    """Fixed size ring buffer of the last `capacity` OHLC bars, so memory never grows with history."""
+
+    COLUMNS = ['Open', 'High', 'Low', 'Close/Last']
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.dates = np.empty(capacity, dtype='datetime64[ns]')
+        self.values = np.empty((capacity, len(self.COLUMNS)))
+        self.count = 0  #Bars seen so far, the newest is at (count - 1) % capacity
+
+    def __len__(self):
+        return min(self.count, self.capacity)
+
+    @property
+    def first(self):
+        #Stream position of the oldest buffered bar
+        return self.count - len(self)
+
+    def append(self, bar):
+        slot = self.count % self.capacity
+        self.dates[slot] = np.datetime64(pd.Timestamp(bar['Date']), 'ns')
+        self.values[slot] = [float(bar[column]) for column in self.COLUMNS]
+        self.count += 1
+
+    def slots(self):
+        """Ring positions of the buffered bars, oldest first."""
+        return np.arange(self.first, self.count) % self.capacity
+
+    def rows(self, start, stop):
+        """(Open, High, Low, Close/Last) rows of stream positions [start, stop), None unless all are buffered."""
+        if start < self.first or stop > self.count:
+            return None
+        return self.values[np.arange(start, stop) % self.capacity]
+
+    def bar(self, index):
+        """The bar at a stream position as a mapping like the ones on_bar() takes."""
+        slot = index % self.capacity
+        return {'Date': pd.Timestamp(self.dates[slot]), **dict(zip(self.COLUMNS, self.values[slot].tolist()))}
+
+    def frame(self, pad=0):
+        """Buffered bars oldest first, followed by pad unknown (NaN) bars on the following days."""
+        order = self.slots()
+        dates = self.dates[order]
+        if pad:
+            dates = np.concatenate((dates, dates[-1] + np.arange(1, pad + 1) * np.timedelta64(1, 'D')))
+        values = np.concatenate((self.values[order], np.full((pad, len(self.COLUMNS)), np.nan)))
+        return pd.DataFrame({'Date': dates, **dict(zip(self.COLUMNS, values.T))})
+
+
+#Streaming triggers: trigger(stream, entry) is a cheap test on the buffered bars that must pass for
+#the detector to enter on stream position `entry`, so the detector is only rerun on bars where it
+#can. Each is the detector's own cheap test or a looser one, never stricter
+def _hammer_trigger(stream, entry):
+    #Bullish bar with a dominant lower wick the day before the entry
+    rows = stream.buffer.rows(entry - 1, entry)
+    if rows is None:
+        return False
+    open_, high, low, close = rows[0]
+    return close > open_ and min(open_, close) - low >= (high - low) * 0.65
+
+
+def _inverted_hammer_trigger(stream, entry):
+    #Bearish bar followed by a bullish entry day
+    rows = stream.buffer.rows(entry - 1, entry + 1)
+    return rows is not None and rows[0, 3] < rows[0, 0] and not rows[1, 3] <= rows[1, 0]
+
+
+def _shooting_star_trigger(stream, entry):
+    #Short lower shadow relative to the upper one the day before the entry
+    rows = stream.buffer.rows(entry - 1, entry)
+    if rows is None:
+        return False
+    open_, high, low, close = rows[0]
+    return min(open_, close) - low < (high - max(open_, close)) * 0.25
+
+
+def _tweezer_trigger(stream, entry):
+    #Bearish bar then a bullish one before the entry
+    rows = stream.buffer.rows(entry - 2, entry)
+    return rows is not None and rows[0, 3] < rows[0, 0] and rows[1, 3] > rows[1, 0]
+
+
+def _broadening_bottom_trigger(stream, entry):
+    #Higher highs and lower lows for n_candles bars ending on the entry
+    rows = stream.buffer.rows(entry - stream.settings['n_candles'] + 1, entry + 1)
+    return rows is not None and bool(((rows[1:, 1] > rows[:-1, 1]) & (rows[1:, 2] < rows[:-1, 2])).all())
+
+
+def _broadening_formation_trigger(stream, entry):
+    #Bullish entry bar testing the support of a formation with rising highs that ended within max_days
+    length, max_days = stream.settings['min_pattern_days'], stream.settings['max_days']
+    rows = stream.buffer.rows(max(stream.buffer.first, entry - max_days - length + 1), entry + 1)
+    if rows is None or len(rows) <= length or not rows[-1, 3] > rows[-1, 0]:
+        return False
+    windows = sliding_window_view(rows[:-1], length, axis=0)  #(start, column, bar)
+    rising = (windows[:, 1, 1:] > windows[:, 1, :-1]).all(axis=1)
+    return bool((rising & (rows[-1, 2] <= windows[:, 2].min(axis=1) * 1.002)).any())
+
+
+def _flag_trigger(stream, entry):
+    #Flag pole gain of 2-5% five bars before the entry
+    rows = stream.buffer.rows(entry - 5, entry - 3)
+    return rows is not None and rows[0, 3] != 0 and 1.02 <= rows[1, 3] / rows[0, 3] <= 1.05
+
+
+def _swing_breakout_trigger(level, direction, exact=True, condition=None):
+    #First close through a level set between a swing point no more than 9 bars back and the swing
+    #before it, the breakout the swing pair detectors confirm within 10 bars of the second point.
+    #exact levels are the detector's own, the others only bound it, so any close through them counts.
+    #condition(stream, second, entry) is a further test of the detector's on those bars
+    def trigger(stream, entry):
+        if entry < stream.buffer.first:
+            return False
+        points = stream.swings
+        for i in range(len(points) - 1, -1, -1):
+            second = points[i]
+            if second > entry:
+                continue
+            if second < entry - 9:
+                break
+            if i == 0 or points[i - 1] <= stream.buffer.first:
+                return True  #The swing before it is not buffered, leave it to the detector
+            value = level(stream.buffer.rows(points[i - 1], second))
+            closes = stream.buffer.rows(second, entry + 1)[:, 3]
+            crossed = closes < value if direction == 'down' else closes > value
+            if crossed[-1] and not (exact and crossed[:-1].any()) and (condition is None or condition(stream, second, entry)):
+                return True
+        return False
+    return trigger
+
+
+def _inverted_cup_level(rows):
+    #High of the bar with the highest low, the leftmost if several share it like the range tables
+    return rows[np.argmax(rows[:, 2]), 1]
+
+
+def _double_top_condition(stream, second, entry):
+    #Second top not above its 20 bar average
+    return not stream.buffer.rows(second, second + 1)[0, 3] > stream.indicator('sma', 20, second)
+
+
+def _head_and_shoulders_condition(stream, second, entry):
+    #Breakout below the 20 bar average while it is under the 50 bar one
+    sma20 = stream.indicator('sma', 20, entry)
+    return sma20 <= stream.indicator('sma', 50, entry) and stream.buffer.rows(entry, entry + 1)[0, 3] < sma20
+
+
+def _cup_trigger(stream, entry):
+    #First close above 99.5% of one of the 14 highs before it, where the cup's right rim has to be.
+    #The rim is the leftmost highest high of a window that holds the bar before it (the right side
+    #is at least 2 bars long), so it is above that bar's high
+    rows = stream.buffer.rows(max(stream.buffer.first, entry - 15), entry + 1)
+    if rows is None or len(rows) < 3:
+        return False
+    rims = rows[1:-1, 1] * 0.995
+    crossed = rows[2:, 3][None, :] > rims[:, None]  #(rim, close)
+    earlier = np.triu(crossed[:, :-1]).any(axis=1)  #Closes after each rim and before the entry
+    return bool((crossed[:, -1] & ~earlier & (rows[1:-1, 1] > rows[:-2, 1])).any())
+
+
+#How each detector is driven live. swings is the (column, kind) of the swing points its trigger
+#follows, entries on a swing point show up a bar late once the next bar confirms it. confirm is the
+#bars after an entry the batch detector still reads: entries are signalled as provisional and the
+#position only opens once they have passed and the detector still finds the entry
+STREAM_RULES = {
+    'find_bullishhammer': {'trigger': _hammer_trigger},
+    'find_broadeningbottoms': {'trigger': _broadening_bottom_trigger},
+    'find_broadening_formations': {'trigger': _broadening_formation_trigger},
+    'find_flags_high_and_tight': {'trigger': _flag_trigger},
+    #The neckline is the lowest low between the left shoulder and the right one, the swing before
+    #the right shoulder is the head or later so the lowest low from there is above the neckline
+    'find_headandshouldertops': {'trigger': _swing_breakout_trigger(lambda rows: rows[:, 2].min(), 'down', exact=False,
+                                                                    condition=_head_and_shoulders_condition),
+                                 'swings': ('High', 'max')},
+    'find_doublebottoms': {'trigger': _swing_breakout_trigger(lambda rows: rows[:, 1].max(), 'up'),
+                           'swings': ('Low', 'min')},
+    'find_doubletops': {'trigger': _swing_breakout_trigger(lambda rows: rows[:, 2].min(), 'down',
+                                                           condition=_double_top_condition),
+                        'swings': ('High', 'max')},
+    'find_invertedcupwithhandle': {'trigger': _swing_breakout_trigger(_inverted_cup_level, 'down'),
+                                   'swings': ('High', 'max')},
+    #The cup's bottom and right rim are searched up to 1.5 * max_pattern_days past the breakout
+    'find_cup_with_handle': {'trigger': _cup_trigger, 'confirm': lambda params: 2 * params['max_pattern_days']},
+    'find_invertedhammer': {'trigger': _inverted_hammer_trigger},
+    'find_shootingstar': {'trigger': _shooting_star_trigger},
+    'find_tweezerbottoms': {'trigger': _tweezer_trigger}
+}
+
+
+class StreamingDetector:
+    """Runs one registered detector on live bars, one on_bar() call at a time.
+
+    Only the last warm-up + look-ahead halo bars are kept, with the shared indicators and (for the
+    chart patterns) the pending swing points updated in O(1) per bar. Each bar first goes through
+    the detector's STREAM_RULES trigger; only when an entry is possible does the detector run over
+    the buffer followed by look-ahead bars of unknown (NaN) prices, which never confirm a breakout
+    or complete a swing point, so an entry is reported on the first bar the detector can see it.
+    Detectors that read bars after their entry (see STREAM_RULES confirm) report it as provisional
+    and open the position once those bars are in. Positions are then managed bar by bar with the
+    detector's own stop and target levels until the stop, the target or max_days. Work and memory
+    per bar depend on the detector's parameters only, never on how much history has been seen."""
+
+    def __init__(self, detector, **params):
+        self.func_name = detector if isinstance(detector, str) else detector.__name__
+        self.pattern_name = PATTERN_REGISTRY[self.func_name]
+        self.direction = DIRECTION_REGISTRY[self.func_name]
+        rules = EXIT_RULES.get(self.func_name, {})
+        self.exit_offset, self.stop_first = rules.get('offset', 0), rules.get('stop_first', False)
+        self.params = params
+        signature = inspect.signature(globals()[self.func_name])
+        self.settings = {name: parameter.default for name, parameter in signature.parameters.items()
+                         if parameter.default is not inspect.Parameter.empty}
+        self.settings.update(params)
+        self.max_days = self.settings['max_days']
+        self.rules = STREAM_RULES[self.func_name]
+        self.confirm = _halo_bars(self.rules.get('confirm', 0), self.settings)
+        self.warmup, self.lookahead = range_halo(self.func_name, **params)
+        self.buffer = BarBuffer(self.warmup + self.lookahead + self.confirm)
+        #Indicators run over the whole stream in O(1) per bar, their values ride along the ring buffer
+        self.indicators = IncrementalIndicators()
+        self._indicator_values = np.empty((self.buffer.capacity, len(self.indicators.indicators)))
+        self._indicator_columns = {(name, window): column for column, (name, _, window)
+                                   in enumerate(self.indicators.indicators)}
+        self.swings = []  #Stream positions of the buffered swing points the trigger follows
+        self.detector_runs = 0
+        self.open_positions = []
+        self._seen = {}  #Entry bars already reported, pruned once they leave the buffer
+        self._provisional = {}  #Entry bar -> position signalled as provisional, until it is confirmed or dropped
+
+    def indicator(self, name, window, index):
+        """Streamed value of a shared indicator (close prices) at a buffered stream position."""
+        return self._indicator_values[index % self.buffer.capacity, self._indicator_columns[(name, window)]]
+
+    def _update_swings(self):
+        #The bar before the newest becomes a swing point once the newest is on the other side of it
+        now = self.buffer.count - 1
+        rows = self.buffer.rows(now - 2, now + 1)
+        if rows is not None:
+            column, kind = self.rules['swings']
+            before, middle, after = rows[:, BarBuffer.COLUMNS.index(column)]
+            if (middle > before and middle > after) if kind == 'max' else (middle < before and middle < after):
+                self.swings.append(now - 1)
+        while self.swings and self.swings[0] < self.buffer.first:
+            del self.swings[0]
+
+    def _run(self):
+        #The batch detector over the buffer and its look-ahead pad, indicators seeded from the stream
+        frame = self.buffer.frame(pad=self.lookahead)
+        store = get_dataset(frame).indicators
+        buffered = self._indicator_values[self.buffer.slots()]
+        for column, ((name, price_column, window), indicator) in enumerate(self.indicators.indicators.items()):
+            store.seed(name, window, np.concatenate((buffered[:, column], indicator.lookahead(self.lookahead))), price_column)
+        params = dict(self.params)
+        if 'lookback_days' in self.settings:
+            params['lookback_days'] = len(frame)
+        self.detector_runs += 1
+        return globals()[self.func_name](frame, **params, verbose=False)
+
+    def on_bar(self, bar):
+        """Feeds one bar (a mapping with Date, Open, High, Low and Close/Last) and returns the events
+        it caused in the order they happened: {'event': 'entry', 'provisional': ...} signals,
+        {'event': 'withdrawn'} for provisional entries the detector dropped and {'event': 'exit'} trades."""
+        self.buffer.append(bar)
+        self._indicator_values[(self.buffer.count - 1) % self.buffer.capacity] = list(self.indicators.update(bar).values())
+        if 'swings' in self.rules:
+            self._update_swings()
+        now = self.buffer.count - 1
+        first_row = self.buffer.first
+        events = []
+
+        #Entries can show up on this bar, on the bar before for a newly confirmed swing point, or
+        #come out of their confirmation window
+        trigger = self.rules['trigger']
+        signal = trigger(self, now) or ('swings' in self.rules and trigger(self, now - 1))
+        confirming = self.confirm and trigger(self, now - self.confirm)
+        result = self._run() if signal or confirming else None
+
+        if result is not None:
+            #New entries on real bars, in the order the detector found them. Patterns without their full
+            #warm-up in the buffer are left to earlier calls, and like the batch detectors one trade per entry bar
+            positions = result.positions
+            warmed_up = (positions['pattern_idx'] >= self.warmup) | (first_row == 0)
+            for row in np.flatnonzero(warmed_up & (positions['entry_idx'] < len(self.buffer))):
+                entry = first_row + int(positions['entry_idx'][row])
+                provisional = self.confirm and entry > now - self.confirm
+                if entry in self._seen or (provisional and entry != now):
+                    continue
+                trade = result.trades.iloc[row]
+                position = {
+                    'pattern': self.pattern_name,
+                    'pattern_date': trade['pattern_date'],
+                    'entry_idx': entry,
+                    'entry_date': trade['entry_date'],
+                    'entry_price': float(trade['entry_price']),
+                    'stop_level': float(positions['stop_level'][row]),
+                    'target_level': float(positions['target_level'][row]),
+                    'target_price': float(trade['target_price']) if 'target_price' in trade else None,
+                    'direction': self.direction
+                }
+                events.append({'event': 'entry', 'bar_date': bar['Date'], 'provisional': bool(provisional), **position})
+                if provisional:
+                    self._provisional[entry] = position
+                else:
+                    self._seen[entry] = entry
+                    self.open_positions.append((position, entry + self.exit_offset))
+
+        #A provisional entry the detector no longer finds once its window has passed
+        withdrawn = self._provisional.pop(now - self.confirm, None) if self.confirm else None
+        if withdrawn is not None and now - self.confirm not in self._seen:
+            events.append({'event': 'withdrawn', 'bar_date': bar['Date'], **withdrawn})
+
+        #Bars after an entry that were already in the buffer when it was reported are replayed first
+        still_open = []
+        for position, next_bar in self.open_positions:
+            exit_event = None
+            while next_bar <= now and exit_event is None:
+                exit_event = self._check_exit(position, next_bar, self.buffer.bar(next_bar))
+                next_bar += 1
+            if exit_event:
+                events.append({'bar_date': bar['Date'], **exit_event})
+            else:
+                still_open.append((position, next_bar))
+        self.open_positions = still_open
+
+        self._seen = {entry: entry for entry in self._seen if entry >= first_row}
+        return events
+
+    def _check_exit(self, position, bar_idx, bar):
+        #simulate_exits' rules for one bar: target or stop touched, else the close of the max_days-th bar
+        high, low, close = bar['High'], bar['Low'], bar['Close/Last']
+        long = position['direction'] == 'long'
+        target_price = position['target_price']
+        if long:
+            hit_target = high >= position['target_level'] or (target_price is not None and high >= target_price)
+            hit_stop = low <= position['stop_level']
+        else:
+            hit_target = low <= position['target_level'] or (target_price is not None and low <= target_price)
+            hit_stop = high >= position['stop_level']
+
+        if hit_target and not (hit_stop and self.stop_first):
+            reached = target_price is not None and (high >= target_price if long else low <= target_price)
+            reason, price = 'target', target_price if reached else position['target_level']
+        elif hit_stop:
+            reason, price = 'stop', position['stop_level']
+        elif bar_idx >= position['entry_idx'] + self.exit_offset + self.max_days - 1:
+            reason, price = 'max_days', close
+        else:
+            return None
+
+        profit = price - position['entry_price'] if long else position['entry_price'] - price
+        return {'event': 'exit', **position, 'exit_date': bar['Date'], 'exit_price': float(price),
+                'reason': reason, 'profit': float(profit)}
+
+
+class StreamingScanner:
+    """One StreamingDetector per registered pattern (or pattern_names), fed from a single on_bar()."""
+
+    def __init__(self, pattern_names=None, **params):
+        self.detectors = [StreamingDetector(func_name, **params.get(func_name, {}))
+                          for func_name in (pattern_names or PATTERN_REGISTRY)]
+
+    def on_bar(self, bar):
+        return [event for detector in self.detectors for event in detector.on_bar(bar)]
+
+
+def _send_message(writer, message):
+    #Newline delimited JSON, dates and timestamps go out as ISO strings
+    writer.write((json.dumps(message, default=str) + '\n').encode())
+
+
+class BarServer:
+    """asyncio TCP service that takes OHLC bars for any number of symbols and fans them out to one
+    StreamingScanner per symbol, publishing the entries and closed trades to subscribers.
+
+    Every message is one JSON object per line:
+        {"type": "bar", "symbol": "USDJPY", "bar": {"Date": ..., "Open": ..., ...}, "sent": <time.time()>}
+        {"type": "subscribe", "symbols": ["USDJPY"]}    (null or no symbols for everything)
+        {"type": "ping"}                                 (answered with pong once all earlier bars are done)
+    Subscribers receive {"type": "signal" or "trade", "symbol": ..., "sent": ..., "queued": ...,
+    "processing": ..., **event}. sent is copied from the bar that caused the event so clients can
+    measure end-to-end latency, queued is the seconds the bar waited for its symbol's worker and
+    processing the seconds detection took.
+
+    Detection never runs on the event loop: each symbol has a queue of at most queue_size bars,
+    drained in order by its own worker task that runs the scanner in a thread pool of `workers`
+    threads. Scanning one symbol therefore never stops the server reading bars for the others or
+    writing to subscribers, and a full queue holds up the feed's connection instead of growing."""
+
+    def __init__(self, host='127.0.0.1', port=8765, pattern_names=None, queue_size=256, workers=None, **params):
+        self.host, self.port = host, port
+        self.pattern_names, self.params = pattern_names, params
+        self.queue_size = queue_size
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='scanner')
+        self.scanners = {}
+        self.queues = {}   #symbol -> bounded queue of (bar message, time it arrived)
+        self.workers = {}  #symbol -> worker task draining its queue
+        self.subscribers = {}  #writer -> set of symbols, or None for all of them
+        self.connections = {}  #writer -> handler task, for close()
+        self.bars_processed = 0
+        self.server = None
+
+    async def start(self):
+        self.server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.port = self.server.sockets[0].getsockname()[1]  #Resolves port=0 to the one picked by the OS
+        return self
+
+    async def serve_forever(self):
+        if self.server is None:
+            await self.start()
+        print(f"Bar server listening on {self.host}:{self.port}")
+        async with self.server:
+            await self.server.serve_forever()
+
+    async def close(self):
+        self.server.close()
+        #Closing the sockets ends each handler's read loop, so they finish rather than being cancelled
+        for writer in list(self.connections):
+            writer.close()
+        await asyncio.gather(*self.connections.values(), return_exceptions=True)
+        for worker in self.workers.values():
+            worker.cancel()
+        await asyncio.gather(*self.workers.values(), return_exceptions=True)
+        self.executor.shutdown(wait=True)
+        await self.server.wait_closed()
+
+    async def _handle(self, reader, writer):
+        self.connections[writer] = asyncio.current_task()
+        try:
+            while line := await reader.readline():
+                message = json.loads(line)
+                kind = message.get('type')
+                if kind == 'bar':
+                    await self._enqueue(message)
+                elif kind == 'subscribe':
+                    symbols = message.get('symbols')
+                    self.subscribers[writer] = set(symbols) if symbols else None
+                elif kind == 'ping':
+                    await asyncio.gather(*(queue.join() for queue in list(self.queues.values())))
+                    _send_message(writer, {'type': 'pong', 'bars_processed': self.bars_processed})
+                    await writer.drain()
+        except (ConnectionError, json.JSONDecodeError) as e:
+            print(f"Bar server: dropping connection ({e})")
+        finally:
+            self.connections.pop(writer, None)
+            self.subscribers.pop(writer, None)
+            writer.close()
+
+    async def _enqueue(self, message):
+        symbol = message['symbol']
+        queue = self.queues.get(symbol)
+        if queue is None:
+            queue = self.queues[symbol] = asyncio.Queue(self.queue_size)
+            self.scanners[symbol] = StreamingScanner(self.pattern_names, **self.params)
+            self.workers[symbol] = asyncio.create_task(self._worker(symbol, queue))
+        await queue.put((message, time.perf_counter()))
+
+    async def _worker(self, symbol, queue):
+        #One bar at a time so a symbol's bars are scanned in order
+        loop = asyncio.get_running_loop()
+        scanner = self.scanners[symbol]
+        while True:
+            message, arrived = await queue.get()
+            try:
+                started = time.perf_counter()
+                events = await loop.run_in_executor(self.executor, scanner.on_bar, message['bar'])
+                timing = {'queued': started - arrived, 'processing': time.perf_counter() - started}
+                self.bars_processed += 1
+                await self._publish(symbol, message, events, timing)
+            except Exception as e:
+                print(f"Bar server: {symbol} bar {message['bar'].get('Date')} failed ({e})")
+            finally:
+                queue.task_done()
+
+    async def _publish(self, symbol, message, events, timing):
+        for event in events:
+            published = {'type': 'trade' if event['event'] == 'exit' else 'signal',
+                         'symbol': symbol, 'sent': message.get('sent'), **timing, **event}
+            for writer, symbols in list(self.subscribers.items()):
+                if symbols is None or symbol in symbols:
+                    _send_message(writer, published)
+        #Lets slow subscribers push back on the feed instead of buffering without limit
+        for writer in list(self.subscribers):
+            try:
+                await writer.drain()
+            except ConnectionError:
+                self.subscribers.pop(writer, None)
+
+
+def _replay_bars(paths, last_bars=None):
+    #Bars of every file as (symbol, bar) in date order, interleaved across symbols like a live feed.
+    #Files are all read up front so a bad file is skipped before anything is sent
+    frames = []
+    for path in paths:
+        try:
+            df = load_data(path)
+        except Exception as e:
+            print(f"Replay: skipping {path} ({e})")
+            continue
+        if last_bars:
+            df = df.tail(last_bars)
+        frames.append(df[['Date', 'Open', 'High', 'Low', 'Close/Last']].assign(
+            symbol=os.path.splitext(os.path.basename(path))[0]))
+    if not frames:
+        return []
+    bars = pd.concat(frames, ignore_index=True).sort_values('Date', kind='stable')
+    return [(row.symbol, {'Date': row.Date.isoformat(), 'Open': row.Open, 'High': row.High,
+                           'Low': row.Low, 'Close/Last': row[4]})
+            for row in bars.itertuples(index=False)]
+
+
+async def replay(paths, host='127.0.0.1', port=8765, speed=None, last_bars=None):
+    """Replay client: pushes the bars of each OHLC file to a BarServer at `speed` bars per second
+    (None for as fast as possible), subscribes to everything it publishes and returns
+    (events, latencies in seconds, elapsed seconds, bars sent)."""
+    bars = _replay_bars(paths, last_bars)
+    reader, writer = await asyncio.open_connection(host, port)
+    _send_message(writer, {'type': 'subscribe', 'symbols': None})
+    events, latencies = [], []
+
+    async def receive():
+        while line := await reader.readline():
+            message = json.loads(line)
+            if message['type'] == 'pong':
+                return
+            latencies.append(time.time() - message['sent'])
+            events.append(message)
+
+    receiver = asyncio.create_task(receive())
+    start = time.perf_counter()
+    sent = 0
+    for symbol, bar in bars:
+        _send_message(writer, {'type': 'bar', 'symbol': symbol, 'bar': bar, 'sent': time.time()})
+        await writer.drain()
+        sent += 1
+        if speed:
+            await asyncio.sleep(1 / speed)
+    #The server handles a connection's messages in order, so the pong arrives after every event
+    _send_message(writer, {'type': 'ping'})
+    await writer.drain()
+    await receiver
+    elapsed = time.perf_counter() - start
+    writer.close()
+    await writer.wait_closed()
+    return events, latencies, elapsed, sent
+
+
+def _percentiles(seconds):
+    values = np.asarray(seconds) * 1000
+    return {**{f"p{q}": float(np.percentile(values, q)) for q in (50, 90, 99)}, 'max': float(values.max())}
+
+
+def latency_report(latencies, elapsed=None, bars=None, events=None):
+    """Prints and returns the end-to-end signal latency percentiles in milliseconds. With the events
+    BarServer published, the time bars waited in their symbol's queue and the time detection took
+    are reported separately: replaying faster than the server keeps up shows up as queue wait."""
+    report = {'events': len(latencies)}
+    if latencies:
+        report.update(_percentiles(latencies))
+        for part in ('queued', 'processing'):
+            if events and all(part in event for event in events):
+                report[part] = _percentiles([event[part] for event in events])
+    if elapsed and bars:
+        report['bars_per_second'] = bars / elapsed
+
+    print(f"\nLatency over {report['events']} events" + (f", {bars} bars at {report['bars_per_second']:.1f} bars/s"
+                                                       if 'bars_per_second' in report else ""))
+    for label, values in (('end to end', report), ('queue wait', report.get('queued')),
+                          ('detection', report.get('processing'))):
+        if latencies and values:
+            print(f"   {label:<11} p50 {values['p50']:.2f}ms  p90 {values['p90']:.2f}ms  "
+                  f"p99 {values['p99']:.2f}ms  max {values['max']:.2f}ms")
+    return report
+
+
+def run_replay(paths, speed=None, last_bars=None, pattern_names=None, **params):
+    """Load test of the whole pipeline on one machine: starts a BarServer on a free local port in
+    its own thread and event loop, so the server never delays the client's sends, replays the files
+    through it and reports the latency percentiles. Returns (events, report)."""
+    server = BarServer(port=0, pattern_names=pattern_names, **params)
+    loop = asyncio.new_event_loop()
+    loop.run_until_complete(server.start())
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+    try:
+        events, latencies, elapsed, bars = asyncio.run(replay(paths, server.host, server.port, speed, last_bars))
+    finally:
+        asyncio.run_coroutine_threadsafe(server.close(), loop).result()
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join()
+        loop.close()
+    return events, latency_report(latencies, elapsed, bars, events)
+
+
+SYNTHETIC_COLUMNS = ['Date', 'Close/Last', 'Open', 'High', 'Low']
+SYNTHETIC_CHUNK = 1_000_000  #Bars generated per block, so memory stays flat for any length
+
+#Patterns the generator can plant. vertices are (bar offset, close) points joined by straight lines,
+#closes in units of the amplitude relative to the close before the pattern. Template bars open
+#halfway from the previous close with a small wick so the turning points are strict swing points.
+#candles overrides a bar's (open, high, low) in the same units and entry is the bar the detector
+#enters on, the ground truth for tests. Every template ends where it started so planting many of
+#them does not drag the price along
+PATTERN_TEMPLATES = {
+    'hammer': {
+        'detector': 'find_bullishhammer',
+        'vertices': [(0, 0.0), (21, -2.0), (22, -1.9), (28, -1.2), (40, 0.0)],
+        'candles': {22: (-2.0, -1.88, -3.0)},
+        'entry': 23
+    },
+    'double_bottom': {
+        'detector': 'find_doublebottoms',
+        'vertices': [(0, 0.0), (12, -1.0), (22, -0.5), (32, -1.0), (42, 0.2), (46, 0.0)],
+        'entry': 37
+    },
+    'head_and_shoulders': {
+        'detector': 'find_headandshouldertops',
+        #Falls into the pattern first, the detector wants the 20 bar average under the 50 bar one
+        'vertices': [(0, 0.0), (30, -3.0), (36, -2.5), (41, -2.85), (47, -2.0), (53, -2.85),
+                     (58, -2.5), (64, -3.3), (70, -3.5), (100, 0.0)],
+        'entry': 61
+    },
+    'cup_with_handle': {
+        'detector': 'find_cup_with_handle',
+        #Stays under the rim for max_pattern_days after the bottom so the rim is the right high
+        'vertices': [(0, 0.0), (6, -0.6), (12, -0.95), (18, -1.0), (24, -0.95), (30, -0.6), (36, -0.02),
+                     (40, -0.25), (46, -0.1), (58, -0.1), (62, 0.0)],
+        'entry': 37
+    }
+}
+TEMPLATE_WICK = 0.02  #Template wicks, in units of the amplitude
+
+
+def _template_bars(name, amplitude):
+    #Relative (open, high, low, close) of every template bar, the close before the pattern is 1
+    template = PATTERN_TEMPLATES[name]
+    offsets, levels = zip(*template['vertices'])
+    close = 1 + amplitude * np.interp(np.arange(offsets[-1] + 1), offsets, levels)
+    open_ = (np.concatenate(([1.0], close[:-1])) + close) / 2
+    wick = amplitude * TEMPLATE_WICK
+    high, low = np.maximum(open_, close) * (1 + wick), np.minimum(open_, close) * (1 - wick)
+    for offset, candle in template.get('candles', {}).items():
+        open_[offset], high[offset], low[offset] = 1 + amplitude * np.asarray(candle)
+    return open_, high, low, close
+
+
+def planted_truth(plant, start='2000-01-01', freq='1min'):
+    """Ground truth for planted patterns: one row per (pattern, position) with the template's span,
+    the detector that should find it and the bar and date it should enter on."""
+    step = np.timedelta64(int(pd.Timedelta(freq).total_seconds()), 's')
+    rows = []
+    for name, position in sorted(plant, key=lambda item: item[1]):
+        template = PATTERN_TEMPLATES[name]
+        entry = position + template['entry']
+        rows.append({'pattern': name, 'detector': template['detector'], 'start': position,
+                     'end': position + template['vertices'][-1][0], 'entry_idx': entry,
+                     'entry_date': pd.Timestamp(np.datetime64(start, 's') + entry * step)})
+    return pd.DataFrame(rows, columns=['pattern', 'detector', 'start', 'end', 'entry_idx', 'entry_date'])
+
+
+def spaced_plants(n, spacing=2500, patterns=None, first=500):
+    """(pattern, position) pairs cycling through the templates every `spacing` bars."""
+    patterns = list(patterns or PATTERN_TEMPLATES)
+    positions = range(first, n - spacing // 2, spacing)
+    return [(patterns[i % len(patterns)], position) for i, position in enumerate(positions)]
+
+
+def iter_synthetic_ohlc(n, seed=0, plant=(), chunk_size=SYNTHETIC_CHUNK, start_price=100.0, drift=0.0,
+                        volatility=0.001, high_volatility=0.003, regime_switch=0.001, amplitude=0.05,
+                        start='2000-01-01', freq='1min'):
+    """Yields n synthetic OHLC bars as DataFrames of up to about chunk_size rows, in the schema
+    load_data() returns. Closes follow a geometric Brownian motion whose per-bar volatility
+    switches between volatility and high_volatility with probability regime_switch per bar, and
+    drift is the mean log return per bar (0 keeps the median price flat). The defaults suit
+    minute bars, the price still wanders over many orders of magnitude across hundreds of
+    millions of bars.
+    plant is a list of (template name, first bar) placing PATTERN_TEMPLATES shapes, scaled to the
+    price before them, and the walk carries on from where each pattern ends. Dates are second
+    resolution so hundreds of millions of minute bars stay representable."""
+    rng = np.random.default_rng(seed)
+    plant = sorted(plant, key=lambda item: item[1])
+    spans = [(position, position + len(_template_bars(name, amplitude)[3])) for name, position in plant]
+    for (_, end), (position, _) in zip(spans, spans[1:]):
+        if position < end:
+            raise ValueError(f"Planted patterns overlap at bar {position}")
+    if spans and (spans[0][0] < 1 or spans[-1][1] > n):
+        raise ValueError("Planted patterns must start after the first bar and end before bar n")
+
+    step = np.timedelta64(int(pd.Timedelta(freq).total_seconds()), 's')
+    first_date = np.datetime64(start, 's')
+    last_close, regime = float(start_price), 0
+    chunk_start, next_plant = 0, 0
+    while chunk_start < n:
+        #A block never cuts through a planted pattern
+        chunk_end = min(n, chunk_start + chunk_size)
+        for position, end in spans[next_plant:]:
+            if position < chunk_end < end:
+                chunk_end = end
+        size = chunk_end - chunk_start
+
+        #Volatility regime as a two state Markov chain, then the log returns of the walk
+        regimes = (regime + np.cumsum(rng.random(size) < regime_switch)) % 2
+        regime = int(regimes[-1])
+        sigma = np.where(regimes == 1, high_volatility, volatility)
+        returns = drift + sigma * rng.standard_normal(size)
+
+        #Planted patterns replace the returns over their span with the template's
+        templates = []
+        while next_plant < len(plant) and plant[next_plant][1] < chunk_end:
+            name, position = plant[next_plant]
+            bars = _template_bars(name, amplitude)
+            local = position - chunk_start
+            returns[local:local + len(bars[3])] = np.diff(np.log(bars[3]), prepend=0.0)
+            templates.append((local, bars))
+            next_plant += 1
+
+        close = last_close * np.exp(np.cumsum(returns))
+        prev_close = np.concatenate(([last_close], close[:-1]))
+        open_ = prev_close * np.exp(rng.normal(0, 0.2, size) * sigma)
+        high = np.maximum(open_, close) * np.exp(np.abs(rng.normal(0, 0.5, size)) * sigma)
+        low = np.minimum(open_, close) * np.exp(-np.abs(rng.normal(0, 0.5, size)) * sigma)
+        for local, (t_open, t_high, t_low, t_close) in templates:
+            base = prev_close[local]
+            rows = slice(local, local + len(t_close))
+            open_[rows], high[rows], low[rows] = base * t_open, base * t_high, base * t_low
+
+        dates = first_date + (chunk_start + np.arange(size)) * step
+        yield pd.DataFrame({'Date': dates, 'Close/Last': close, 'Open': open_, 'High': high, 'Low': low})
+        last_close = float(close[-1])
+        chunk_start = chunk_end
+
+
+def synthetic_ohlc(n, seed=0, plant=(), **options):
+    """n synthetic bars in one DataFrame (see iter_synthetic_ohlc) and the planted_truth of plant."""
+    frame = pd.concat(iter_synthetic_ohlc(n, seed, plant, **options), ignore_index=True)
+    return frame, planted_truth(plant, options.get('start', '2000-01-01'), options.get('freq', '1min'))
+
+
+def write_synthetic_csv(path, n, seed=0, plant=(), **options):
+    """Streams n synthetic bars to a csv load_data() can read, one block at a time so the series can
+    be far larger than memory. Returns the planted_truth of plant."""
+    with open(path, 'w', newline='') as f:
+        for i, frame in enumerate(iter_synthetic_ohlc(n, seed, plant, **options)):
+            frame = frame.assign(Date=np.datetime_as_string(frame['Date'].to_numpy(), unit='s'))
+            frame.to_csv(f, header=i == 0, index=False, float_format='%.10g')
+    return planted_truth(plant, options.get('start', '2000-01-01'), options.get('freq', '1min'))
+
+
+def verify_planted(df, truth):
+    """Runs each planted pattern's detector over all of df and adds a found column: whether it
+    entered on the planted entry bar."""
+    found = np.zeros(len(truth), dtype=bool)
+    for func_name, rows in truth.groupby('detector').groups.items():
+        func = globals()[func_name]
+        params = {'lookback_days': len(df)} if 'lookback_days' in inspect.signature(func).parameters else {}
+        entries = set(func(df, **params, verbose=False).positions['entry_idx'].tolist())
+        found[truth.index.get_indexer(rows)] = truth.loc[rows, 'entry_idx'].isin(entries).to_numpy()
+    return truth.assign(found=found)
+
+
+BATCH_COLUMNS = ['symbol', 'pattern', 'trades', 'profit', 'win_rate', 'avg_profit',
+                 'max_profit', 'max_loss', 'profitable_trades', 'losing_trades', 'error']
+
+
+def find_data_files(source):
+    """OHLC files for a batch run: every .csv in a directory, or the files matching a glob pattern."""
+    if os.path.isdir(source):
+        source = os.path.join(source, '*.csv')
+    return sorted(path for path in glob.glob(source) if os.path.isfile(path))
+
+
+def _analyse_instrument(path, lookback_days=3000):
+    #Worker side: loads one instrument and runs the full suite on it quietly,
+    #returns its summary rows only so the trade tables never cross the process boundary
+    symbol = os.path.splitext(os.path.basename(path))[0]
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            df = load_data(path)
+            results = analysepatterns(df, lookback_days, output_path=None)[0]
+    except Exception as e:
+        return symbol, [dict.fromkeys(BATCH_COLUMNS, 0) | {'symbol': symbol, 'pattern': None, 'error': str(e)}]
+
+    rows = []
+    for pattern_name, stats in results.items():
+        row = {column: stats.get(column, 0) for column in BATCH_COLUMNS}
+        row.update({'symbol': symbol, 'pattern': pattern_name, 'error': stats.get('error')})
+        rows.append(row)
+    return symbol, rows
+
+
+def iter_batch(paths, workers=None, lookback_days=3000):
+    """Runs analysepatterns on each file across a process pool, yielding (symbol, summary rows)
+    as each instrument finishes. workers=1 runs everything in this process."""
+    workers = min(workers or os.cpu_count() or 1, max(len(paths), 1))
+    if workers == 1:
+        for path in paths:
+            yield _analyse_instrument(path, lookback_days)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers, mp_context=_pool_context()) as pool:
+        futures = [pool.submit(_analyse_instrument, path, lookback_days) for path in paths]
+        for future in as_completed(futures):
+            yield future.result()
+
+
+def run_batch(source, workers=None, lookback_days=3000, summary_path=None):
+    """Runs the pattern suite over a directory or glob of OHLC files and returns one consolidated
+    per-symbol, per-pattern summary DataFrame, also written to summary_path if given."""
+    paths = find_data_files(source)
+    if not paths:
+        raise FileNotFoundError(f"No OHLC files found for {source}")
+
+    print(f"\nBatch analysis of {len(paths)} instruments")
+    start = time.perf_counter()
+    rows = []
+    for done, (symbol, symbol_rows) in enumerate(iter_batch(paths, workers, lookback_days), 1):
+        rows.extend(symbol_rows)
+        errors = [row['error'] for row in symbol_rows if row['error']]
+        trades = sum(row['trades'] for row in symbol_rows)
+        profit = sum(row['profit'] for row in symbol_rows)
+        status = f"error: {errors[0]}" if errors and len(errors) == len(symbol_rows) else f"{trades} trades, profit ${profit:.5f}"
+        print(f"[{done:{len(str(len(paths)))}d}/{len(paths)}] {symbol}: {status}")
+
+    elapsed = time.perf_counter() - start
+    summary = pd.DataFrame(rows, columns=BATCH_COLUMNS).sort_values('symbol', kind='stable').reset_index(drop=True)
+    if summary_path:
+        summary.to_csv(summary_path, index=False)
+
+    print(f"\nBatch complete: {len(paths)} instruments in {elapsed:.2f}s "
+          f"({len(paths) / elapsed * 60 if elapsed > 0 else 0:.1f} instruments per minute)")
+    return summary
+
+
     
 
 if __name__ == "__main__":
+
+    #python "Main File.py" --batch <directory or glob> [--workers N] [--summary summary.csv]
+    if '--batch' in sys.argv:
+        import argparse
+        parser = argparse.ArgumentParser(description="Run the pattern suite over many OHLC files")
+        parser.add_argument('--batch', required=True, help="Directory or glob of OHLC csv files")
+        parser.add_argument('--workers', type=int, default=None)
+        parser.add_argument('--summary', default='batch_summary.csv', help="Where to write the consolidated summary")
+        args = parser.parse_args()
+        run_batch(args.batch, args.workers, summary_path=args.summary)
+        sys.exit(0)
+
+    #python "Main File.py" --serve [--port 8765]
+    #python "Main File.py" --replay <directory or glob> [--port 8765] [--speed bars/s] [--bars N]
+    #--replay without --port starts its own server in this process
+    if '--serve' in sys.argv or '--replay' in sys.argv:
+        import argparse
+        parser = argparse.ArgumentParser(description="Live bar server and replay client")
+        parser.add_argument('--serve', action='store_true', help="Run the bar server until interrupted")
+        parser.add_argument('--replay', help="Directory or glob of OHLC csv files to replay")
+        parser.add_argument('--host', default='127.0.0.1')
+        parser.add_argument('--port', type=int, default=None)
+        parser.add_argument('--speed', type=float, default=None, help="Bars per second, as fast as possible if omitted")
+        parser.add_argument('--bars', type=int, default=None, help="Replay only the last N bars of each file")
+        args = parser.parse_args()
+        if args.serve:
+            try:
+                asyncio.run(BarServer(args.host, args.port or 8765).serve_forever())
+            except KeyboardInterrupt:
+                pass
+        else:
+            paths = find_data_files(args.replay)
+            if not paths:
+                sys.exit(f"No OHLC files found for {args.replay}")
+            if args.port is None:
+                run_replay(paths, args.speed, args.bars)
+            else:
+                events, latencies, elapsed, bars = asyncio.run(replay(paths, args.host, args.port, args.speed, args.bars))
+                latency_report(latencies, elapsed, bars, events)
+        sys.exit(0)
     
     #Load and clean data
-    df = load_data()
+    df = DATASET.frame
     print(f"Data loaded: {len(df)} records from {df['Date'].min()} to {df['Date'].max()}")
     
     print("\n PATTERN ANALYSIS")
@@ -0,0 +1,33 @@
+import importlib.util
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def load_main():
+    #"Main File.py" is not importable by name, so it is loaded from its path once per session
+    if 'main_file' not in sys.modules:
+        spec = importlib.util.spec_from_file_location('main_file', os.path.join(ROOT, 'Main File.py'))
+        module = importlib.util.module_from_spec(spec)
+        sys.modules['main_file'] = module
+        spec.loader.exec_module(module)
+    return sys.modules['main_file']
+
+
+@pytest.fixture(scope='session')
+def main():
+    return load_main()
+
+
+@pytest.fixture(scope='session')
+def usdjpy(main):
+    return main.load_data(os.path.join(ROOT, main.DATA_PATH), use_cache=False)
+
+
+@pytest.fixture
+def df(usdjpy):
+    #A fresh copy per test, so no test sees another's cached Dataset
+    return usdjpy.copy()
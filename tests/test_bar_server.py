@@ -0,0 +1,40 @@
+import asyncio
+import json
+import time
+
+
+class SleepyScanner:
+    #Stands in for StreamingScanner, each bar says how long detecting it takes
+    def __init__(self, pattern_names=None, **params):
+        pass
+
+    def on_bar(self, bar):
+        time.sleep(bar['sleep'])
+        return [{'event': 'entry', 'entry_date': bar['Date']}]
+
+
+def test_a_slow_symbol_does_not_hold_up_the_others(main, monkeypatch):
+    monkeypatch.setattr(main, 'StreamingScanner', SleepyScanner)
+
+    async def run():
+        server = await main.BarServer(port=0).start()
+        reader, writer = await asyncio.open_connection(server.host, server.port)
+        main._send_message(writer, {'type': 'subscribe', 'symbols': None})
+        for symbol, sleep in (('SLOW', 1.0), ('FAST', 0.0)):
+            main._send_message(writer, {'type': 'bar', 'symbol': symbol, 'sent': time.time(),
+                                        'bar': {'Date': '2024-01-02', 'sleep': sleep}})
+        main._send_message(writer, {'type': 'ping'})
+        await writer.drain()
+
+        messages = []
+        while (message := json.loads(await reader.readline()))['type'] != 'pong':
+            messages.append(message)
+        writer.close()
+        await server.close()
+        return messages, message
+
+    messages, pong = asyncio.run(run())
+    assert [message['symbol'] for message in messages] == ['FAST', 'SLOW']
+    assert pong['bars_processed'] == 2
+    slow = messages[1]
+    assert slow['processing'] >= 1.0 and slow['queued'] < 0.5
@@ -0,0 +1,83 @@
+import gc
+import re
+import weakref
+
+import numpy as np
+import pytest
+
+PRICES = ['Open', 'High', 'Low', 'Close/Last']
+
+
+def test_replaced_columns_rebuild_the_cache(main, df):
+    before = main.find_invertedhammer(df, verbose=False).total_profit
+    df[PRICES] = df[PRICES] * 2
+    after = main.find_invertedhammer(df, verbose=False).total_profit
+    assert after == pytest.approx(main.find_invertedhammer(df.copy(), verbose=False).total_profit)
+    assert after == pytest.approx(2 * before)
+
+
+def test_in_place_edits_rebuild_the_cache(main, df):
+    first = main.get_dataset(df)
+    main.find_doubletops(df, verbose=False)
+    df.loc[100, 'High'] = df['High'].max() * 1.5
+    assert main.get_dataset(df) is not first
+    expected = main.find_doubletops(df.copy(), verbose=False).trades
+    result = main.find_doubletops(df, verbose=False).trades
+    assert len(result) == len(expected)
+    assert np.allclose(result['profit'], expected['profit'])
+
+
+def test_unchanged_frame_reuses_the_cache(main, df):
+    assert main.get_dataset(df) is main.get_dataset(df)
+
+
+def test_positional_edits_to_any_detector_column_rebuild_the_cache(main, df):
+    for column in ['Date', 'Open', 'Low']:
+        first = main.get_dataset(df)
+        df.iloc[5, df.columns.get_loc(column)] = df[column].iloc[6]
+        assert main.get_dataset(df) is not first
+
+
+def test_range_views_share_the_parent_features(main, df):
+    data = main.get_dataset(df).prepare_features()
+    frame = data.slice_frame(500, 1500)
+    view = main.get_dataset(frame)
+    copy = df.iloc[500:1500].reset_index(drop=True).copy()
+    fresh = main.get_dataset(copy)
+    assert np.shares_memory(view.indicators.sma(20), data.indicators.sma(20))
+    assert np.allclose(view.indicators.sma(20)[19:], fresh.indicators.sma(20)[19:])
+    assert np.array_equal(view.swing_points('High', 'max'), fresh.swing_points('High', 'max'))
+    starts = np.arange(0, 900, 7)
+    assert np.array_equal(view.range_table('Low', 'min').query_many(starts, starts + 90),
+                          fresh.range_table('Low', 'min').query_many(starts, starts + 90))
+
+
+def test_dropping_a_frame_frees_its_dataset(main, df):
+    #Without the collector, anything left in a reference cycle would survive the del
+    frame = df.copy()
+    main.find_invertedhammer(frame, verbose=False)
+    dataset = weakref.ref(main.get_dataset(frame))
+    gc.disable()
+    try:
+        del frame
+        assert dataset() is None
+    finally:
+        gc.enable()
+
+
+def test_analysis_builds_each_indicator_once(main, df, capsys):
+    main.analysepatterns(df, lookback_days=1000, output_path=None)
+    line = next(line for line in capsys.readouterr().out.splitlines() if line.startswith('Indicator Cache'))
+    hits, misses, cached = map(int, re.findall(r'\d+', line))
+    assert misses == cached
+    assert hits >= len(main.PATTERN_REGISTRY)
+
+
+def test_only_the_most_recent_candidate_tables_are_kept(main, df, monkeypatch):
+    monkeypatch.setattr(main, 'CANDIDATE_TABLES_KEPT', 2)
+    for max_pattern_days in (30, 35, 40, 35):
+        main.find_cup_with_handle(df, max_pattern_days=max_pattern_days, verbose=False)
+    data = main.get_dataset(df)
+    assert [dict(key[1:])['max_pattern_days'] for key in data._candidate_tables] == [40, 35]
+    data.clear_candidate_tables()
+    assert not data._candidate_tables
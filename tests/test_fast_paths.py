@@ -0,0 +1,154 @@
+import inspect
+
+import numpy as np
+import pandas as pd
+import pytest
+
+DETECTORS = ['find_doubletops', 'find_invertedhammer', 'find_cup_with_handle', 'find_broadening_formations']
+
+
+def sorted_trades(trades):
+    return trades.sort_values(['pattern_date', 'entry_date'], kind='stable').reset_index(drop=True)
+
+
+def test_planted_patterns_are_found(main):
+    n = 10500
+    df, truth = main.synthetic_ohlc(n, seed=1, plant=main.spaced_plants(n))
+    found = main.verify_planted(df, truth)
+    assert set(found['pattern']) == set(main.PATTERN_TEMPLATES)
+    assert found['found'].all(), found[~found['found']]
+
+
+def test_exit_surface_matches_simulate_exits(main, df):
+    data = main.get_dataset(df)
+    result = main.find_invertedhammer(df, verbose=False)
+    entry_idx = result.positions['entry_idx']
+    entry_price = result.trades['entry_price'].to_numpy()
+    stoplosses, stopprofits, days = [0.97, 0.99], [1.01, 1.02, 1.05], [1, 5, 20]
+    surface = main.exit_surface(data.high, data.low, data.close, entry_idx, entry_price, stoplosses, stopprofits, days)
+
+    assert surface['trades'] == len(entry_idx) > 0
+    for i, stoploss in enumerate(stoplosses):
+        for j, stopprofit in enumerate(stopprofits):
+            for k, max_days in enumerate(days):
+                exits = main.simulate_exits(data.high, data.low, data.close, entry_idx, entry_price,
+                                            stoploss, stopprofit, max_days)
+                assert surface['profit'][i, j, k] == pytest.approx(exits['profit'].sum())
+                assert surface['wins'][i, j, k] == (exits['profit'] > 0).sum()
+
+
+@pytest.mark.parametrize('func_name', DETECTORS)
+def test_range_query_matches_a_filtered_full_run(main, df, func_name):
+    func = getattr(main, func_name)
+    first, stop = 1000, 1600
+    #The range always scans its own slice, so the full run has to look back over every bar too
+    params = {'lookback_days': len(df)} if 'lookback_days' in inspect.signature(func).parameters else {}
+    full = func(df, **params, verbose=False)
+    inside = (full.positions['pattern_idx'] >= first) & (full.positions['pattern_idx'] < stop)
+    ranged = func(df, **params, start=first, end=stop, verbose=False)
+
+    assert inside.any()
+    assert sorted_trades(ranged.trades).equals(sorted_trades(full.trades[inside]))
+    assert np.array_equal(np.sort(ranged.positions['entry_idx']), np.sort(full.positions['entry_idx'][inside]))
+
+
+def test_incremental_appends_match_a_fresh_run(main, df):
+    cut = len(df) - 60
+    incremental = main.IncrementalAnalysis(df.iloc[:cut].reset_index(drop=True), DETECTORS)
+    for i in range(cut, len(df), 7):
+        incremental.append(df.iloc[i:i + 7])
+    fresh = main.IncrementalAnalysis(df, DETECTORS)
+
+    assert len(incremental.history) == len(df)
+    for func_name in DETECTORS:
+        assert sorted_trades(incremental.results[func_name].trades).equals(sorted_trades(fresh.results[func_name].trades))
+
+
+def test_incremental_indicators_match_the_indicator_store(main, df):
+    store = main.IndicatorStore(main.get_dataset(df))
+    indicators = main.IncrementalIndicators()
+    values = pd.DataFrame([indicators.update(bar) for bar in df.to_dict('records')])
+
+    for key in indicators.indicators:
+        name, column, window = key
+        assert np.allclose(values[key], store.get(name, window, column), equal_nan=True), key
+
+
+def test_cup_candidates_do_not_depend_on_the_chunk_size(main, df, monkeypatch):
+    expected = main.find_cup_with_handle(df.copy(), lookback_days=len(df), verbose=False).trades
+    monkeypatch.setattr(main, 'CANDIDATE_CHUNK_SIZE', 97)
+    assert main.find_cup_with_handle(df, lookback_days=len(df), verbose=False).trades.equals(expected)
+
+
+@pytest.mark.parametrize('kind', ['min', 'max'])
+def test_sparse_table_matches_idxmin_and_idxmax(main, kind):
+    rng = np.random.default_rng(8)
+    #Rounded values give plenty of ties, which must go to the leftmost bar
+    values = np.round(rng.normal(100, 1, 3000), 1)
+    values[rng.choice(len(values), 150, replace=False)] = np.nan
+    table = main.SparseTable(values, kind)
+    starts = rng.integers(0, len(values) - 1, 500)
+    stops = starts + rng.integers(1, 300, 500)
+    stops = np.minimum(stops, len(values))
+    usable = [i for i in range(len(starts)) if not np.isnan(values[starts[i]:stops[i]]).all()]
+    starts, stops = starts[usable], stops[usable]
+
+    series = pd.Series(values)
+    expected = [getattr(series.iloc[start:stop], 'idx' + kind)() for start, stop in zip(starts, stops)]
+    assert [table.query(start, stop) for start, stop in zip(starts, stops)] == expected
+    assert table.query_many(starts, stops).tolist() == expected
+
+    lo, hi = 700, 2100
+    part = table.slice(lo, hi)
+    inside = (starts >= lo) & (stops <= hi)
+    assert (part.query_many(starts[inside] - lo, stops[inside] - lo) + lo).tolist() == list(np.array(expected)[inside])
+
+
+def per_window_headandshoulders(main, df, lookback_days, max_days=18, min_pattern_days=15, max_pattern_days=40,
+                                min_head_shoulder_diff=0.012, shoulder_symmetry_threshold=0.03):
+    #The search find_headandshouldertops ran before the triples were enumerated once: every triple of
+    #peaks in every window, tallest head first, keeping the first breakout on each date.
+    #Returns the (head, breakout) bars found and the number of triples the windows held
+    data = main.get_dataset(df)
+    high, low, close = data.high, data.low, data.close
+    sma20, sma50 = data.indicators.sma(20), data.indicators.sma(50)
+    dates = df['Date'].to_numpy()
+    patterns, executed_dates, window_triples = [], set(), 0
+
+    for current_idx in range(max(0, len(df) - lookback_days), len(df) - max_days - max_pattern_days):
+        peaks = data.window_swing_points('High', 'max', max(0, current_idx - max_pattern_days),
+                                         current_idx + max_pattern_days).tolist()
+        window_triples += len(peaks) * (len(peaks) - 1) * (len(peaks) - 2) // 6
+        for head in sorted(peaks, key=lambda i: -high[i]):
+            for ls in [i for i in peaks if i < head]:
+                for rs in [i for i in peaks if i > head]:
+                    ls_dist, rs_dist = head - ls, rs - head
+                    if abs(ls_dist - rs_dist) / max(ls_dist, rs_dist) > 0.3:
+                        continue
+                    if abs(high[ls] - high[rs]) / min(high[ls], high[rs]) > shoulder_symmetry_threshold:
+                        continue
+                    if min(high[head] - high[ls], high[head] - high[rs]) / high[head] < min_head_shoulder_diff:
+                        continue
+                    if not min_pattern_days <= rs - ls <= max_pattern_days:
+                        continue
+
+                    neckline = min(low[ls:head].min(), low[head:rs].min())
+                    breakout = next((i for i in range(rs, min(rs + 10, len(df))) if close[i] < neckline), None)
+                    if breakout is None or not (sma20[breakout] <= sma50[breakout] and close[breakout] < sma20[breakout]):
+                        continue
+                    if dates[breakout] not in executed_dates:
+                        executed_dates.add(dates[breakout])
+                        patterns.append((head, breakout))
+    return patterns, window_triples
+
+
+@pytest.mark.parametrize('params', [{}, {'min_head_shoulder_diff': 0.005, 'shoulder_symmetry_threshold': 0.06}])
+def test_headandshoulders_matches_the_per_window_search(main, df, params):
+    result = main.find_headandshouldertops(df, lookback_days=1000, **params, verbose=False)
+    patterns, window_triples = per_window_headandshoulders(main, df, 1000, **params)
+
+    assert len(patterns) > 0
+    assert list(zip(result.positions['pattern_idx'].tolist(), result.positions['entry_idx'].tolist())) == patterns
+    assert result.stats['window_triples'] == window_triples
+    #Each distinct triple is examined once instead of once per window holding it
+    assert 0 < result.stats['triples_examined'] < window_triples / 100
@@ -0,0 +1,79 @@
+import json
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+
+
+def write_csv(path, rows):
+    with open(path, 'w') as f:
+        f.write("Date,Time,Open,High,Low,Close,Volume\n")
+        for date, time, price in rows:
+            f.write(f'{date},{time},${price},${price + 0.2},${price - 0.1},${price + 0.1},"1,{len(time)}00"\n')
+
+
+def test_caches_from_an_older_parser_are_not_reused(main, tmp_path):
+    path = str(tmp_path / 'prices.csv')
+    write_csv(path, [(f'01/{day + 1:02d}/2024', '09:30', 100 + day) for day in range(20)])
+    fresh = main.load_data(path, use_cache=False)
+    main.load_data(path)
+
+    #Make the cache look like it was written before the parser version was recorded
+    meta_path = os.path.join(path + '.cache', 'meta.json')
+    with open(meta_path) as f:
+        meta = json.load(f)
+    del meta['parser']
+    for filename in meta['files']:
+        values = np.load(os.path.join(path + '.cache', filename))
+        np.save(os.path.join(path + '.cache', filename), values[:0])
+    meta['rows'] = 0
+    with open(meta_path, 'w') as f:
+        json.dump(meta, f)
+
+    assert main.load_data(path).equals(fresh)
+
+
+def test_volume_is_kept_and_date_joins_time(main, tmp_path):
+    path = str(tmp_path / 'intraday.csv')
+    rows = [('01/03/2024', '09:31', 3), ('01/02/2024', '09:30', 1), ('01/02/2024', '09:31', 2), ('01/03/2024', '09:30', 4)]
+    write_csv(path, rows)
+    df = main.load_data(path, use_cache=False)
+    assert list(df.columns) == ['Date', 'Open', 'High', 'Low', 'Close/Last', 'Volume']
+    assert df['Date'].is_unique and df['Date'].is_monotonic_increasing
+    assert df['Open'].tolist() == [1, 2, 4, 3]
+    assert df['Volume'].tolist() == [1500] * 4
+
+
+def test_bars_sharing_a_date_keep_file_order(main, tmp_path):
+    path = str(tmp_path / 'daily.csv')
+    with open(path, 'w') as f:
+        f.write("Date,Open,High,Low,Close\n")
+        for i in range(40):
+            f.write(f"01/0{1 + i % 2}/2024,{i},{i + 1},{i - 1},{i}\n")
+    df = main.load_data(path, use_cache=False)
+    assert df['Open'].tolist() == list(range(0, 40, 2)) + list(range(1, 40, 2))
+
+
+def test_batch_runs_mixed_layouts_and_reports_a_bad_file(main, usdjpy, tmp_path):
+    #The same bars in three vendor layouts, plus a file without the High and Low columns
+    prices = usdjpy[['Date', 'Open', 'High', 'Low', 'Close/Last']]
+    shutil.copy(os.path.join(os.path.dirname(os.path.dirname(__file__)), main.DATA_PATH), tmp_path / 'nasdaq.csv')
+    yahoo = prices.rename(columns={'Close/Last': 'Close'}).assign(**{'Adj Close': prices['Close/Last']})
+    yahoo.assign(Date=prices['Date'].dt.strftime('%Y-%m-%d')).to_csv(tmp_path / 'yahoo.csv', index=False)
+    intraday = pd.DataFrame({'date': prices['Date'].dt.strftime('%Y-%m-%d'), 'time': '00:00', 'open': prices['Open'],
+                             'high': prices['High'], 'low': prices['Low'], 'last': prices['Close/Last']})
+    intraday.to_csv(tmp_path / 'intraday.csv', index=False)
+    prices[['Date', 'Open', 'Close/Last']].to_csv(tmp_path / 'broken.csv', index=False)
+
+    serial = main.run_batch(str(tmp_path), workers=1, lookback_days=1000)
+    parallel = main.run_batch(str(tmp_path), workers=2, lookback_days=1000)
+    assert parallel.equals(serial)
+
+    broken = serial[serial['symbol'] == 'broken']
+    assert len(broken) == 1 and 'missing columns High, Low' in broken['error'].iloc[0]
+
+    layouts = [serial[serial['symbol'] == symbol].drop(columns='symbol').reset_index(drop=True)
+               for symbol in ['nasdaq', 'yahoo', 'intraday']]
+    assert layouts[0]['error'].isna().all() and layouts[0]['trades'].sum() > 0
+    assert layouts[1].equals(layouts[0]) and layouts[2].equals(layouts[0])
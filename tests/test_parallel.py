@@ -0,0 +1,65 @@
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+
+def test_detectors_on_one_frame_from_several_threads_match_serial_runs(main, df):
+    before = df.copy()
+    serial = {name: getattr(main, name)(df.copy(), verbose=False).trades for name in main.PATTERN_REGISTRY}
+
+    #Every detector twice over the same frame, so threads share its Dataset while it is still being built.
+    #A short switch interval makes the threads interleave inside the detectors
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-5)
+    try:
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            futures = [(name, pool.submit(getattr(main, name), df, verbose=False))
+                       for name in list(main.PATTERN_REGISTRY) * 2]
+    finally:
+        sys.setswitchinterval(interval)
+    for name, future in futures:
+        assert future.result().trades.equals(serial[name]), name
+
+    assert list(df.columns) == list(before.columns)
+    assert df.equals(before)
+
+
+def test_grid_search_in_a_process_pool_matches_a_serial_run(main, df):
+    grid = {'stoploss': [0.997, 0.999], 'stopprofit': [1.003, 1.006], 'max_days': [3, 5, 8]}
+    serial = main.grid_search(df, 'find_invertedhammer', grid, workers=1)
+    parallel = main.grid_search(df, 'find_invertedhammer', grid, workers=2)
+
+    assert len(serial) == 12
+    assert parallel.equals(serial)
+
+
+def test_optimise_parameters_with_a_seed_matches_across_workers(main, df):
+    pytest.importorskip('deap')
+    bounds = {'stoploss': (0.995, 0.9995), 'stopprofit': (1.001, 1.01), 'max_days': (2, 10)}
+    runs = [main.optimise_parameters(df, 'find_invertedhammer', bounds, population_size=8, generations=3,
+                                     workers=workers, seed=3) for workers in (1, 2, 1)]
+
+    serial, parallel, repeat = runs
+    for run in (parallel, repeat):
+        assert run['best_params'] == serial['best_params']
+        assert run['best_fitness'] == serial['best_fitness']
+        assert run['history'].equals(serial['history'])
+        assert (run['evaluations'], run['cache_hits']) == (serial['evaluations'], serial['cache_hits'])
+
+
+@pytest.mark.parametrize('method', ['grid', 'ga'])
+def test_walk_forward_folds_in_a_process_pool_match_a_serial_run(main, df, method):
+    if method == 'grid':
+        grid, options = {'stoploss': [0.997, 0.999], 'max_days': [3, 5]}, {}
+    else:
+        pytest.importorskip('deap')
+        grid, options = {'stoploss': (0.995, 0.9995), 'max_days': (2, 8)}, {'population_size': 6, 'generations': 2, 'seed': 4}
+    runs = [main.walk_forward(df, 'find_invertedhammer', grid, train_bars=1000, test_bars=500, method=method,
+                              workers=workers, **options) for workers in (1, 2)]
+
+    (serial_trades, serial_summary), (parallel_trades, parallel_summary) = runs
+    timings = ['optimise_seconds', 'test_seconds']
+    assert len(serial_summary) == 4 and len(serial_trades) > 0
+    assert parallel_trades.equals(serial_trades)
+    assert parallel_summary.drop(columns=timings).equals(serial_summary.drop(columns=timings))
@@ -0,0 +1,43 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+
+def stream(main, df, func_name):
+    detector = main.StreamingDetector(func_name)
+    events = [event for bar in df.to_dict('records') for event in detector.on_bar(bar)]
+    return detector, events
+
+
+@pytest.mark.parametrize('func_name', ['find_doubletops', 'find_invertedhammer', 'find_cup_with_handle'])
+def test_streamed_trades_match_the_batch_detector(main, usdjpy, func_name):
+    df = usdjpy.tail(1200).reset_index(drop=True)
+    detector, events = stream(main, df, func_name)
+    exits = pd.DataFrame([event for event in events if event['event'] == 'exit'])
+
+    #Only entries the batch scan reaches and whose exit window is complete can be compared
+    result = getattr(main, func_name)(df, verbose=False)
+    reach = df['Date'].iloc[len(df) - sum(main.range_halo(func_name))]
+    batch = result.trades[result.positions['complete'] | (result.positions['reason'] != 0)]
+    batch = batch[batch['entry_date'] < reach].sort_values('entry_date').reset_index(drop=True)
+    exits = exits[exits['entry_date'] < reach].sort_values('entry_date').reset_index(drop=True)
+
+    assert len(batch)
+    assert exits['pattern_date'].tolist() == batch['pattern_date'].tolist()
+    assert exits['entry_date'].tolist() == batch['entry_date'].tolist()
+    assert np.allclose(exits['profit'], batch['profit'])
+    #The detector only reruns on bars where its trigger allows an entry
+    assert detector.detector_runs < len(df)
+
+
+def test_provisional_entries_do_not_open_positions(main, usdjpy):
+    df = usdjpy.tail(1200).reset_index(drop=True)
+    detector, events = stream(main, df, 'find_cup_with_handle')
+    provisional = {event['entry_date'] for event in events if event['event'] == 'entry' and event['provisional']}
+    confirmed = {event['entry_date'] for event in events if event['event'] == 'entry' and not event['provisional']}
+    withdrawn = {event['entry_date'] for event in events if event['event'] == 'withdrawn'}
+    exited = {event['entry_date'] for event in events if event['event'] == 'exit'}
+
+    assert withdrawn and withdrawn <= provisional
+    assert not withdrawn & confirmed
+    assert exited <= confirmed
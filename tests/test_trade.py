@@ -0,0 +1,35 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+
+def reference_trade(df, point, stoploss, stopprofit, days):
+    #The per-bar loop trade() used to run: target before stop on the same bar, else the last close
+    buyprice = df['Open'].iloc[point]
+    for day in range(days):
+        if point + day >= len(df):
+            break
+        if df['High'].iloc[point + day] >= stopprofit * buyprice:
+            return stopprofit * buyprice - buyprice
+        if df['Low'].iloc[point + day] <= stoploss * buyprice:
+            return stoploss * buyprice - buyprice
+    return df['Close/Last'].iloc[min(point + days, len(df)) - 1] - buyprice
+
+
+def test_trade_many_matches_repeated_trade(main, df):
+    rng = np.random.default_rng(5)
+    #The last rows are included so some trades run out of bars before `days`
+    points = np.concatenate((rng.choice(len(df) - 10, 200, replace=False), np.arange(len(df) - 3, len(df))))
+    dates = df['Date'].iloc[points]
+    stoplosses = rng.uniform(0.98, 1.0, len(points))
+
+    profits = main.trade_many(dates, stoplosses, 1.01, 10, dataset=df)
+    for profit, date, point, stoploss in zip(profits, dates, points, stoplosses):
+        assert profit == main.trade(date, stoploss, 1.01, 10, dataset=df)
+        assert profit == pytest.approx(reference_trade(df, point, stoploss, 1.01, 10))
+
+
+def test_trade_many_rejects_a_missing_date(main, df):
+    dates = [df['Date'].iloc[0], df['Date'].iloc[-1] + pd.Timedelta(days=1)]
+    with pytest.raises(ValueError):
+        main.trade_many(dates, 0.99, 1.01, 5, dataset=df)